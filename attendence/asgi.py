@@ -5,6 +5,9 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+The live location stream (/api/location/live-stream/) needs this entry point,
+e.g. ``gunicorn -k uvicorn.workers.UvicornWorker attendence.asgi:application``.
 """
 
 import os
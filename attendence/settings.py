@@ -215,6 +215,158 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Cache
+# Holds the active-session and live-position registries, so it must be shared
+# by every worker: the default is a file-based cache (Django's own default,
+# a per-process locmem cache, would keep serving a stopped session in the
+# other workers). The file-based cache is not atomic: cache.add can race
+# between processes. Point CACHE_BACKEND/CACHE_LOCATION at Redis or
+# Memcached, whose add() is atomic, in production and whenever running on
+# several hosts (e.g. django.core.cache.backends.redis.RedisCache).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(BASE_DIR, 'var', 'cache')),
+        'OPTIONS': {
+            # Room for the live position registry (one entry per employee)
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '10000')),
+        },
+    }
+}
+
+# Location tracking
+# Upper bound on the number of points accepted in one batched upload
+LOCATION_BATCH_MAX_POINTS = int(os.getenv('LOCATION_BATCH_MAX_POINTS', '1000'))
+
+# "sync" writes points in the request; "buffered" appends them to a local log
+# drained by `manage.py flush_location_log` (write-behind)
+LOCATION_INGEST_MODE = os.getenv('LOCATION_INGEST_MODE', 'sync')
+LOCATION_INGEST_LOG_DIR = os.getenv('LOCATION_INGEST_LOG_DIR', os.path.join(BASE_DIR, 'var', 'ingest_log'))
+LOCATION_INGEST_SEGMENT_SECONDS = int(os.getenv('LOCATION_INGEST_SEGMENT_SECONDS', '60'))
+LOCATION_INGEST_FSYNC = os.getenv('LOCATION_INGEST_FSYNC', 'True').lower() == 'true'
+
+# Ingest thinning (0 disables a rule; all off by default): drop fixes closer/sooner
+# than these to the last stored fix, then Douglas-Peucker over windows of uploaded
+# points. Single-point uploads (live-update) only pass the distance/time gate, and a
+# dropped fix is answered with point_id null. E.g. 5 m / 0 s / 3 m
+LOCATION_FILTER_MIN_DISTANCE_M = float(os.getenv('LOCATION_FILTER_MIN_DISTANCE_M', '0'))
+LOCATION_FILTER_MIN_INTERVAL_S = float(os.getenv('LOCATION_FILTER_MIN_INTERVAL_S', '0'))
+LOCATION_SIMPLIFY_TOLERANCE_M = float(os.getenv('LOCATION_SIMPLIFY_TOLERANCE_M', '0'))
+LOCATION_SIMPLIFY_WINDOW = int(os.getenv('LOCATION_SIMPLIFY_WINDOW', '50'))
+
+# Whether `manage.py archive_sessions` deletes the archived LocationPoint rows
+LOCATION_ARCHIVE_DELETE_RAW = os.getenv('LOCATION_ARCHIVE_DELETE_RAW', 'False').lower() == 'true'
+
+# Server-sent events for the admin live map (served by attendence/asgi.py)
+LIVE_STREAM_HEARTBEAT_SECONDS = int(os.getenv('LIVE_STREAM_HEARTBEAT_SECONDS', '15'))
+LIVE_STREAM_RETRY_MS = int(os.getenv('LIVE_STREAM_RETRY_MS', '3000'))
+# How often each stream checks the live position registry for changes
+LIVE_STREAM_POLL_SECONDS = float(os.getenv('LIVE_STREAM_POLL_SECONDS', '1'))
+# Lifetime of the ?ticket= a dashboard opens the stream with (see live_stream.stream_ticket)
+LIVE_STREAM_TICKET_SECONDS = int(os.getenv('LIVE_STREAM_TICKET_SECONDS', '60'))
+
+# The live map reads positions from the cache; LiveSession.current_* is only
+# refreshed this often (and at session stop)
+LIVE_POSITION_PERSIST_SECONDS = int(os.getenv('LIVE_POSITION_PERSIST_SECONDS', '60'))
+# How long ended sessions are reported as removals to ?since= pollers
+LIVE_POSITION_TOMBSTONE_SECONDS = int(os.getenv('LIVE_POSITION_TOMBSTONE_SECONDS', str(24 * 3600)))
+
+# Cell size of the live position grid in degrees (0.01 is about 1.1 km) and
+# the limits of live-nearby queries
+LIVE_GRID_CELL_DEG = float(os.getenv('LIVE_GRID_CELL_DEG', '0.01'))
+LIVE_NEARBY_MAX_DISTANCE_M = float(os.getenv('LIVE_NEARBY_MAX_DISTANCE_M', '50000'))
+LIVE_NEARBY_MAX_RESULTS = int(os.getenv('LIVE_NEARBY_MAX_RESULTS', '50'))
+
+# Geofences: evaluate uploads against job-site fences at ingest, and the
+# grid cell size (degrees) of the fence index
+GEOFENCE_ENABLED = os.getenv('GEOFENCE_ENABLED', 'true').lower() == 'true'
+GEOFENCE_GRID_CELL_DEG = float(os.getenv('GEOFENCE_GRID_CELL_DEG', '0.01'))
+# Spacing (m) the thinned path is re-densified to when replaying geofences
+GEOFENCE_REPLAY_STEP_M = float(os.getenv('GEOFENCE_REPLAY_STEP_M', '10'))
+
+# Rows fetched per query when streaming location history
+LOCATION_HISTORY_CHUNK_SIZE = int(os.getenv('LOCATION_HISTORY_CHUNK_SIZE', '2000'))
+# The buffered location_history response covers at most this many days;
+# longer ranges use ?stream=true or the paginated endpoint
+LOCATION_HISTORY_MAX_DAYS = int(os.getenv('LOCATION_HISTORY_MAX_DAYS', '31'))
+# Paginated history: default and maximum points per page, cursor lifetime (s)
+LOCATION_HISTORY_PAGE_SIZE = int(os.getenv('LOCATION_HISTORY_PAGE_SIZE', '500'))
+LOCATION_HISTORY_MAX_PAGE_SIZE = int(os.getenv('LOCATION_HISTORY_MAX_PAGE_SIZE', '2000'))
+LOCATION_HISTORY_CURSOR_MAX_AGE = int(os.getenv('LOCATION_HISTORY_CURSOR_MAX_AGE', str(24 * 3600)))
+
+# How long simplified paths of closed sessions stay cached (per tolerance bucket)
+SIMPLIFIED_PATH_CACHE_SECONDS = int(os.getenv('SIMPLIFIED_PATH_CACHE_SECONDS', str(7 * 24 * 3600)))
+
+# Session analytics (see attendenceapp/analytics.py): faster than this is a GPS jump,
+# slower than this is idle, longer silences are gaps; max speed uses rolling windows
+ANALYTICS_MAX_SPEED_MPS = float(os.getenv('ANALYTICS_MAX_SPEED_MPS', '70'))
+ANALYTICS_IDLE_SPEED_MPS = float(os.getenv('ANALYTICS_IDLE_SPEED_MPS', '0.5'))
+ANALYTICS_MAX_GAP_SECONDS = float(os.getenv('ANALYTICS_MAX_GAP_SECONDS', '600'))
+ANALYTICS_SPEED_WINDOW = int(os.getenv('ANALYTICS_SPEED_WINDOW', '5'))
+# How long statistics of closed sessions stay cached
+SESSION_STATS_CACHE_SECONDS = int(os.getenv('SESSION_STATS_CACHE_SECONDS', str(7 * 24 * 3600)))
+
+# Stop detection (see attendenceapp/stay_points.py): points within VISIT_RADIUS_M for at
+# least VISIT_MIN_DWELL_SECONDS form a visit; short excursions are merged back
+VISIT_RADIUS_M = float(os.getenv('VISIT_RADIUS_M', '100'))
+VISIT_MIN_DWELL_SECONDS = float(os.getenv('VISIT_MIN_DWELL_SECONDS', '300'))
+VISIT_MERGE_GAP_SECONDS = float(os.getenv('VISIT_MERGE_GAP_SECONDS', '300'))
+
+# Team heatmap (see attendenceapp/heatmap.py): allowed grid cell sizes in degrees (the
+# first is the default), longest date range, and how long finished days stay cached
+HEATMAP_CELL_SIZES = [float(v) for v in os.getenv('HEATMAP_CELL_SIZES', '0.005,0.001,0.002,0.01,0.02,0.05').split(',')]
+HEATMAP_MAX_DAYS = int(os.getenv('HEATMAP_MAX_DAYS', '31'))
+HEATMAP_CACHE_SECONDS = int(os.getenv('HEATMAP_CACHE_SECONDS', str(30 * 24 * 3600)))
+
+# Longest date range the activity summary endpoint accepts
+DAILY_ACTIVITY_MAX_DAYS = int(os.getenv('DAILY_ACTIVITY_MAX_DAYS', '366'))
+
+# Reverse-geocode cache (see attendenceapp/geocode_cache.py): coordinates are rounded to
+# this many decimals (4 = about 11 m); in-process LRU size, TTL and table size cap
+GEOCODE_CACHE_PRECISION = int(os.getenv('GEOCODE_CACHE_PRECISION', '4'))
+GEOCODE_CACHE_LRU_SIZE = int(os.getenv('GEOCODE_CACHE_LRU_SIZE', '4096'))
+GEOCODE_CACHE_TTL_SECONDS = int(os.getenv('GEOCODE_CACHE_TTL_SECONDS', str(90 * 24 * 3600)))
+GEOCODE_CACHE_MAX_ENTRIES = int(os.getenv('GEOCODE_CACHE_MAX_ENTRIES', '100000'))
+
+# Background geocoding of pinpoints (see attendenceapp/geocode_worker.py): worker threads
+# per process, attempts before giving up, the retry backoff and how long a claimed
+# pinpoint stays with its worker before the sweep may take it over
+GEOCODE_ASYNC = os.getenv('GEOCODE_ASYNC', 'true').lower() == 'true'
+GEOCODE_WORKERS = int(os.getenv('GEOCODE_WORKERS', '2'))
+GEOCODE_MAX_ATTEMPTS = int(os.getenv('GEOCODE_MAX_ATTEMPTS', '5'))
+GEOCODE_RETRY_BASE_SECONDS = float(os.getenv('GEOCODE_RETRY_BASE_SECONDS', '30'))
+GEOCODE_RETRY_MAX_SECONDS = float(os.getenv('GEOCODE_RETRY_MAX_SECONDS', '3600'))
+GEOCODE_CLAIM_SECONDS = float(os.getenv('GEOCODE_CLAIM_SECONDS', '300'))
+
+# Reverse-geocoding client (see attendenceapp/geocoding.py): backend ("nominatim", "fake" or a
+# dotted class path), HTTP timeout, keep-alive pool size and the User-Agent Nominatim requires
+GEOCODE_BACKEND = os.getenv('GEOCODE_BACKEND', 'nominatim')
+GEOCODE_TIMEOUT_SECONDS = float(os.getenv('GEOCODE_TIMEOUT_SECONDS', '10'))
+GEOCODE_POOL_SIZE = int(os.getenv('GEOCODE_POOL_SIZE', '4'))
+GEOCODE_USER_AGENT = os.getenv('GEOCODE_USER_AGENT', 'AttendanceApp/1.0')
+
+# Requests per second allowed per process (0 = unlimited; Nominatim allows 1 per application),
+# burst size, and how long a lookup may wait for its turn before giving up
+GEOCODE_RATE_PER_SECOND = float(os.getenv('GEOCODE_RATE_PER_SECOND', '1'))
+GEOCODE_BURST = float(os.getenv('GEOCODE_BURST', '1'))
+GEOCODE_RATE_WAIT_SECONDS = float(os.getenv('GEOCODE_RATE_WAIT_SECONDS', '5'))
+
+# Consecutive geocoder failures that open the circuit, and how long it stays open
+GEOCODE_BREAKER_FAILURES = int(os.getenv('GEOCODE_BREAKER_FAILURES', '5'))
+GEOCODE_BREAKER_RESET_SECONDS = float(os.getenv('GEOCODE_BREAKER_RESET_SECONDS', '60'))
+
+# Simulated latency of the fake geocoding backend (benchmarks)
+GEOCODE_FAKE_LATENCY_SECONDS = float(os.getenv('GEOCODE_FAKE_LATENCY_SECONDS', '0'))
+
+# Offline gazetteer (see attendenceapp/gazetteer.py, GEOCODE_BACKEND=gazetteer): path build_gazetteer
+# points at each new build (a symlink), its grid cell size in degrees, and the farthest place it may answer with
+GAZETTEER_PATH = os.getenv('GAZETTEER_PATH', os.path.join(BASE_DIR, 'var', 'gazetteer'))
+GAZETTEER_CELL_DEG = float(os.getenv('GAZETTEER_CELL_DEG', '0.01'))
+GAZETTEER_MAX_DISTANCE_M = float(os.getenv('GAZETTEER_MAX_DISTANCE_M', '500'))
+
+# How long an employee's active session id stays in the cache registry
+ACTIVE_SESSION_CACHE_SECONDS = int(os.getenv('ACTIVE_SESSION_CACHE_SECONDS', str(12 * 3600)))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -0,0 +1,65 @@
+"""
+Active-session registry.
+
+Every location upload starts by finding the employee's active LiveSession.
+The id is kept in Django's cache keyed by user id, so the common case costs
+no query: start_session registers the session, stop_session forgets it and
+a miss falls back to the database. Clients may send the session id they
+were given as a hint; a hint that matches the registry is accepted as is.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import LiveSession
+
+
+def _key(user_id):
+    return f"active_session:{user_id}"
+
+
+def remember(session):
+    cache.set(_key(session.employee_id), session.pk, timeout=settings.ACTIVE_SESSION_CACHE_SECONDS)
+
+
+def forget(user_id):
+    cache.delete(_key(user_id))
+
+
+def _session_ref(session_id, user):
+    """
+    A LiveSession instance carrying only the primary key, usable for FK
+    assignment and pk-filtered updates without loading the row.
+    """
+    session = LiveSession(pk=session_id, employee=user, is_active=True)
+    session._state.adding = False
+    session._state.db = "default"
+    return session
+
+
+def get_active_session(user, hint=None):
+    """
+    Return the user's active session (or None), from the registry when
+    possible. A malformed hint matches no session.
+    """
+    if hint in (None, ""):
+        hint = None
+    else:
+        try:
+            hint = int(hint)
+        except (TypeError, ValueError):
+            return None
+
+    cached_id = cache.get(_key(user.pk))
+    if cached_id is not None and (hint is None or hint == int(cached_id)):
+        return _session_ref(cached_id, user)
+
+    sessions = LiveSession.objects.filter(employee=user, is_active=True)
+    if hint is not None:
+        sessions = sessions.filter(pk=hint)
+    session = sessions.first()
+
+    if session is not None:
+        remember(session)
+    elif hint is None:
+        forget(user.pk)
+    return session
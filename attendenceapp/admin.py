@@ -1,6 +1,7 @@
 from django.contrib import admin
 from .models import LaserScreedSubmission
 from .models import Submission, ContactSubmission
+from .models import Geofence, GeofenceEvent, DailyActivity, SessionVisit, GeocodeCacheEntry
 
 @admin.register(Submission)
 class SubmissionAdmin(admin.ModelAdmin):
@@ -28,4 +29,43 @@ class LaserScreedSubmissionAdmin(admin.ModelAdmin):
     
     def get_services(self, obj):
         return ', '.join(obj.services) if obj.services else 'None'
-    get_services.short_description = 'Services'
\ No newline at end of file
+    get_services.short_description = 'Services'
+
+
+@admin.register(Geofence)
+class GeofenceAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "shape", "radius_m", "is_active", "updated_at")
+    list_filter = ("shape", "is_active")
+    search_fields = ("name",)
+    readonly_fields = ("min_latitude", "max_latitude", "min_longitude", "max_longitude", "created_at", "updated_at")
+
+
+@admin.register(GeofenceEvent)
+class GeofenceEventAdmin(admin.ModelAdmin):
+    list_display = ("id", "geofence", "employee", "session", "event_type", "timestamp")
+    list_filter = ("event_type", "geofence")
+    search_fields = ("geofence__name", "employee__username")
+    ordering = ("-timestamp",)
+
+
+@admin.register(SessionVisit)
+class SessionVisitAdmin(admin.ModelAdmin):
+    list_display = ("id", "employee", "session", "arrival", "departure", "dwell_seconds", "geofence")
+    list_filter = ("geofence",)
+    search_fields = ("employee__username", "geofence__name")
+    ordering = ("-arrival",)
+
+@admin.register(DailyActivity)
+class DailyActivityAdmin(admin.ModelAdmin):
+    list_display = ("id", "employee", "date", "session_count", "point_count", "pinpoint_count", "distance_m")
+    list_filter = ("date",)
+    search_fields = ("employee__username", "employee__full_name")
+    readonly_fields = ("updated_at",)
+    ordering = ("-date",)
+
+
+@admin.register(GeocodeCacheEntry)
+class GeocodeCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ("id", "key", "address", "created_at", "expires_at")
+    search_fields = ("key", "address")
+    ordering = ("-created_at",)
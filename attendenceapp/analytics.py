@@ -0,0 +1,132 @@
+"""
+Per-session trajectory analytics (NumPy).
+
+A session's path is loaded once as latitude, longitude, time and
+``dropped_before`` arrays; everything else is vectorised over the segments
+between consecutive points:
+
+* GPS jumps: a point reached and left faster than ANALYTICS_MAX_SPEED_MPS
+  while its neighbours are plausibly connected is a jump. Jumps are
+  reported and left out of every other figure.
+* distance: haversine length of the cleaned path.
+* moving / idle / gap time: a segment is moving at ANALYTICS_IDLE_SPEED_MPS
+  or faster and idle below it. A segment longer than
+  ANALYTICS_MAX_GAP_SECONDS with no thinned fixes in between (the phone
+  sent nothing) is a gap and counts as neither. Ingest thinning drops the
+  fixes of a stationary phone, so long idle segments are normal.
+* speeds: the average is moving distance over moving time; the maximum is
+  taken over a rolling window of ANALYTICS_SPEED_WINDOW segments
+  (distance over time), so one noisy fix cannot set it.
+
+Results of closed sessions are cached until the path changes.
+"""
+import datetime
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .archive import session_points
+from .geo import haversine_array_m
+
+
+def load_arrays(session):
+    """(latitudes, longitudes, epoch seconds, dropped_before) of a session's path"""
+    points = session_points(session)
+    count = len(points)
+    return (
+        np.fromiter((p.latitude for p in points), dtype=float, count=count),
+        np.fromiter((p.longitude for p in points), dtype=float, count=count),
+        np.fromiter((p.timestamp.timestamp() for p in points), dtype=float, count=count),
+        np.fromiter((p.dropped_before for p in points), dtype=np.int64, count=count),
+    )
+
+
+def _speeds(distances, durations):
+    """Metres per second; instantaneous (zero-duration) moves are infinitely fast"""
+    speeds = np.full(len(distances), np.inf)
+    np.divide(distances, durations, out=speeds, where=durations > 0)
+    speeds[(durations <= 0) & (distances == 0)] = 0.0
+    return speeds
+
+
+def jump_mask(lats, lngs, times):
+    """Points that look like GPS jumps (see the module docstring)"""
+    mask = np.zeros(len(lats), dtype=bool)
+    if len(lats) < 3:
+        return mask
+    max_speed = settings.ANALYTICS_MAX_SPEED_MPS
+    speeds = _speeds(haversine_array_m(lats[:-1], lngs[:-1], lats[1:], lngs[1:]), np.diff(times))
+    skip = _speeds(haversine_array_m(lats[:-2], lngs[:-2], lats[2:], lngs[2:]), times[2:] - times[:-2])
+    mask[1:-1] = (speeds[:-1] > max_speed) & (speeds[1:] > max_speed) & (skip <= max_speed)
+    return mask
+
+
+def rolling_speed(distances, durations, window):
+    """Speed over each run of ``window`` consecutive segments (total distance / total time)"""
+    window = min(window, len(distances))
+    if window < 1:
+        return np.zeros(0)
+    distance_sums = np.lib.stride_tricks.sliding_window_view(distances, window).sum(axis=1)
+    duration_sums = np.lib.stride_tricks.sliding_window_view(durations, window).sum(axis=1)
+    return _speeds(distance_sums, duration_sums)
+
+
+def compute_stats(lats, lngs, times, dropped_before):
+    """Trajectory statistics of one path given as arrays (timestamp order)"""
+    jumps = jump_mask(lats, lngs, times)
+    outliers = [
+        {
+            "latitude": float(lats[i]),
+            "longitude": float(lngs[i]),
+            "timestamp": datetime.datetime.fromtimestamp(times[i], tz=datetime.timezone.utc),
+        }
+        for i in np.flatnonzero(jumps)
+    ]
+    keep = ~jumps
+    lats, lngs, times, dropped_before = lats[keep], lngs[keep], times[keep], dropped_before[keep]
+
+    distances = haversine_array_m(lats[:-1], lngs[:-1], lats[1:], lngs[1:])
+    durations = np.diff(times)
+    speeds = _speeds(distances, durations)
+
+    gap = (durations > settings.ANALYTICS_MAX_GAP_SECONDS) & (dropped_before[1:] == 0)
+    moving = ~gap & (speeds >= settings.ANALYTICS_IDLE_SPEED_MPS)
+    idle = ~gap & ~moving
+
+    moving_seconds = float(durations[moving].sum())
+    moving_distance = float(distances[moving].sum())
+    # Gaps are excluded so the rolling windows only span tracked time
+    tracked = np.flatnonzero(~gap)
+    window_speeds = rolling_speed(distances[tracked], durations[tracked], settings.ANALYTICS_SPEED_WINDOW)
+    window_speeds = window_speeds[np.isfinite(window_speeds)]
+
+    return {
+        "point_count": int(len(lats)),
+        "distance_m": round(float(distances.sum()), 1),
+        "duration_seconds": round(float(times[-1] - times[0]), 1) if len(times) else 0.0,
+        "moving_seconds": round(moving_seconds, 1),
+        "idle_seconds": round(float(durations[idle].sum()), 1),
+        "gap_seconds": round(float(durations[gap].sum()), 1),
+        "moving_distance_m": round(moving_distance, 1),
+        "average_speed_kmh": round(moving_distance / moving_seconds * 3.6, 1) if moving_seconds else 0.0,
+        "max_speed_kmh": round(float(window_speeds.max()) * 3.6, 1) if len(window_speeds) else 0.0,
+        "outlier_count": len(outliers),
+        "outliers": outliers,
+    }
+
+
+def session_stats(session):
+    """``compute_stats`` for a session's stored path; closed sessions are cached"""
+    key = None
+    if not session.is_active:
+        version = f"{session.point_count}-{session.last_point_at.timestamp() if session.last_point_at else 0}"
+        key = f"session_stats:{session.pk}:{version}"
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    stats = compute_stats(*load_arrays(session))
+    if key is not None:
+        cache.set(key, stats, timeout=settings.SESSION_STATS_CACHE_SECONDS)
+    return stats
@@ -0,0 +1,217 @@
+"""
+Compressed path archive for closed sessions.
+
+Once a LiveSession has ended its LocationPoint rows never change, so
+``archive_session`` packs them into one SessionPathArchive blob: ids,
+latitude/longitude (1e-7 degree units) and timestamps (ms) as delta-encoded
+int64 arrays, zlib-compressed. The raw rows can then be deleted: offline
+sync deduplicates against each device's ack watermark (SyncDevice.last_seq),
+not against stored rows. ``manage.py archive_sessions`` does the packing,
+off the request path.
+
+Readers go through ``session_points`` which returns the same PathPoint
+tuples for archived and live sessions. Points that reach a session after
+it was archived (late offline uploads) stay as rows with ids above
+``max_point_id`` and are merged in; archiving the session again folds them
+into the blob.
+"""
+import datetime
+import logging
+import struct
+import sys
+import zlib
+from array import array
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import F, Q
+
+from .models import LocationPoint, SessionPathArchive
+
+logger = logging.getLogger(__name__)
+
+CODEC_DELTA_ZLIB = 1
+COORD_SCALE = 10_000_000
+
+PathPoint = namedtuple("PathPoint", "id latitude longitude timestamp dropped_before")
+
+
+def _pack(values, typecode):
+    data = array(typecode, values)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data.tobytes()
+
+
+def _unpack(buffer, typecode, count, offset):
+    data = array(typecode)
+    data.frombytes(buffer[offset:offset + count * data.itemsize])
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data, offset + count * data.itemsize
+
+
+def _deltas(values):
+    previous = 0
+    out = []
+    for value in values:
+        out.append(value - previous)
+        previous = value
+    return out
+
+
+def _undeltas(deltas):
+    total = 0
+    out = []
+    for delta in deltas:
+        total += delta
+        out.append(total)
+    return out
+
+
+def encode_points(points):
+    """Pack PathPoints (sorted by timestamp) into a compressed blob"""
+    ids = [p.id for p in points]
+    lats = [round(p.latitude * COORD_SCALE) for p in points]
+    lngs = [round(p.longitude * COORD_SCALE) for p in points]
+    times = [round(p.timestamp.timestamp() * 1000) for p in points]
+
+    raw = b"".join([
+        struct.pack("<I", len(points)),
+        _pack(_deltas(ids), "q"),
+        _pack(_deltas(lats), "q"),
+        _pack(_deltas(lngs), "q"),
+        _pack(_deltas(times), "q"),
+        _pack([p.dropped_before for p in points], "I"),
+    ])
+    return zlib.compress(raw, 9)
+
+
+def decode_points(blob):
+    """Inverse of ``encode_points``"""
+    raw = zlib.decompress(bytes(blob))
+    (count,) = struct.unpack_from("<I", raw)
+    offset = 4
+    ids, offset = _unpack(raw, "q", count, offset)
+    lats, offset = _unpack(raw, "q", count, offset)
+    lngs, offset = _unpack(raw, "q", count, offset)
+    times, offset = _unpack(raw, "q", count, offset)
+    dropped, offset = _unpack(raw, "I", count, offset)
+
+    utc = datetime.timezone.utc
+    return [
+        PathPoint(
+            point_id,
+            lat / COORD_SCALE,
+            lng / COORD_SCALE,
+            datetime.datetime.fromtimestamp(ms / 1000, tz=utc),
+            dropped_before,
+        )
+        for point_id, lat, lng, ms, dropped_before in zip(
+            _undeltas(ids), _undeltas(lats), _undeltas(lngs), _undeltas(times), dropped
+        )
+    ]
+
+
+def unarchived_rows():
+    """
+    LocationPoint rows not covered by an archive, for use with
+    ``Prefetch("location_points", queryset=unarchived_rows())``.
+    """
+    return LocationPoint.objects.filter(
+        Q(session__path_archive__isnull=True) | Q(id__gt=F("session__path_archive__max_point_id"))
+    ).order_by("timestamp", "id")
+
+
+def _archive_of(session):
+    try:
+        return session.path_archive
+    except SessionPathArchive.DoesNotExist:
+        return None
+
+
+def session_points(session):
+    """
+    All path points of a session in timestamp order, whether archived or not.
+    Uses rows prefetched with ``unarchived_rows()`` when available.
+    """
+    archive = _archive_of(session)
+    prefetched = getattr(session, "_prefetched_objects_cache", {}).get("location_points")
+    if prefetched is not None:
+        rows = list(prefetched)
+    else:
+        rows = session.location_points.order_by("timestamp", "id")
+        if archive is not None:
+            rows = rows.filter(id__gt=archive.max_point_id)
+
+    points = [
+        PathPoint(row.id, row.latitude, row.longitude, row.timestamp, row.dropped_before)
+        for row in rows
+    ]
+    if archive is None:
+        return points
+
+    archived = decode_points(archive.data)
+    if not points:
+        return archived
+    return sorted(archived + points, key=lambda p: (p.timestamp, p.id))
+
+
+def stored_point_count(session):
+    """
+    The number of path points a session has. Uses the point_count counter,
+    or counts archive and rows for sessions recorded before it was maintained
+    (``manage.py backfill_session_stats`` fills it in).
+    """
+    if session.point_count:
+        return session.point_count
+    archive = _archive_of(session)
+    prefetched = getattr(session, "_prefetched_objects_cache", {}).get("location_points")
+    if prefetched is not None:
+        rows = len(prefetched)
+    else:
+        rows = session.location_points.all()
+        if archive is not None:
+            rows = rows.filter(id__gt=archive.max_point_id)
+        rows = rows.count()
+    return rows + (archive.point_count if archive is not None else 0)
+
+
+def archive_session(session, delete_raw=False):
+    """
+    Pack a closed session's path into its archive (merging any points that
+    arrived since the last run). Optionally delete the archived raw rows.
+    Returns the SessionPathArchive, or None for active or empty sessions.
+    """
+    if session.is_active:
+        return None
+
+    with transaction.atomic():
+        points = session_points(session)
+        if not points:
+            return None
+
+        previous = _archive_of(session)
+        blob = encode_points(points)
+        archive, _ = SessionPathArchive.objects.update_or_create(
+            session=session,
+            defaults={
+                "codec": CODEC_DELTA_ZLIB,
+                "point_count": len(points),
+                "first_point_at": points[0].timestamp,
+                "last_point_at": points[-1].timestamp,
+                "max_point_id": max(p.id for p in points),
+                "data": blob,
+                "raw_deleted": delete_raw or (previous is not None and previous.raw_deleted),
+            },
+        )
+        session.path_archive = archive
+
+        if delete_raw:
+            session.location_points.filter(id__lte=archive.max_point_id).delete()
+
+    logger.info(
+        "Archived session %s: %d points in %d bytes%s",
+        session.pk, len(points), len(blob), " (raw rows deleted)" if delete_raw else "",
+    )
+    return archive
@@ -0,0 +1,138 @@
+"""
+Daily activity rollup: one DailyActivity row per (employee, local date).
+
+Rows are keyed by the session's ``local_date`` (the day it started, like
+every date filter in the app) and kept current with small F()-expression
+updates as sessions start and stop, as points arrive and as pinpoints are
+added or deleted, so reports and dashboards read one indexed row per
+employee and day instead of aggregating sessions. ``rebuild`` recomputes
+a date range from the session counters (``manage.py rebuild_daily_activity``),
+e.g. after ``backfill_session_stats``; ``rebuild_daily_activity --all``
+fills the days tracked before the rollup existed.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Max, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from .models import DailyActivity, LiveSession
+
+
+def _earliest(field, value):
+    return Least(Coalesce(F(field), Value(value)), Value(value))
+
+
+def _latest(field, value):
+    return Greatest(Coalesce(F(field), Value(value)), Value(value))
+
+
+def _apply(employee_id, date, **updates):
+    """Update the (employee, date) row, creating it first when missing"""
+    rows = DailyActivity.objects.filter(employee_id=employee_id, date=date)
+    if not rows.update(**updates):
+        DailyActivity.objects.get_or_create(employee_id=employee_id, date=date)
+        rows.update(**updates)
+
+
+def session_started(session):
+    _apply(
+        session.employee_id, session.local_date,
+        session_count=F("session_count") + 1,
+        first_activity_at=_earliest("first_activity_at", session.start_time),
+        last_activity_at=_latest("last_activity_at", session.start_time),
+    )
+
+
+def session_stopped(session):
+    _apply(
+        session.employee_id, session.local_date,
+        tracked_seconds=F("tracked_seconds") + (session.end_time - session.start_time).total_seconds(),
+        last_activity_at=_latest("last_activity_at", session.end_time),
+    )
+
+
+def points_stored(employee_id, date, count, distance_m, first_at, last_at):
+    """Called by ingest.store_points with what one upload added to a session"""
+    _apply(
+        employee_id, date,
+        point_count=F("point_count") + count,
+        distance_m=F("distance_m") + distance_m,
+        first_activity_at=_earliest("first_activity_at", first_at),
+        last_activity_at=_latest("last_activity_at", last_at),
+    )
+
+
+def pinpoint_added(session, timestamp):
+    _apply(
+        session.employee_id, session.local_date,
+        pinpoint_count=F("pinpoint_count") + 1,
+        last_activity_at=_latest("last_activity_at", timestamp),
+    )
+
+
+def pinpoint_removed(session):
+    DailyActivity.objects.filter(
+        employee_id=session.employee_id, date=session.local_date, pinpoint_count__gt=0,
+    ).update(pinpoint_count=F("pinpoint_count") - 1)
+
+
+def rebuild(start_date, end_date, employee_ids=None):
+    """
+    Recompute the rows of a date range from the LiveSession counters and
+    replace the stored ones. Returns the number of rows written.
+    """
+    sessions = LiveSession.objects.on_dates(start_date, end_date)
+    if employee_ids:
+        sessions = sessions.filter(employee_id__in=employee_ids)
+
+    rows = {}
+    for session in sessions.values(
+        "id", "employee_id", "local_date", "start_time", "end_time", "point_count", "pinpoint_count",
+        "distance_m", "first_point_at", "last_point_at", "last_location_update",
+    ).annotate(last_pinpoint_at=Max("pinpoints__timestamp")).iterator():
+        key = (session["employee_id"], session["local_date"])
+        row = rows.get(key)
+        if row is None:
+            row = rows[key] = DailyActivity(employee_id=key[0], date=key[1])
+        row.session_count += 1
+        row.point_count += session["point_count"]
+        row.pinpoint_count += session["pinpoint_count"]
+        row.distance_m += session["distance_m"]
+        if session["end_time"] is not None:
+            row.tracked_seconds += (session["end_time"] - session["start_time"]).total_seconds()
+        times = [t for t in (
+            session["start_time"], session["end_time"], session["first_point_at"],
+            session["last_point_at"], session["last_location_update"], session["last_pinpoint_at"],
+        ) if t is not None]
+        row.first_activity_at = min(filter(None, [row.first_activity_at, *times]))
+        row.last_activity_at = max(filter(None, [row.last_activity_at, *times]))
+
+    with transaction.atomic():
+        stale = DailyActivity.objects.filter(date__range=(start_date, end_date))
+        if employee_ids:
+            stale = stale.filter(employee_id__in=employee_ids)
+        stale.delete()
+        DailyActivity.objects.bulk_create(rows.values())
+    return len(rows)
+
+
+def summarize(rows):
+    """Totals over DailyActivity rows (one employee's days or a whole team's)"""
+    totals = defaultdict(float)
+    days = set()
+    for row in rows:
+        days.add(row.date)
+        totals["sessions"] += row.session_count
+        totals["path_points"] += row.point_count
+        totals["pinpoints"] += row.pinpoint_count
+        totals["distance_m"] += row.distance_m
+        totals["tracked_seconds"] += row.tracked_seconds
+    return {
+        "active_days": len(days),
+        "sessions": int(totals["sessions"]),
+        "path_points": int(totals["path_points"]),
+        "pinpoints": int(totals["pinpoints"]),
+        "distance_m": round(totals["distance_m"], 1),
+        "tracked_seconds": round(totals["tracked_seconds"]),
+    }
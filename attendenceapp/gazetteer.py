@@ -0,0 +1,250 @@
+"""
+Offline reverse geocoding from a local gazetteer.
+
+We work in a bounded region, so nearest-place lookups can be answered
+in-process from a gazetteer of OSM-derived place and road points instead
+of calling Nominatim. ``manage.py build_gazetteer`` turns a CSV (columns
+``latitude``, ``longitude``, ``name`` and optionally ``locality``,
+``city``, ``state``) into a directory of ``.npy`` files, reached through
+the GAZETTEER_PATH symlink:
+
+* ``coords.npy``: (n, 2) latitudes/longitudes sorted by grid cell,
+* ``cell_keys.npy`` / ``cell_starts.npy``: the occupied cells of a
+  ``cell_deg`` grid (packed as in heatmap.py) and where their points start,
+* ``point_labels.npy``, ``label_offsets.npy``, ``labels.npy``: each
+  point's address, deduplicated and stored as one UTF-8 byte array,
+* ``meta.json``: grid size and counts.
+
+Each build writes a new sibling directory and then swaps the symlink with
+one rename, so readers see either the old or the new gazetteer in full.
+The previous build is kept (older ones are removed) for processes that
+are still loading it.
+
+The arrays are opened memory-mapped, so loading is instant and processes
+share the pages. A query scans rings of cells around the coordinate's cell
+until no unscanned ring can hold anything nearer than the best match (or
+GAZETTEER_MAX_DISTANCE_M). Longitude wrap-around is not handled.
+
+GazetteerBackend plugs this into the geocoding client
+(GEOCODE_BACKEND="gazetteer"). A process keeps its gazetteer until the
+client is rebuilt (restart or ``geocoding.reset_client``).
+"""
+import csv
+import json
+import logging
+import math
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from .geo import EARTH_RADIUS_M, haversine_array_m
+from .geocoding import GeocoderBackend, GeocoderError
+from .heatmap import OFFSET, SPAN
+
+logger = logging.getLogger(__name__)
+
+METRES_PER_DEGREE = math.radians(1) * EARTH_RADIUS_M
+
+ADDRESS_COLUMNS = ("name", "locality", "city", "state")
+
+
+def _cell_keys(lats, lngs, cell_deg):
+    rows = np.floor(np.asarray(lats) / cell_deg).astype(np.int64)
+    cols = np.floor(np.asarray(lngs) / cell_deg).astype(np.int64)
+    return (rows + OFFSET) * SPAN + (cols + OFFSET)
+
+
+def _address(row):
+    parts = []
+    for column in ADDRESS_COLUMNS:
+        value = (row.get(column) or "").strip()
+        if value and value not in parts:
+            parts.append(value)
+    return ", ".join(parts)
+
+
+def build(csv_path, output_dir, cell_deg):
+    """Build the gazetteer files from a CSV. Returns the meta dict."""
+    lats, lngs, addresses = [], [], []
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            address = _address(row)
+            try:
+                lat, lng = float(row["latitude"]), float(row["longitude"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if not address or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                continue
+            lats.append(lat)
+            lngs.append(lng)
+            addresses.append(address)
+
+    coords = np.column_stack([np.array(lats, dtype=np.float64), np.array(lngs, dtype=np.float64)]).reshape(-1, 2)
+    keys = _cell_keys(coords[:, 0], coords[:, 1], cell_deg)
+    order = np.argsort(keys, kind="stable")
+    coords, keys = coords[order], keys[order]
+    cell_keys, cell_starts = np.unique(keys, return_index=True)
+    cell_starts = np.append(cell_starts, len(keys)).astype(np.int64)
+
+    labels, point_labels = np.unique(np.array(addresses, dtype=object)[order].astype(str), return_inverse=True)
+    encoded = [label.encode("utf-8") for label in labels]
+    label_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    label_offsets[1:] = np.cumsum([len(label) for label in encoded])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+    output_dir = os.path.abspath(output_dir)
+    parent, name = os.path.split(output_dir)
+    os.makedirs(parent, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix=f"{name}.build-", dir=parent)
+    arrays = {
+        "coords": coords,
+        "cell_keys": cell_keys,
+        "cell_starts": cell_starts,
+        "point_labels": point_labels.astype(np.int32),
+        "label_offsets": label_offsets,
+        "labels": blob,
+    }
+    meta = {
+        "cell_deg": cell_deg,
+        "points": len(coords),
+        "labels": len(labels),
+        "cells": len(cell_keys),
+    }
+    try:
+        for array_name, array in arrays.items():
+            np.save(os.path.join(build_dir, f"{array_name}.npy"), array)
+        with open(os.path.join(build_dir, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        os.chmod(build_dir, 0o755)
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+    _swap(output_dir, build_dir)
+    return meta
+
+
+def _swap(output_dir, build_dir):
+    """Point the ``output_dir`` symlink at ``build_dir`` with one rename; remove builds older than the previous one"""
+    parent, name = os.path.split(output_dir)
+    if os.path.islink(output_dir):
+        previous = os.path.realpath(output_dir)
+    elif os.path.isdir(output_dir):
+        # A plain directory from before builds were swapped in; moved aside once
+        previous = f"{build_dir}.previous"
+        os.rename(output_dir, previous)
+    else:
+        previous = None
+
+    link = os.path.join(parent, f".{name}.link")
+    if os.path.lexists(link):
+        os.unlink(link)
+    os.symlink(os.path.basename(build_dir), link)
+    os.replace(link, output_dir)
+
+    keep = {os.path.realpath(build_dir), previous and os.path.realpath(previous)}
+    for entry in os.listdir(parent):
+        path = os.path.join(parent, entry)
+        if entry.startswith(f"{name}.build-") and os.path.realpath(path) not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class Gazetteer:
+    """A built gazetteer, memory-mapped"""
+
+    def __init__(self, path):
+        # Resolve the symlink once so every file comes from the same build
+        path = os.path.realpath(path)
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.cell_deg = self.meta["cell_deg"]
+
+        def load(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+        self.coords = load("coords")
+        self.cell_keys = np.asarray(load("cell_keys"))
+        self.cell_starts = np.asarray(load("cell_starts"))
+        self.point_labels = load("point_labels")
+        self.label_offsets = load("label_offsets")
+        self.labels = load("labels")
+
+    def label(self, index):
+        label = int(self.point_labels[index])
+        start, end = int(self.label_offsets[label]), int(self.label_offsets[label + 1])
+        return bytes(self.labels[start:end]).decode("utf-8")
+
+    def _ring(self, row, col, ring):
+        """Point indices in the cells at Chebyshev distance ``ring`` from (row, col)"""
+        if ring == 0:
+            rows, cols = np.array([row]), np.array([col])
+        else:
+            span = np.arange(-ring, ring + 1)
+            side = np.arange(-ring + 1, ring)
+            rows = row + np.concatenate([np.full(len(span), -ring), np.full(len(span), ring), side, side])
+            cols = col + np.concatenate([span, span, np.full(len(side), -ring), np.full(len(side), ring)])
+        keys = (rows + OFFSET) * SPAN + (cols + OFFSET)
+        positions = np.searchsorted(self.cell_keys, keys)
+        found = positions < len(self.cell_keys)
+        found[found] = self.cell_keys[positions[found]] == keys[found]
+        positions = positions[found]
+        if not len(positions):
+            return None
+        return np.concatenate([
+            np.arange(self.cell_starts[position], self.cell_starts[position + 1]) for position in positions
+        ])
+
+    def nearest(self, lat, lng, max_distance_m):
+        """(address, distance in metres) of the nearest point within ``max_distance_m``, or None"""
+        if not len(self.cell_keys):
+            return None
+        cell_deg = self.cell_deg
+        row = math.floor(lat / cell_deg)
+        col = math.floor(lng / cell_deg)
+        best_index, best_distance = None, math.inf
+        ring = 0
+        while True:
+            # Anything in this ring is at least ring - 1 whole cells away
+            # (longitude cells narrowest at the ring's far edge)
+            far_latitude = min(89.9, abs(lat) + (ring + 1) * cell_deg)
+            bound = max(0, ring - 1) * cell_deg * METRES_PER_DEGREE * math.cos(math.radians(far_latitude))
+            if bound > min(best_distance, max_distance_m):
+                break
+            indices = self._ring(row, col, ring)
+            if indices is not None:
+                points = self.coords[indices]
+                distances = haversine_array_m(lat, lng, points[:, 0], points[:, 1])
+                closest = int(np.argmin(distances))
+                if distances[closest] < best_distance:
+                    best_index, best_distance = int(indices[closest]), float(distances[closest])
+            ring += 1
+        if best_index is None or best_distance > max_distance_m:
+            return None
+        return self.label(best_index), best_distance
+
+
+class GazetteerBackend(GeocoderBackend):
+    """Nearest gazetteer place within GAZETTEER_MAX_DISTANCE_M, in-process"""
+
+    rate_limited = False
+
+    def __init__(self):
+        self.gazetteer = None
+        self.lock = threading.Lock()
+
+    def _load(self):
+        with self.lock:
+            if self.gazetteer is None:
+                try:
+                    self.gazetteer = Gazetteer(settings.GAZETTEER_PATH)
+                except (OSError, ValueError, KeyError) as e:
+                    raise GeocoderError(f"Gazetteer at {settings.GAZETTEER_PATH} is unavailable: {e}") from e
+                logger.info("Loaded gazetteer: %s", self.gazetteer.meta)
+            return self.gazetteer
+
+    def reverse(self, lat, lng):
+        found = self._load().nearest(float(lat), float(lng), settings.GAZETTEER_MAX_DISTANCE_M)
+        return found[0] if found else None
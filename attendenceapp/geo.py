@@ -0,0 +1,49 @@
+"""Small geodesy helpers shared by the tracking code"""
+import math
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance in metres between two WGS84 coordinates"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_array_m(lat1, lng1, lat2, lng2):
+    """``haversine_m`` over NumPy arrays (broadcasting)"""
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = np.radians(np.subtract(lng2, lng1))
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def path_length_m(coords):
+    """Length in metres of a polyline given as (lat, lng) pairs"""
+    total = 0.0
+    for (lat1, lng1), (lat2, lng2) in zip(coords, coords[1:]):
+        total += haversine_m(lat1, lng1, lat2, lng2)
+    return total
+
+
+def grid_cell(lat, lng, cell_deg):
+    """(row, col) of the square lat/lng grid cell containing a coordinate"""
+    return math.floor(lat / cell_deg), math.floor(lng / cell_deg)
+
+
+def grid_cell_min_side_m(row, radius, cell_deg):
+    """
+    Shortest side in metres of the cells within ``radius`` rows of ``row``
+    (cells narrow towards the poles).
+    """
+    edge_lat = min(89.9, max(abs(row - radius), abs(row + radius + 1)) * cell_deg)
+    degree_m = math.radians(1) * EARTH_RADIUS_M
+    return cell_deg * degree_m * min(1.0, math.cos(math.radians(edge_lat)))
@@ -0,0 +1,138 @@
+"""
+Two-level reverse-geocode cache.
+
+Employees pin the same sites over and over, so addresses are cached under
+the coordinates rounded to GEOCODE_CACHE_PRECISION decimals (4 decimals is
+a cell of about 11 m):
+
+1. an in-process LRU (GEOCODE_CACHE_LRU_SIZE entries), answering repeat
+   lookups in microseconds,
+2. the GeocodeCacheEntry table, shared by every worker and surviving
+   restarts.
+
+Both levels expire entries after GEOCODE_CACHE_TTL_SECONDS. The table is
+kept at GEOCODE_CACHE_MAX_ENTRIES rows by ``purge`` (oldest first), which
+``manage.py purge_geocode_cache`` runs along with removing expired rows.
+Concurrent misses for the same key in one process wait for a single
+upstream lookup. Failed lookups (None) are not cached.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils import timezone
+
+from .models import GeocodeCacheEntry
+
+
+def cache_key(lat, lng):
+    precision = settings.GEOCODE_CACHE_PRECISION
+    return f"{round(float(lat), precision):.{precision}f},{round(float(lng), precision):.{precision}f}"
+
+
+class LRUCache:
+    """Thread-safe LRU of key -> (value, expires at monotonic time)"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local = LRUCache(settings.GEOCODE_CACHE_LRU_SIZE)
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def get(lat, lng):
+    """Cached address for a coordinate, or None"""
+    key = cache_key(lat, lng)
+    address = local.get(key)
+    if address is not None:
+        return address
+
+    entry = GeocodeCacheEntry.objects.filter(key=key, expires_at__gt=timezone.now()).values_list(
+        "address", "expires_at"
+    ).first()
+    if entry is None:
+        return None
+    address, expires_at = entry
+    local.set(key, address, min(settings.GEOCODE_CACHE_TTL_SECONDS, (expires_at - timezone.now()).total_seconds()))
+    return address
+
+
+def store(lat, lng, address):
+    """Store an address in both levels"""
+    key = cache_key(lat, lng)
+    ttl = settings.GEOCODE_CACHE_TTL_SECONDS
+    local.set(key, address, ttl)
+    expires_at = timezone.now() + timedelta(seconds=ttl)
+    try:
+        GeocodeCacheEntry.objects.update_or_create(key=key, defaults={"address": address, "expires_at": expires_at})
+    except IntegrityError:
+        # Another worker stored the same key first
+        pass
+
+
+def get_or_lookup(lat, lng, lookup):
+    """
+    Cached address for a coordinate; on a miss ``lookup(lat, lng)`` is
+    called once per key (concurrent callers in this process wait for it)
+    and a non-None result is cached. Exceptions from ``lookup`` propagate.
+    """
+    address = get(lat, lng)
+    if address is not None:
+        return address
+
+    key = cache_key(lat, lng)
+    with _inflight_lock:
+        lock = _inflight.setdefault(key, threading.Lock())
+    with lock:
+        try:
+            # Filled by the caller we waited for?
+            address = local.get(key)
+            if address is not None:
+                return address
+            address = lookup(lat, lng)
+            if address is not None:
+                store(lat, lng, address)
+            return address
+        finally:
+            with _inflight_lock:
+                _inflight.pop(key, None)
+
+
+def purge():
+    """Delete expired rows and the oldest beyond GEOCODE_CACHE_MAX_ENTRIES. Returns the number deleted."""
+    deleted, _ = GeocodeCacheEntry.objects.filter(expires_at__lte=timezone.now()).delete()
+    excess = GeocodeCacheEntry.objects.count() - settings.GEOCODE_CACHE_MAX_ENTRIES
+    if excess > 0:
+        oldest = list(GeocodeCacheEntry.objects.order_by("expires_at").values_list("id", flat=True)[:excess])
+        deleted += GeocodeCacheEntry.objects.filter(id__in=oldest).delete()[0]
+    return deleted
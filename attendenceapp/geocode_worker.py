@@ -0,0 +1,164 @@
+"""
+Background reverse geocoding of pinpoint addresses.
+
+``add_pinpoint`` never waits for the geocoder: an address already in the
+geocode cache is filled in at once, anything else is saved with
+``address_status="pending"`` and handed to a small per-process thread pool
+(GEOCODE_WORKERS threads) once the row is committed. A worker resolves the
+address through the geocode cache and marks the pinpoint ``resolved``.
+
+Lookups go through the geocoding client (rate limited, with a circuit
+breaker; see geocoding.py). A failed lookup is retried with exponential
+backoff (GEOCODE_RETRY_BASE_SECONDS doubling up to GEOCODE_RETRY_MAX_SECONDS,
+stored in ``next_geocode_at``).
+After GEOCODE_MAX_ATTEMPTS the pinpoint is marked ``failed`` and gets the
+coordinate fallback text, as synchronous geocoding did. A lookup the client
+skipped (rate limit, open circuit) is retried after
+GEOCODE_RETRY_BASE_SECONDS without spending an attempt, and a coordinate the
+provider has no address for fails at once. Retries wait on
+timers in memory, so ``manage.py geocode_pinpoints`` sweeps up pending
+pinpoints whose retry is due (e.g. after a restart).
+
+A timer and the sweep can reach the same pinpoint, so a worker first claims
+it with a conditional update (``pending`` to ``resolving``, leased until
+``next_geocode_at`` = now + GEOCODE_CLAIM_SECONDS) and only the claimant
+looks it up. A claim whose worker died is taken over once its lease expires.
+
+With GEOCODE_ASYNC off, pending pinpoints are resolved inline instead.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from . import geocode_cache, geocoding
+from .models import Pinpoint
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.GEOCODE_WORKERS, thread_name_prefix="geocode")
+    return _executor
+
+
+def fallback_address(lat, lng):
+    return f"Location: {lat}, {lng}"
+
+
+def retry_delay(attempts):
+    """Seconds to wait after the ``attempts``-th failed lookup"""
+    return min(settings.GEOCODE_RETRY_MAX_SECONDS, settings.GEOCODE_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+def enqueue(pinpoint_id, delay=0):
+    """Resolve a pending pinpoint's address in the background (after ``delay`` seconds)"""
+    if not settings.GEOCODE_ASYNC:
+        resolve(pinpoint_id, schedule_retry=False)
+        return
+    if delay > 0:
+        timer = threading.Timer(delay, enqueue, args=(pinpoint_id,))
+        timer.daemon = True
+        timer.start()
+        return
+    _pool().submit(_run, pinpoint_id)
+
+
+def _run(pinpoint_id):
+    try:
+        resolve(pinpoint_id)
+    except Exception:
+        logger.exception("Background geocoding of pinpoint %s failed", pinpoint_id)
+    finally:
+        # Worker threads hold their own connections
+        connections.close_all()
+
+
+def _claim(pinpoint_id):
+    """
+    Take a pending (or abandoned) pinpoint for this worker. Returns a
+    queryset matching only this claim, or None when another worker has it.
+    """
+    now = timezone.now()
+    lease = now + timedelta(seconds=settings.GEOCODE_CLAIM_SECONDS)
+    claimed = Pinpoint.objects.filter(pk=pinpoint_id).filter(
+        Q(address_status="pending") | Q(address_status="resolving", next_geocode_at__lte=now)
+    ).update(address_status="resolving", next_geocode_at=lease)
+    if not claimed:
+        return None
+    return Pinpoint.objects.filter(pk=pinpoint_id, address_status="resolving", next_geocode_at=lease)
+
+
+def _give_up(claim, pinpoint_id, lat, lng, attempts):
+    claim.update(
+        address=fallback_address(lat, lng), address_status="failed",
+        geocode_attempts=attempts, next_geocode_at=None,
+    )
+    logger.warning("Giving up geocoding pinpoint %s after %d attempt(s)", pinpoint_id, attempts)
+    return "failed"
+
+
+def resolve(pinpoint_id, schedule_retry=True):
+    """
+    Look up a pending pinpoint's address and record the outcome. Returns the
+    new status, or None when the pinpoint is gone, no longer pending or
+    claimed by another worker.
+    """
+    claim = _claim(pinpoint_id)
+    if claim is None:
+        return None
+    pinpoint = claim.values("latitude", "longitude", "geocode_attempts").first()
+    if pinpoint is None:
+        return None
+    lat, lng = pinpoint["latitude"], pinpoint["longitude"]
+
+    attempts = pinpoint["geocode_attempts"]
+    try:
+        address = geocode_cache.get_or_lookup(lat, lng, geocoding.reverse)
+    except geocoding.GeocoderSkipped:
+        # No request was made, so no attempt is spent
+        delay = settings.GEOCODE_RETRY_BASE_SECONDS
+    except geocoding.GeocoderError:
+        attempts += 1
+        delay = retry_delay(attempts)
+    except Exception:
+        # Hand the pinpoint back rather than leave it claimed until the lease runs out
+        claim.update(address_status="pending", next_geocode_at=None)
+        raise
+    else:
+        if address is not None:
+            claim.update(address=address, address_status="resolved", next_geocode_at=None)
+            return "resolved"
+        # The provider has no address here; asking again will not change that
+        return _give_up(claim, pinpoint_id, lat, lng, attempts + 1)
+
+    if attempts >= settings.GEOCODE_MAX_ATTEMPTS:
+        return _give_up(claim, pinpoint_id, lat, lng, attempts)
+
+    claim.update(
+        address_status="pending", geocode_attempts=attempts,
+        next_geocode_at=timezone.now() + timedelta(seconds=delay),
+    )
+    if schedule_retry:
+        enqueue(pinpoint_id, delay=delay)
+    return "pending"
+
+
+def due_pinpoints():
+    """Pending pinpoints whose (re)try is due, and claims whose lease has expired"""
+    now = timezone.now()
+    return Pinpoint.objects.filter(
+        Q(address_status="pending", next_geocode_at__isnull=True)
+        | Q(address_status__in=("pending", "resolving"), next_geocode_at__lte=now)
+    )
@@ -0,0 +1,284 @@
+"""
+Reverse-geocoding client.
+
+``reverse(lat, lng)`` is the one entry point (used through geocode_cache by
+the background worker, geocode_worker.py). It sends each lookup
+to the configured backend through:
+
+* a token bucket (GEOCODE_RATE_PER_SECOND, bursts of GEOCODE_BURST) shared
+  by every thread of the process; a caller waits at most
+  GEOCODE_RATE_WAIT_SECONDS for a token. Nominatim's policy is one request
+  per second per application, so with several processes split the rate
+  between them;
+* a circuit breaker: after GEOCODE_BREAKER_FAILURES consecutive transient
+  failures, lookups fail fast for GEOCODE_BREAKER_RESET_SECONDS, then a
+  single trial request decides whether to close it again.
+
+The client tells its callers apart three outcomes: an address or None (the
+provider has no address there; final), GeocoderError (the lookup failed;
+retry with backoff) and GeocoderSkipped (no request was made because of
+the rate limit or the open circuit; retry without counting an attempt).
+
+Backends implement ``reverse(lat, lng)``, returning an address or None
+when the provider has none, and raising GeocoderError for transient
+failures (network errors, rate limiting, server errors). GEOCODE_BACKEND
+names a registered backend ("nominatim", "fake", "gazetteer") or a dotted
+class path. NominatimBackend keeps a pooled ``requests.Session``
+(keep-alive); FakeBackend answers in-process for tests and benchmarks;
+the offline GazetteerBackend (gazetteer.py) is not rate limited.
+"""
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class GeocoderError(Exception):
+    """A transient geocoding failure (worth retrying later)"""
+
+
+class GeocoderSkipped(Exception):
+    """The lookup was not made (rate limit or open circuit); retry without counting an attempt"""
+
+
+class GeocoderBackend:
+    """Interface of reverse-geocoding providers"""
+
+    # Whether lookups go through the process-wide token bucket
+    rate_limited = True
+
+    def reverse(self, lat, lng):
+        raise NotImplementedError
+
+
+class NominatimBackend(GeocoderBackend):
+    """OpenStreetMap Nominatim over a pooled keep-alive session"""
+
+    url = "https://nominatim.openstreetmap.org/reverse"
+
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.GEOCODE_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # Required by Nominatim
+        self.session.headers["User-Agent"] = settings.GEOCODE_USER_AGENT
+
+    def reverse(self, lat, lng):
+        params = {
+            'lat': lat,
+            'lon': lng,
+            'format': 'json',
+            'addressdetails': 1,
+            'zoom': 18
+        }
+        try:
+            response = self.session.get(self.url, params=params, timeout=settings.GEOCODE_TIMEOUT_SECONDS)
+        except requests.exceptions.RequestException as e:
+            raise GeocoderError(f"Nominatim request failed: {e}") from e
+        if response.status_code == 429 or response.status_code >= 500:
+            raise GeocoderError(f"Nominatim returned {response.status_code}")
+        if response.status_code != 200:
+            logger.warning("Geocoding failed with status %s", response.status_code)
+            return None
+        return self.format_address(response.json())
+
+    @staticmethod
+    def format_address(data):
+        """A short address from a Nominatim response (None when there is none)"""
+        address = data.get('address', {})
+        address_parts = []
+
+        # Add building/house number and road
+        if address.get('house_number'):
+            address_parts.append(address['house_number'])
+        if address.get('road'):
+            address_parts.append(address['road'])
+
+        # Add locality/neighborhood
+        locality = (address.get('neighbourhood') or
+                   address.get('suburb') or
+                   address.get('village') or
+                   address.get('town'))
+        if locality:
+            address_parts.append(locality)
+
+        # Add city
+        city = (address.get('city') or
+               address.get('municipality'))
+        if city:
+            address_parts.append(city)
+
+        # Add state/region
+        state = (address.get('state') or
+                address.get('region'))
+        if state:
+            address_parts.append(state)
+
+        if address_parts:
+            return ', '.join(address_parts)
+        return data.get('display_name')
+
+
+class FakeBackend(GeocoderBackend):
+    """Deterministic in-process answers (GEOCODE_FAKE_LATENCY_SECONDS simulates the network)"""
+
+    def reverse(self, lat, lng):
+        if settings.GEOCODE_FAKE_LATENCY_SECONDS:
+            time.sleep(settings.GEOCODE_FAKE_LATENCY_SECONDS)
+        return f"Fake Road {float(lat):.4f}, {float(lng):.4f}"
+
+
+BACKENDS = {
+    "nominatim": "attendenceapp.geocoding.NominatimBackend",
+    "fake": "attendenceapp.geocoding.FakeBackend",
+    "gazetteer": "attendenceapp.gazetteer.GazetteerBackend",
+}
+
+
+class TokenBucket:
+    """Thread-safe token bucket; ``rate`` tokens per second up to ``capacity``"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, timeout):
+        """Take a token, waiting up to ``timeout`` seconds; False if none came"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Opens after ``threshold`` consecutive failures; one trial call after ``reset_seconds``"""
+
+    def __init__(self, threshold, reset_seconds):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial or time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            # Half-open: let this caller try
+            self.trial = True
+            return True
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def cancel(self):
+        """The allowed call was not made (a half-open trial goes to the next caller)"""
+        with self.lock:
+            self.trial = False
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                if self.opened_at is None:
+                    logger.warning("Geocoder circuit opened after %d failure(s)", self.failures)
+                self.opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+
+class GeocodingClient:
+    """A backend behind the process-wide rate limiter and circuit breaker"""
+
+    def __init__(self, backend, limiter, breaker):
+        self.backend = backend
+        self.limiter = limiter
+        self.breaker = breaker
+
+    def reverse(self, lat, lng):
+        """
+        Address for a coordinate, or None when the provider has none. Raises
+        GeocoderSkipped when the lookup was not made and GeocoderError when
+        it failed.
+        """
+        if not self.breaker.allow():
+            raise GeocoderSkipped("circuit open")
+        if self.limiter is not None and not self.limiter.acquire(settings.GEOCODE_RATE_WAIT_SECONDS):
+            logger.info("Geocoding skipped: rate limit")
+            self.breaker.cancel()
+            raise GeocoderSkipped("rate limit")
+        try:
+            address = self.backend.reverse(lat, lng)
+        except GeocoderError as e:
+            logger.warning("Geocoding error: %s", e)
+            self.breaker.failure()
+            raise
+        except Exception as e:
+            logger.error("Unexpected geocoding error: %s", e)
+            self.breaker.failure()
+            raise GeocoderError(f"Unexpected geocoding error: {e}") from e
+        self.breaker.success()
+        return address
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def build_client():
+    backend_name = settings.GEOCODE_BACKEND
+    backend = import_string(BACKENDS.get(backend_name, backend_name))()
+    rate = settings.GEOCODE_RATE_PER_SECOND
+    return GeocodingClient(
+        backend,
+        TokenBucket(rate, settings.GEOCODE_BURST) if rate > 0 and backend.rate_limited else None,
+        CircuitBreaker(settings.GEOCODE_BREAKER_FAILURES, settings.GEOCODE_BREAKER_RESET_SECONDS),
+    )
+
+
+def get_client():
+    """The process-wide client, built from settings on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = build_client()
+        return _client
+
+
+def reset_client():
+    """Drop the process-wide client (after changing the GEOCODE_* settings)"""
+    global _client
+    with _client_lock:
+        _client = None
+
+
+def reverse(lat, lng):
+    return get_client().reverse(lat, lng)
@@ -0,0 +1,306 @@
+"""
+Geofence evaluation for job sites.
+
+Two modes share the same vectorised point-in-shape tests:
+
+* ingest: ``check_points`` runs inside ``store_points`` on each upload. Each
+  fix is only tested against the fences whose bounding box covers its grid
+  cell (plus the fences the employee is currently inside, to notice exits).
+  The per-process fence index is rebuilt when a Geofence is saved or deleted.
+* batch: ``replay_session`` re-runs a whole session's path with NumPy and
+  replaces its events, e.g. after fences were added or late points arrived
+  (``manage.py replay_geofences``). The stored path is thinned, so it is
+  first re-densified to GEOFENCE_REPLAY_STEP_M by linear interpolation;
+  replayed crossing times are estimates, ingest sees every raw fix.
+
+Crossing a boundary records a GeofenceEvent (enter/exit) stamped with the
+first fix on the new side, so reports read arrival and departure times
+straight from the events.
+"""
+import datetime
+import logging
+import math
+import time
+from collections import namedtuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .geo import EARTH_RADIUS_M, grid_cell, haversine_array_m
+from .models import Geofence, GeofenceEvent, LiveSession
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "geofences:version"
+
+# A fence covering more grid cells than this is checked for every fix instead
+MAX_INDEXED_CELLS = 10_000
+
+Shape = namedtuple("Shape", "id name shape bbox center radius_m vertices")
+
+
+def bounding_box(fence):
+    """(min_lat, min_lng, max_lat, max_lng) of a Geofence"""
+    if fence.shape == "circle":
+        dlat = math.degrees(fence.radius_m / EARTH_RADIUS_M)
+        dlng = dlat / max(0.01, math.cos(math.radians(fence.center_latitude)))
+        return (
+            fence.center_latitude - dlat, fence.center_longitude - dlng,
+            fence.center_latitude + dlat, fence.center_longitude + dlng,
+        )
+    lats = [vertex[0] for vertex in fence.polygon]
+    lngs = [vertex[1] for vertex in fence.polygon]
+    return min(lats), min(lngs), max(lats), max(lngs)
+
+
+def fences_changed():
+    """Invalidate every process's fence index (called by Geofence save/delete)"""
+    global _index_checked
+    cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+    _index_checked = 0.0
+
+
+# Vectorised containment
+
+def contains(shape, lats, lngs):
+    """Boolean mask of the points (NumPy arrays) inside ``shape``"""
+    min_lat, min_lng, max_lat, max_lng = shape.bbox
+    mask = (lats >= min_lat) & (lats <= max_lat) & (lngs >= min_lng) & (lngs <= max_lng)
+    if not mask.any():
+        return mask
+
+    candidates = np.flatnonzero(mask)
+    lat, lng = lats[candidates], lngs[candidates]
+    if shape.shape == "circle":
+        inside = haversine_array_m(shape.center[0], shape.center[1], lat, lng) <= shape.radius_m
+    else:
+        # Even-odd ray casting, one pass per edge over all candidate points
+        inside = np.zeros(len(candidates), dtype=bool)
+        vertices = shape.vertices
+        for (lat1, lng1), (lat2, lng2) in zip(vertices, np.roll(vertices, -1, axis=0)):
+            if lat1 == lat2:
+                continue
+            crosses = (lat1 > lat) != (lat2 > lat)
+            at_lng = (lng2 - lng1) * (lat - lat1) / (lat2 - lat1) + lng1
+            inside ^= crosses & (lng < at_lng)
+    mask[candidates] = inside
+    return mask
+
+
+def _densify(lats, lngs, times, step_m):
+    """
+    Interpolate extra points so no segment is longer than ``step_m``. Stored
+    paths are thinned (straight runs keep only their ends), which would
+    otherwise move crossings to the next stored point.
+    """
+    if len(lats) < 2:
+        return lats, lngs, times
+    lengths = haversine_array_m(lats[:-1], lngs[:-1], lats[1:], lngs[1:])
+    steps = np.maximum(1, np.ceil(lengths / step_m)).astype(np.int64)
+    starts = np.repeat(np.arange(len(lats) - 1), steps)
+    fraction = (np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)) / np.repeat(steps, steps)
+
+    def interpolate(values):
+        values = np.asarray(values, dtype=float)
+        return np.append(values[starts] + (values[starts + 1] - values[starts]) * fraction, values[-1])
+
+    return interpolate(lats), interpolate(lngs), interpolate(times)
+
+
+def _crossings(was_inside, mask):
+    """Indexes where ``mask`` differs from the state before it"""
+    previous = np.concatenate(([was_inside], mask[:-1]))
+    return np.flatnonzero(mask != previous)
+
+
+# Fence index
+
+class FenceIndex:
+    """Active fences bucketed by the grid cells their bounding boxes cover"""
+
+    def __init__(self, fences):
+        cell_deg = settings.GEOFENCE_GRID_CELL_DEG
+        self.shapes = {}
+        self.cells = {}
+        self.unindexed = []
+        for fence in fences:
+            shape = Shape(
+                fence.id, fence.name, fence.shape,
+                (fence.min_latitude, fence.min_longitude, fence.max_latitude, fence.max_longitude),
+                (fence.center_latitude, fence.center_longitude), fence.radius_m,
+                np.array(fence.polygon, dtype=float) if fence.shape == "polygon" else None,
+            )
+            self.shapes[fence.id] = shape
+            low = grid_cell(fence.min_latitude, fence.min_longitude, cell_deg)
+            high = grid_cell(fence.max_latitude, fence.max_longitude, cell_deg)
+            if (high[0] - low[0] + 1) * (high[1] - low[1] + 1) > MAX_INDEXED_CELLS:
+                self.unindexed.append(fence.id)
+                continue
+            for row in range(low[0], high[0] + 1):
+                for col in range(low[1], high[1] + 1):
+                    self.cells.setdefault((row, col), []).append(fence.id)
+
+    def candidates(self, lats, lngs):
+        """Ids of the fences that may contain any of the points"""
+        cell_deg = settings.GEOFENCE_GRID_CELL_DEG
+        rows = np.floor(lats / cell_deg).astype(np.int64)
+        cols = np.floor(lngs / cell_deg).astype(np.int64)
+        found = set(self.unindexed)
+        for cell in set(zip(rows.tolist(), cols.tolist())):
+            found.update(self.cells.get(cell, ()))
+        return found
+
+
+_index = None
+_index_version = None
+_index_checked = 0.0
+
+
+def get_index():
+    """The fence index, rebuilt when fences changed (checked at most once a second)"""
+    global _index, _index_version, _index_checked
+    now = time.monotonic()
+    if _index is not None and now - _index_checked < 1:
+        return _index
+
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        fences_changed()
+        version = cache.get(VERSION_KEY)
+    if _index is None or version != _index_version:
+        _index = FenceIndex(Geofence.objects.filter(is_active=True))
+        _index_version = version
+    _index_checked = now
+    return _index
+
+
+# Evaluation
+
+def _events_for(session, shape, was_inside, mask, points):
+    events = []
+    for i in _crossings(was_inside, mask):
+        point = points[i]
+        events.append(GeofenceEvent(
+            geofence_id=shape.id,
+            session_id=session.pk,
+            employee_id=session.employee_id,
+            event_type="enter" if mask[i] else "exit",
+            timestamp=point["timestamp"],
+            latitude=point["latitude"],
+            longitude=point["longitude"],
+        ))
+    return events
+
+
+class _LazyPoints:
+    """Point dicts built on demand from arrays, for the few fixes that become events"""
+
+    def __init__(self, lats, lngs, times):
+        self.lats, self.lngs, self.times = lats, lngs, times
+
+    def __getitem__(self, i):
+        return {
+            "latitude": float(self.lats[i]),
+            "longitude": float(self.lngs[i]),
+            "timestamp": datetime.datetime.fromtimestamp(self.times[i], tz=datetime.timezone.utc),
+        }
+
+
+def check_points(session, points, inside):
+    """
+    Ingest mode: test new fixes (sorted by timestamp) against candidate
+    fences. ``inside`` is the list of fence ids the employee was inside
+    before them. Returns ``(events, inside)`` with the updated list.
+    """
+    if not settings.GEOFENCE_ENABLED or not points:
+        return [], inside
+    index = get_index()
+    if not index.shapes and not inside:
+        return [], inside
+
+    lats = np.fromiter((p["latitude"] for p in points), dtype=float, count=len(points))
+    lngs = np.fromiter((p["longitude"] for p in points), dtype=float, count=len(points))
+    candidates = index.candidates(lats, lngs) | set(inside)
+
+    events = []
+    now_inside = set(inside)
+    for fence_id in sorted(candidates):
+        shape = index.shapes.get(fence_id)
+        if shape is None:
+            # Deleted or deactivated while the employee was inside
+            now_inside.discard(fence_id)
+            continue
+        mask = contains(shape, lats, lngs)
+        events.extend(_events_for(session, shape, fence_id in inside, mask, points))
+        if mask[-1]:
+            now_inside.add(fence_id)
+        else:
+            now_inside.discard(fence_id)
+
+    events.sort(key=lambda event: event.timestamp)
+    return events, sorted(now_inside)
+
+
+def replay_session(session):
+    """
+    Batch mode: recompute a session's geofence events from its whole path
+    and replace the stored ones. Returns the new events.
+    """
+    from .archive import session_points
+
+    index = get_index()
+    with transaction.atomic():
+        # Same row lock as store_points, so ingest cannot interleave
+        LiveSession.objects.select_for_update().filter(pk=session.pk).values("pk").get()
+        path = session_points(session)
+        events = []
+        inside = []
+        if path and index.shapes:
+            lats, lngs, times = _densify(
+                np.fromiter((p.latitude for p in path), dtype=float, count=len(path)),
+                np.fromiter((p.longitude for p in path), dtype=float, count=len(path)),
+                np.fromiter((p.timestamp.timestamp() for p in path), dtype=float, count=len(path)),
+                settings.GEOFENCE_REPLAY_STEP_M,
+            )
+            points = _LazyPoints(lats, lngs, times)
+            for fence_id in sorted(index.candidates(lats, lngs)):
+                shape = index.shapes[fence_id]
+                mask = contains(shape, lats, lngs)
+                events.extend(_events_for(session, shape, False, mask, points))
+                if mask[-1]:
+                    inside.append(fence_id)
+            events.sort(key=lambda event: event.timestamp)
+
+        GeofenceEvent.objects.filter(session=session).delete()
+        GeofenceEvent.objects.bulk_create(events)
+        LiveSession.objects.filter(pk=session.pk).update(inside_geofences=inside)
+    session.inside_geofences = inside
+
+    logger.info("Replayed geofences for session %s: %d event(s)", session.pk, len(events))
+    return events
+
+
+def site_visits(events):
+    """
+    Pair enter/exit events into visits: dicts with geofence, arrival,
+    departure (None while still inside) and duration.
+    """
+    visits = []
+    open_visits = {}
+    for event in sorted(events, key=lambda e: e.timestamp):
+        if event.event_type == "enter":
+            visit = {"geofence": event.geofence, "arrival": event.timestamp, "departure": None, "duration": None}
+            open_visits[event.geofence_id] = visit
+            visits.append(visit)
+        else:
+            visit = open_visits.pop(event.geofence_id, None)
+            if visit is None:
+                # Session started inside the fence
+                visit = {"geofence": event.geofence, "arrival": None, "departure": None, "duration": None}
+                visits.append(visit)
+            visit["departure"] = event.timestamp
+            if visit["arrival"] is not None:
+                visit["duration"] = event.timestamp - visit["arrival"]
+    return visits
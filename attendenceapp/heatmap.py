@@ -0,0 +1,110 @@
+"""
+Team coverage heatmaps: path points of many employees and days binned
+into a fixed latitude/longitude grid on the server.
+
+The unit of work is one employee-day. Its path (archived or not) is loaded
+as NumPy arrays, every stored point is weighted by the raw fixes it stands
+for (1 + ``dropped_before``, so thinning does not hide where people spent
+time), and the weights are summed per grid cell with ``np.unique`` and
+``np.bincount``. The result, a sorted array of packed cell keys plus
+counts, is a partial aggregate; a request merges the partials of all
+requested employee-days the same way.
+
+Which employee-days exist comes from the DailyActivity rollup, and its
+point count and last activity time version the partials: days before today
+are cached, and a late upload changes the version instead of serving a
+stale partial.
+"""
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .analytics import load_arrays
+from .geo import EARTH_RADIUS_M
+from .models import DailyActivity, LiveSession
+
+# Packed cell key: (row + OFFSET) * SPAN + (col + OFFSET)
+OFFSET = 1 << 30
+SPAN = 1 << 31
+
+EMPTY = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+
+def bin_points(lats, lngs, weights, cell_deg):
+    """(sorted cell keys, summed weights) of points on a ``cell_deg`` grid"""
+    if not len(lats):
+        return EMPTY
+    rows = np.floor(lats / cell_deg).astype(np.int64)
+    cols = np.floor(lngs / cell_deg).astype(np.int64)
+    keys, inverse = np.unique((rows + OFFSET) * SPAN + (cols + OFFSET), return_inverse=True)
+    return keys, np.bincount(inverse, weights=weights).astype(np.int64)
+
+
+def merge(partials):
+    """Sum partial aggregates into one (sorted cell keys, counts)"""
+    partials = [partial for partial in partials if len(partial[0])]
+    if not partials:
+        return EMPTY
+    keys, inverse = np.unique(np.concatenate([keys for keys, _ in partials]), return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate([counts for _, counts in partials]))
+    return keys, counts.astype(np.int64)
+
+
+def cell_centers(keys, cell_deg):
+    """Latitude and longitude arrays of the centres of packed cells"""
+    rows = keys // SPAN - OFFSET
+    cols = keys % SPAN - OFFSET
+    return (rows + 0.5) * cell_deg, (cols + 0.5) * cell_deg
+
+
+def day_partial(employee_id, date, cell_deg):
+    """Partial aggregate of one employee-day, computed from the stored paths"""
+    partials = []
+    sessions = LiveSession.objects.on_dates(date).filter(employee_id=employee_id).select_related('path_archive')
+    for session in sessions:
+        lats, lngs, _, dropped_before = load_arrays(session)
+        partials.append(bin_points(lats, lngs, dropped_before + 1, cell_deg))
+    return merge(partials)
+
+
+def _partial_key(activity, cell_deg):
+    last = activity.last_activity_at.timestamp() if activity.last_activity_at else 0
+    return f"heatmap:{activity.employee_id}:{activity.date}:{cell_deg}:{activity.point_count}-{last}"
+
+
+def aggregate(start_date, end_date, cell_deg, employee_ids=None):
+    """
+    Team heatmap for a date range: ``(keys, counts, employee_ids)`` with the
+    merged cell counts and the employees that contributed.
+    """
+    activity = DailyActivity.objects.filter(date__range=(start_date, end_date), point_count__gt=0)
+    if employee_ids:
+        activity = activity.filter(employee_id__in=employee_ids)
+    activity = list(activity)
+
+    today = timezone.localdate()
+    finished = {_partial_key(row, cell_deg): row for row in activity if row.date < today}
+    cached = cache.get_many(list(finished))
+
+    partials = list(cached.values())
+    fresh = {}
+    for row in activity:
+        key = _partial_key(row, cell_deg)
+        if key in cached:
+            continue
+        partial = day_partial(row.employee_id, row.date, cell_deg)
+        partials.append(partial)
+        if key in finished:
+            fresh[key] = partial
+    if fresh:
+        cache.set_many(fresh, timeout=settings.HEATMAP_CACHE_SECONDS)
+
+    keys, counts = merge(partials)
+    return keys, counts, sorted({row.employee_id for row in activity})
+
+
+def cell_area_km2(latitude, cell_deg):
+    """Area of a grid cell at a latitude, in square kilometres"""
+    side_m = np.radians(cell_deg) * EARTH_RADIUS_M
+    return side_m * side_m * np.cos(np.radians(latitude)) / 1e6
@@ -0,0 +1,176 @@
+"""
+Constant-memory reading of an employee's location history.
+
+``merged_points`` yields the path points and pinpoints of a set of sessions
+as one timestamp-ordered stream (``heapq.merge`` of three sorted sources):
+
+* LocationPoint rows, read in keyset chunks over (timestamp, id),
+* archived paths (see archive.py), decoded one session at a time,
+* Pinpoint rows, read in keyset chunks over (timestamp, id).
+
+Keyset chunks are used instead of ``QuerySet.iterator()`` because the
+MySQL client library buffers a whole result set even when iterating, so
+only bounded queries keep memory flat. ``stream_history`` turns the merged
+stream into a JSON document written incrementally; the paginated history
+endpoint resumes the same merge from a signed (timestamp, id) cursor.
+"""
+import heapq
+import json
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.utils.encoders import JSONEncoder
+
+from .archive import decode_points
+from .models import LocationPoint, Pinpoint, SessionPathArchive
+
+PATH_FIELDS = ("id", "session_id", "latitude", "longitude", "timestamp")
+PINPOINT_FIELDS = ("id", "session_id", "latitude", "longitude", "timestamp", "place", "address", "message")
+CURSOR_SALT = "attendenceapp.history.cursor"
+
+
+def _after(key):
+    """Rows strictly after a (timestamp, id) keyset position"""
+    timestamp, row_id = key
+    return Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=row_id)
+
+
+def iter_keyset(queryset, fields, after=None, chunk_size=None):
+    """
+    Iterate ``queryset`` as value tuples ordered by (timestamp, id), one
+    bounded query per chunk. ``fields`` must start with "id" and contain
+    "timestamp".
+    """
+    chunk_size = chunk_size or settings.LOCATION_HISTORY_CHUNK_SIZE
+    ts_index = fields.index("timestamp")
+    queryset = queryset.order_by("timestamp", "id")
+    while True:
+        chunk = queryset.filter(_after(after)) if after is not None else queryset
+        rows = list(chunk.values_list(*fields)[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        after = (rows[-1][ts_index], rows[-1][0])
+
+
+def _path_rows(session_ids, after=None, chunk_size=None):
+    """Path points still stored as LocationPoint rows (not covered by an archive)"""
+    rows = LocationPoint.objects.filter(session_id__in=session_ids).filter(
+        Q(session__path_archive__isnull=True) | Q(id__gt=F("session__path_archive__max_point_id"))
+    )
+    for row_id, session_id, latitude, longitude, timestamp in iter_keyset(rows, PATH_FIELDS, after, chunk_size):
+        yield timestamp, row_id, "path", session_id, latitude, longitude, None
+
+
+def _archived_rows(session_ids, after=None):
+    """Archived path points, decoding one archive at a time"""
+    archives = SessionPathArchive.objects.filter(session_id__in=session_ids)
+    if after is not None:
+        archives = archives.filter(last_point_at__gte=after[0])
+    for archive_id, session_id in archives.order_by("first_point_at", "id").values_list("id", "session_id"):
+        data = SessionPathArchive.objects.values_list("data", flat=True).get(pk=archive_id)
+        for point in decode_points(data):
+            if after is not None and (point.timestamp, point.id) <= after:
+                continue
+            yield point.timestamp, point.id, "path", session_id, point.latitude, point.longitude, None
+
+
+def _pinpoint_rows(session_ids, after=None, chunk_size=None):
+    rows = Pinpoint.objects.filter(session_id__in=session_ids)
+    for row in iter_keyset(rows, PINPOINT_FIELDS, after, chunk_size):
+        row_id, session_id, latitude, longitude, timestamp, place, address, message = row
+        yield timestamp, row_id, "pinpoint", session_id, latitude, longitude, (place, address, message)
+
+
+def merged_points(session_ids, after_path=None, after_pinpoint=None, chunk_size=None):
+    """
+    Path points and pinpoints of ``session_ids`` in (timestamp, id) order, as
+    ``(timestamp, id, type, session_id, latitude, longitude, extra)`` tuples
+    where ``extra`` is (place, address, message) for pinpoints.
+    Sessions of one employee do not overlap, so archives read in order stay sorted.
+    """
+    return heapq.merge(
+        _path_rows(session_ids, after_path, chunk_size),
+        _archived_rows(session_ids, after_path),
+        _pinpoint_rows(session_ids, after_pinpoint, chunk_size),
+        key=lambda row: (row[0], row[2], row[1]),
+    )
+
+
+def encode_cursor(query, after_path, after_pinpoint):
+    """
+    Opaque, signed page cursor: the last (timestamp, id) returned of each
+    kind, bound to the ``query`` (employee and date range) it belongs to.
+    """
+    def key(position):
+        return [position[0].isoformat(), position[1]] if position else None
+    return signing.dumps({"q": query, "p": key(after_path), "n": key(after_pinpoint)}, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor, query):
+    """Inverse of ``encode_cursor``; raises ValueError for bad or foreign cursors"""
+    try:
+        data = signing.loads(cursor, salt=CURSOR_SALT, max_age=settings.LOCATION_HISTORY_CURSOR_MAX_AGE)
+    except signing.BadSignature as e:
+        raise ValueError("Invalid cursor") from e
+    if data.get("q") != query:
+        raise ValueError("Cursor belongs to another query")
+
+    def position(key):
+        if key is None:
+            return None
+        timestamp = parse_datetime(key[0])
+        if timestamp is None:
+            raise ValueError("Invalid cursor")
+        return timestamp, key[1]
+    return position(data.get("p")), position(data.get("n"))
+
+
+def point_payload(row, session_dates):
+    """The location_history dict for a merged row"""
+    timestamp, _, point_type, session_id, latitude, longitude, extra = row
+    data = {
+        'latitude': float(latitude),
+        'longitude': float(longitude),
+        'timestamp': timestamp,
+        'date': session_dates[session_id],
+        'session_id': session_id,
+        'type': point_type,
+    }
+    if extra is not None:
+        place, address, message = extra
+        data.update(place=place or '', address=address or '', message=message or '')
+    return data
+
+
+def stream_history(header, sessions, batch_size=500):
+    """
+    Yield a JSON document: ``header`` fields, ``sessions``, then the merged
+    ``points`` array and ``statistics`` counted along the way. Points are
+    encoded ``batch_size`` at a time, so memory does not grow with the range.
+    """
+    encoder = JSONEncoder()
+    session_dates = {session['id']: session['date'] for session in sessions}
+
+    head = dict(header, sessions=sessions)
+    yield encoder.encode(head)[:-1] + ', "points": ['
+
+    counts = {'path': 0, 'pinpoint': 0}
+    batch = []
+    for row in merged_points(list(session_dates)):
+        counts[row[2]] += 1
+        batch.append(encoder.encode(point_payload(row, session_dates)))
+        if len(batch) >= batch_size:
+            yield ("," if counts['path'] + counts['pinpoint'] > len(batch) else "") + ",".join(batch)
+            batch = []
+    if batch:
+        yield ("," if counts['path'] + counts['pinpoint'] > len(batch) else "") + ",".join(batch)
+
+    statistics = {
+        'total_path_points': counts['path'],
+        'total_pinpoints': counts['pinpoint'],
+        'total_points': counts['path'] + counts['pinpoint'],
+    }
+    yield '], "statistics": ' + json.dumps(statistics) + '}'
@@ -0,0 +1,329 @@
+"""
+Location ingestion helpers shared by the tracking endpoints.
+
+Every path that stores GPS fixes (single-point updates and batched uploads)
+goes through ``parse_point`` / ``store_points`` so validation and the
+LiveSession bookkeeping stay identical.
+"""
+import datetime
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import daily_activity, live_positions
+from .archive import session_points
+from .geo import haversine_m, path_length_m
+from .geofence import check_points
+from .models import GeofenceEvent, LiveSession, LocationPoint, SyncDevice
+from .trajectory_filter import thin_points
+
+logger = logging.getLogger(__name__)
+
+# Client clocks drift; anything further in the future than this is rejected
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+
+def parse_timestamp(value):
+    """
+    Parse a client-side fix time (ISO-8601 string or epoch seconds/milliseconds).
+    Missing values fall back to the server time.
+    """
+    if value in (None, ""):
+        return timezone.now()
+
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        # Values this large can only be epoch milliseconds
+        seconds = value / 1000 if value > 1e11 else value
+        try:
+            timestamp = datetime.datetime.fromtimestamp(seconds, tz=datetime.timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            raise ValueError(f"Invalid timestamp: {value}")
+    else:
+        timestamp = parse_datetime(str(value))
+        if timestamp is None:
+            raise ValueError(f"Invalid timestamp: {value}")
+        if timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp)
+
+    if timestamp > timezone.now() + MAX_CLOCK_SKEW:
+        raise ValueError(f"Timestamp is in the future: {value}")
+    return timestamp
+
+
+def parse_seq(value):
+    """Parse an optional per-device sequence number"""
+    if value in (None, ""):
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid sequence number: {value}")
+    seq = int(value)
+    if seq <= 0:
+        raise ValueError(f"Invalid sequence number: {value}")
+    return seq
+
+
+def parse_point(data, require_seq=False):
+    """Validate one incoming fix and return it as a plain dict"""
+    lat = float(data.get("latitude", 0))
+    lng = float(data.get("longitude", 0))
+
+    if not (lat and lng):
+        raise ValueError("Invalid coordinates")
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError("Coordinates out of range")
+
+    seq = parse_seq(data.get("seq"))
+    if require_seq:
+        if seq is None:
+            raise ValueError("Sequence number required")
+        if data.get("timestamp") in (None, ""):
+            # A replayed point without its fix time would be stored at the wrong time
+            raise ValueError("Timestamp required")
+
+    return {
+        "latitude": lat,
+        "longitude": lng,
+        "timestamp": parse_timestamp(data.get("timestamp")),
+        "seq": seq,
+    }
+
+
+def parse_points(items, require_seq=False):
+    """
+    Validate a list of fixes. Bad entries are reported instead of failing the
+    whole batch, so one corrupt point never blocks a client's upload queue.
+    """
+    if not isinstance(items, list):
+        raise ValueError("'points' must be a list")
+
+    max_points = settings.LOCATION_BATCH_MAX_POINTS
+    if len(items) > max_points:
+        raise ValueError(f"Too many points in one batch (max {max_points})")
+
+    points = []
+    rejected = []
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("Point must be an object")
+            points.append(parse_point(item, require_seq=require_seq))
+        except (ValueError, TypeError) as e:
+            rejected.append({"index": index, "error": str(e)})
+    return points, rejected
+
+
+def store_points(session, points, device=None):
+    """
+    Thin and persist fixes for a session with a single write, move the
+    session's live position to the newest fix and update its path
+    statistics. The new statistics are set on ``session``. Returns the
+    stored LocationPoints (dropped fixes are not returned).
+    """
+    if not points:
+        return []
+
+    points = sorted(points, key=lambda p: p["timestamp"])
+    newest = points[-1]
+
+    with transaction.atomic():
+        # Lock the row so concurrent uploads for the same session cannot lose updates
+        state = LiveSession.objects.select_for_update().filter(pk=session.pk).values(
+            "last_location_update", "point_count", "distance_m", "first_point_at",
+            "last_point_at", "last_point_latitude", "last_point_longitude", "thinning_stats",
+            "inside_geofences", "local_date", "is_active",
+        ).get()
+
+        anchor = None
+        if state["last_point_at"] is not None and state["last_point_latitude"] is not None:
+            anchor = {
+                "latitude": state["last_point_latitude"],
+                "longitude": state["last_point_longitude"],
+                "timestamp": state["last_point_at"],
+            }
+        thinning = dict(state["thinning_stats"] or {})
+        kept, dropped, carry = thin_points(anchor, points, carry=thinning.get("carry", 0))
+
+        if device is not None and kept:
+            # A concurrent retry may have stored some of these already; the
+            # (device, seq) constraint makes the second insert a no-op
+            seqs = [point["seq"] for point in kept]
+            taken = set(LocationPoint.objects.filter(device=device, seq__in=seqs).values_list("seq", flat=True))
+            objs = [LocationPoint(session=session, device=device, **point) for point in kept if point["seq"] not in taken]
+            LocationPoint.objects.bulk_create(objs, ignore_conflicts=True)
+            # Count only the rows this call inserted (ignored conflicts have no pk to tell)
+            inserted = set(LocationPoint.objects.filter(
+                session=session, device=device, seq__in=[obj.seq for obj in objs],
+            ).values_list("seq", flat=True))
+            objs = [obj for obj in objs if obj.seq in inserted]
+            kept = [point for point in kept if point["seq"] in inserted]
+        else:
+            objs = [LocationPoint(session=session, device=device, **point) for point in kept]
+            if len(objs) == 1:
+                # Single fixes keep returning their id to the caller
+                objs[0].save()
+            elif objs:
+                LocationPoint.objects.bulk_create(objs)
+
+        # Extend the running distance from the last stored point. Late (out of
+        # order) fixes are only counted within their batch; the backfill is exact.
+        fresh = [p for p in kept if anchor is None or p["timestamp"] >= anchor["timestamp"]]
+        late = [p for p in kept if anchor is not None and p["timestamp"] < anchor["timestamp"]]
+        distance = (
+            path_length_m([(p["latitude"], p["longitude"]) for p in ([anchor] if anchor else []) + fresh])
+            + path_length_m([(p["latitude"], p["longitude"]) for p in late])
+        )
+
+        thinning["received"] = thinning.get("received", 0) + len(points)
+        thinning["kept"] = thinning.get("kept", 0) + len(kept)
+        for reason, count in dropped.items():
+            thinning[reason] = thinning.get(reason, 0) + count
+        thinning["carry"] = carry
+
+        stats = {
+            "point_count": state["point_count"] + len(objs),
+            "distance_m": state["distance_m"] + distance,
+            "thinning_stats": thinning,
+        }
+        if kept:
+            stats["first_point_at"] = min(filter(None, [state["first_point_at"], kept[0]["timestamp"]]))
+        if fresh:
+            stats.update(
+                last_point_at=fresh[-1]["timestamp"],
+                last_point_latitude=fresh[-1]["latitude"],
+                last_point_longitude=fresh[-1]["longitude"],
+            )
+        # Geofence crossings, from every new raw fix (thinned or not)
+        arrivals = [p for p in points if anchor is None or p["timestamp"] >= anchor["timestamp"]]
+        events, inside = check_points(session, arrivals, state["inside_geofences"])
+        if events:
+            GeofenceEvent.objects.bulk_create(events)
+        if inside != state["inside_geofences"]:
+            stats["inside_geofences"] = inside
+
+        # The live marker follows the newest raw fix, dropped or not, but
+        # late (replayed) fixes must not drag it backwards. It lives in the
+        # live position registry; the row only gets a periodic copy.
+        entry = live_positions.get(session.employee_id)
+        moved = live_positions.is_newer(entry, session, newest["timestamp"])
+        if moved and entry is None and state["last_location_update"] is not None:
+            moved = state["last_location_update"] <= newest["timestamp"]
+        persist = moved and live_positions.needs_persist(entry)
+        if persist:
+            stats.update(
+                current_latitude=newest["latitude"],
+                current_longitude=newest["longitude"],
+                last_location_update=newest["timestamp"],
+            )
+        LiveSession.objects.filter(pk=session.pk).update(**stats)
+        if objs:
+            daily_activity.points_stored(
+                session.employee_id, state["local_date"], len(objs), distance,
+                kept[0]["timestamp"], kept[-1]["timestamp"],
+            )
+
+        if moved and state["is_active"]:
+            # Still under the row lock, so concurrent uploads cannot reorder it.
+            # Late uploads into a stopped session must not put it back on the map.
+            live_positions.move(
+                session, newest["latitude"], newest["longitude"], newest["timestamp"],
+                entry=entry, persisted=persist,
+            )
+
+    for field, value in stats.items():
+        setattr(session, field, value)
+
+    logger.debug(
+        "Session %s: received %d fix(es), stored %d, dropped %s",
+        session.pk, len(points), len(objs), dropped,
+    )
+    return objs
+
+
+def recompute_session_stats(session):
+    """Recompute a session's path statistics from its stored (or archived) points"""
+    point_count = 0
+    distance = 0.0
+    first_at = last_at = None
+    previous = (None, None)
+    for _, lat, lng, timestamp, _ in session_points(session):
+        if previous[0] is not None:
+            distance += haversine_m(previous[0], previous[1], lat, lng)
+        if first_at is None:
+            first_at = timestamp
+        last_at = timestamp
+        previous = (lat, lng)
+        point_count += 1
+
+    stats = {
+        "point_count": point_count,
+        "pinpoint_count": session.pinpoints.count(),
+        "distance_m": distance,
+        "first_point_at": first_at,
+        "last_point_at": last_at,
+        "last_point_latitude": previous[0],
+        "last_point_longitude": previous[1],
+    }
+    LiveSession.objects.filter(pk=session.pk).update(**stats)
+    return stats
+
+
+def record_pinpoint(session, pinpoint):
+    """Keep the session's and the day's pinpoint counters in step with a newly created pinpoint"""
+    LiveSession.objects.filter(pk=session.pk).update(pinpoint_count=F("pinpoint_count") + 1)
+    daily_activity.pinpoint_added(session, pinpoint.timestamp)
+
+
+def clean_device_id(device_id):
+    """A client's device id, stripped; ValueError unless it has 1-64 characters"""
+    device_id = str(device_id or "").strip()
+    if not device_id or len(device_id) > 64:
+        raise ValueError("A device_id of 1-64 characters is required")
+    return device_id
+
+
+def get_sync_device(user, device_id):
+    """Resolve (or register) the sync state for one of the user's devices"""
+    device, _ = SyncDevice.objects.get_or_create(employee=user, device_id=clean_device_id(device_id))
+    return device
+
+
+def sync_points(session, device, points):
+    """
+    Idempotently store sequenced points from a device.
+
+    The device's ``last_seq`` is an ack watermark: every point up to it was
+    delivered, whether it was stored or dropped by ingest thinning, so a
+    resent chunk skips those sequence numbers before thinning runs again.
+    Returns the accepted/duplicate counts, how many accepted points
+    survived thinning and the device's new watermark.
+    """
+    # Collapse duplicates inside the chunk itself (last copy wins)
+    by_seq = {point["seq"]: point for point in points}
+
+    with transaction.atomic():
+        # Lock the device so concurrent retries of a chunk see each other's watermark
+        acked = SyncDevice.objects.select_for_update().filter(pk=device.pk).values_list("last_seq", flat=True).get()
+        new_points = [point for seq, point in sorted(by_seq.items()) if seq > acked]
+        stored = store_points(session, new_points, device=device)
+        if by_seq:
+            SyncDevice.objects.filter(pk=device.pk).update(
+                last_seq=Greatest(F("last_seq"), max(by_seq)),
+                last_sync_at=timezone.now(),
+            )
+
+    device.refresh_from_db(fields=["last_seq", "last_sync_at"])
+    if not new_points:
+        # Nothing stored, so store_points did not refresh the counters
+        session.refresh_from_db(fields=["point_count"])
+    return {
+        "accepted": len(new_points),
+        "stored": len(stored),
+        "duplicates": len(points) - len(new_points),
+        "ack_seq": device.last_seq,
+    }
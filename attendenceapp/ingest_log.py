@@ -0,0 +1,225 @@
+"""
+Write-behind buffer for location ingestion.
+
+When LOCATION_INGEST_MODE is "buffered", accepted points are appended to a
+local append-only log instead of being written to the database in the
+request (the request still reads the active session; sync devices are
+registered by the flusher). The ``flush_location_log`` management command
+drains the log into LocationPoint with bulk inserts.
+
+Layout: every web process writes its own segment files
+(``<millis>-<host>-<pid>.log``, one JSON record per line) and rolls to a new
+segment every LOCATION_INGEST_SEGMENT_SECONDS. The flusher stores how far it
+got in each segment in IngestLogCursor, inside the same transaction as the
+inserted points, so a crash at any point replays exactly the records that
+were not committed yet. Each batch locks its cursor row, so flushers running
+concurrently never store the same records twice.
+
+Records that cannot be stored (corrupt lines, invalid points, unknown
+device ids) are appended to a ``<segment>.dead`` file next to the segment
+and logged, so one bad record never blocks the rest of its segment.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+
+from . import live_positions
+from .ingest import clean_device_id, get_sync_device, parse_point, store_points, sync_points
+from .models import IngestLogCursor, LiveSession
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".log"
+DEAD_LETTER_SUFFIX = ".dead"
+
+
+def is_enabled():
+    return settings.LOCATION_INGEST_MODE == "buffered"
+
+
+def log_dir():
+    path = Path(settings.LOCATION_INGEST_LOG_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+class SegmentWriter:
+    """Per-process appender; safe to share between request threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = None
+        self._opened_at = 0
+
+    def _open_segment(self):
+        if self._file is not None:
+            self._file.close()
+        name = f"{int(time.time() * 1000)}-{socket.gethostname()}-{os.getpid()}{SEGMENT_SUFFIX}"
+        # O_APPEND + one write() per batch keeps records whole
+        fd = os.open(log_dir() / name, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o640)
+        self._file = os.fdopen(fd, "ab", buffering=0)
+        self._pid = os.getpid()
+        self._opened_at = time.monotonic()
+
+    def append(self, records):
+        data = b"".join(
+            json.dumps(record, separators=(",", ":")).encode() + b"\n" for record in records
+        )
+        with self._lock:
+            # Reopen after a fork (gunicorn preload) or when the segment is due to roll
+            if (
+                self._file is None
+                or self._pid != os.getpid()
+                or time.monotonic() - self._opened_at > settings.LOCATION_INGEST_SEGMENT_SECONDS
+            ):
+                self._open_segment()
+            self._file.write(data)
+            if settings.LOCATION_INGEST_FSYNC:
+                os.fsync(self._file.fileno())
+
+
+_writer = SegmentWriter()
+
+
+def append_points(session, points, device_id=None):
+    """
+    Durably queue parsed points for a session; the flusher stores them later.
+    ``device_id`` is the client's (validated) device id; its SyncDevice is
+    resolved at flush time so the request writes nothing to the database.
+    """
+    newest = max(points, key=lambda p: p["timestamp"])
+    _writer.append([
+        {
+            "session": session.pk,
+            "device_id": device_id,
+            "latitude": point["latitude"],
+            "longitude": point["longitude"],
+            "timestamp": point["timestamp"].isoformat(),
+            "seq": point["seq"],
+        }
+        for point in points
+    ])
+    # The flusher runs in another process, so move the marker from here
+    entry = live_positions.get(session.employee_id)
+    if live_positions.is_newer(entry, session, newest["timestamp"]):
+        live_positions.move(session, newest["latitude"], newest["longitude"], newest["timestamp"], entry=entry)
+
+
+def _dead_letter(path, lines, reason):
+    """Set unusable records aside next to their segment instead of retrying them forever"""
+    with open(path.with_suffix(DEAD_LETTER_SUFFIX), "ab") as f:
+        f.write(b"".join(line if line.endswith(b"\n") else line + b"\n" for line in lines))
+    logger.error("Moved %d ingest log record(s) of %s aside (%s)", len(lines), path.name, reason)
+
+
+def _read_records(path, offset, limit):
+    """Read up to ``limit`` complete lines from ``offset``; returns (records, new_offset)"""
+    records = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                # Partially written record; the writer has not finished it yet
+                break
+            offset += len(line)
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                _dead_letter(path, [line], f"corrupt record at byte {offset - len(line)}")
+            if len(records) >= limit:
+                break
+    return records, offset
+
+
+def _parse_record(record):
+    """(session id, device id or None, point) of a logged record; ValueError/TypeError/KeyError when invalid"""
+    session_id = int(record["session"])
+    device_id = clean_device_id(record["device_id"]) if record.get("device_id") else None
+    return session_id, device_id, parse_point(record)
+
+
+def _store_records(path, records):
+    grouped = defaultdict(list)
+    invalid = []
+    for record in records:
+        try:
+            session_id, device_id, point = _parse_record(record)
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            invalid.append((record, e))
+            continue
+        grouped[(session_id, device_id)].append(point)
+    if invalid:
+        _dead_letter(
+            path, [json.dumps(record, separators=(",", ":")).encode() for record, _ in invalid],
+            f"invalid: {invalid[0][1]!r}",
+        )
+
+    sessions = LiveSession.objects.select_related("employee").in_bulk({session_id for session_id, _ in grouped})
+
+    stored = 0
+    for (session_id, device_id), points in grouped.items():
+        session = sessions.get(session_id)
+        if session is None:
+            logger.warning("Dropping %d buffered point(s) for deleted session %s", len(points), session_id)
+            continue
+        device = get_sync_device(session.employee, device_id) if device_id else None
+        if device is not None and all(point["seq"] is not None for point in points):
+            stored += sync_points(session, device, points)["stored"]
+        else:
+            # One bulk insert and one live-position update per session
+            stored += len(store_points(session, points))
+    return stored
+
+
+def _flush_segment(path, batch_size, seal_after):
+    stored = 0
+    if path.exists():
+        IngestLogCursor.objects.get_or_create(segment=path.name)
+
+    while True:
+        with transaction.atomic():
+            # Locked until the batch commits: a concurrent flusher waits here
+            # and then continues from the offset this one stored
+            cursor = IngestLogCursor.objects.select_for_update().filter(segment=path.name).first()
+            if cursor is None:
+                # Another flusher finished and removed the segment
+                return stored
+            if not path.exists():
+                cursor.delete()
+                return stored
+
+            records, new_offset = _read_records(path, cursor.offset, batch_size)
+            if new_offset == cursor.offset:
+                # Writers roll segments by age, so an old segment will not grow again
+                if time.time() - path.stat().st_mtime > seal_after:
+                    if path.stat().st_size > cursor.offset:
+                        logger.error("Discarding %d trailing byte(s) of unfinished record in %s",
+                                     path.stat().st_size - cursor.offset, path.name)
+                    path.unlink()
+                    cursor.delete()
+                return stored
+
+            stored += _store_records(path, records)
+            # Committed together with the points: a crash replays only uncommitted records
+            IngestLogCursor.objects.filter(pk=cursor.pk).update(offset=new_offset)
+
+
+def flush(batch_size=5000):
+    """
+    Drain every segment into the database. Returns the number of points stored.
+    Fully drained segments that are no longer being written are deleted.
+    """
+    stored = 0
+    seal_after = settings.LOCATION_INGEST_SEGMENT_SECONDS * 2
+    for path in sorted(log_dir().glob(f"*{SEGMENT_SUFFIX}")):
+        stored += _flush_segment(path, batch_size, seal_after)
+    return stored
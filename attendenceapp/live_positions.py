@@ -0,0 +1,528 @@
+"""
+Live position registry: the latest fix of every employee with an active
+session, as shown on the admin live map.
+
+Positions live in Django's cache, one entry per employee, plus a members
+map (employee id -> session id) maintained at session start and stop.
+Ingest writes the entry on every marker move and the live map reads only
+from the cache. The LiveSession row's current_* columns are a persisted
+copy, written at most every LIVE_POSITION_PERSIST_SECONDS and at session
+stop; they seed the registry again when the cache has been cleared.
+
+The members, cells and tombstone maps are read-modify-written under a
+database named lock (``_locked``): the cache's own add() is not atomic on
+every backend (the file-based default), and the database lock is released
+with the connection if its holder dies. Ingest still updates the
+LiveSession row once per upload for the path statistics (point count,
+distance, thinning anchor); only the live-map position moved off that
+row. Batched and buffered uploads amortise that write.
+
+A grid index over the same entries answers "who is near here": each
+occupied LIVE_GRID_CELL_DEG cell lists the employees in it, and a set of
+occupied cells lets ``nearest`` and ``within_bbox`` skip empty ground, so
+a lookup only reads the occupied cells around the query point.
+
+Every change bumps a global version. The version is a hybrid clock:
+microseconds since the epoch, forced to increase on each bump. It is the
+live map's ETag, so pollers of an idle fleet get a 304 without a query.
+It also serves as the ``since`` token for fetching only what changed. Each
+entry records the version it was written at (not its fix time, so late and
+offline fixes are deltas too), and ended sessions leave a tombstone for
+LIVE_POSITION_TOMBSTONE_SECONDS. A writer takes its version before its
+entry lands in the cache, so a reader can see the version first; deltas
+therefore reach back IN_FLIGHT_MICROSECONDS before ``since`` and may repeat
+a position, which clients apply idempotently.
+"""
+import datetime
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .geo import grid_cell, grid_cell_min_side_m, haversine_m
+from .models import LiveSession
+
+VERSION_KEY = "live_positions:version"
+MEMBERS_KEY = "live_positions:members"
+REMOVED_KEY = "live_positions:removed"
+CELLS_KEY = "live_positions:cells"
+LOCK_NAME = "attendenceapp.live_positions"
+
+# How far deltas overlap the previous response, for writes still in flight
+IN_FLIGHT_MICROSECONDS = 2_000_000
+
+
+def _key(employee_id):
+    return f"live_position:{employee_id}"
+
+
+def _cell_key(cell):
+    return f"live_cell:{cell[0]}:{cell[1]}"
+
+
+class RegistryLockTimeout(Exception):
+    """The registry lock was not acquired in time"""
+
+
+# Stand-in for databases without named locks (SQLite in development: one process).
+# Not re-entrant: code running under the lock never takes it again.
+_process_lock = threading.Lock()
+
+
+@contextmanager
+def _locked(timeout=5):
+    """
+    Serialise read-modify-write of the shared members/cells/tombstone maps.
+
+    Uses a named lock of the database connection (MySQL GET_LOCK, PostgreSQL
+    advisory lock): it is independent of transactions, only its holder can
+    release it and it is dropped with the holder's connection. Code under
+    the lock uses the ``*_locked`` helpers, which never rebuild the registry
+    (rebuilding places entries, which takes the lock).
+    """
+    if connection.vendor == "mysql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT GET_LOCK(%s, %s)", [LOCK_NAME, timeout])
+            acquired = cursor.fetchone()[0] == 1
+        release = ("SELECT RELEASE_LOCK(%s)", [LOCK_NAME])
+    elif connection.vendor == "postgresql":
+        key = zlib.crc32(LOCK_NAME.encode())
+        deadline = time.monotonic() + timeout
+        with connection.cursor() as cursor:
+            while True:
+                cursor.execute("SELECT pg_try_advisory_lock(%s)", [key])
+                acquired = cursor.fetchone()[0]
+                if acquired or time.monotonic() > deadline:
+                    break
+                time.sleep(0.005)
+        release = ("SELECT pg_advisory_unlock(%s)", [key])
+    else:
+        acquired = _process_lock.acquire(timeout=timeout)
+        release = None
+    if not acquired:
+        raise RegistryLockTimeout(f"Live position registry lock not acquired within {timeout}s")
+
+    try:
+        yield
+    finally:
+        if release is None:
+            _process_lock.release()
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute(*release)
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Cache was cleared: start a new epoch above anything handed out before
+        version = bump_version()
+    return version
+
+
+def bump_version():
+    """Record that the live map changed; returns the new version"""
+    version = max(int(time.time() * 1_000_000), (cache.get(VERSION_KEY) or 0) + 1)
+    cache.set(VERSION_KEY, version, timeout=None)
+    return version
+
+
+def etag(version):
+    return f'"live-{version}"'
+
+
+def datetime_to_version(value):
+    return int(value.timestamp() * 1_000_000)
+
+
+def _employee_name(session):
+    # Only use the employee when it is already loaded; never query from ingest
+    employee = session._state.fields_cache.get("employee")
+    return employee.username if employee is not None else None
+
+
+# Registry writes
+
+def session_started(session):
+    """Put a new session on the map (without a position until its first fix)"""
+    entry = {
+        "session_id": session.pk,
+        "employee": _employee_name(session),
+        "latitude": None,
+        "longitude": None,
+        "timestamp": None,
+        "persisted_at": None,
+        "version": bump_version(),
+    }
+    cache.set(_key(session.employee_id), entry, timeout=None)
+    _members()
+    with _locked():
+        members = _members_locked()
+        members[session.employee_id] = session.pk
+        cache.set(MEMBERS_KEY, members, timeout=None)
+
+
+def get(employee_id):
+    return cache.get(_key(employee_id))
+
+
+def is_newer(entry, session, timestamp):
+    """Whether a fix at ``timestamp`` should move the session's marker"""
+    if entry is None or entry["session_id"] != session.pk or entry["timestamp"] is None:
+        return True
+    return entry["timestamp"] <= timestamp
+
+
+def needs_persist(entry):
+    """Whether the persisted current_* copy of this entry is due for a refresh"""
+    if entry is None or entry.get("persisted_at") is None:
+        return True
+    return time.time() - entry["persisted_at"] >= settings.LIVE_POSITION_PERSIST_SECONDS
+
+
+def move(session, latitude, longitude, timestamp, entry=None, persisted=False):
+    """Move the session's marker (callers check ``is_newer`` first)"""
+    if entry is None or entry["session_id"] != session.pk:
+        entry = {
+            "session_id": session.pk,
+            "employee": None,
+            "persisted_at": None,
+            "cell": entry.get("cell") if entry else None,
+        }
+    entry = dict(
+        entry,
+        latitude=latitude,
+        longitude=longitude,
+        timestamp=timestamp,
+        employee=entry["employee"] or _employee_name(session),
+        version=bump_version(),
+    )
+    if persisted:
+        entry["persisted_at"] = time.time()
+
+    old_cell = entry.get("cell")
+    entry["cell"] = grid_cell(latitude, longitude, settings.LIVE_GRID_CELL_DEG)
+    cache.set(_key(session.employee_id), entry, timeout=None)
+    if _members().get(session.employee_id) != session.pk:
+        # Membership was lost (the members map was evicted, or rebuilt
+        # without this session); the map only shows members
+        with _locked():
+            members = _members_locked()
+            if members.get(session.employee_id) != session.pk:
+                members[session.employee_id] = session.pk
+                cache.set(MEMBERS_KEY, members, timeout=None)
+    _place(session.employee_id, session.pk, old_cell, entry["cell"])
+    return entry
+
+
+def session_ended(session):
+    """
+    Take a stopped session off the map. Returns its last registry entry
+    (or None) so the caller can persist the final position.
+    """
+    entry = get(session.employee_id)
+    if entry is not None and entry["session_id"] != session.pk:
+        # The employee is already on the map with a newer session
+        return None
+    cache.delete(_key(session.employee_id))
+
+    version = bump_version()
+    horizon = version - settings.LIVE_POSITION_TOMBSTONE_SECONDS * 1_000_000
+    _members()
+    with _locked():
+        members = _members_locked()
+        members.pop(session.employee_id, None)
+        cache.set(MEMBERS_KEY, members, timeout=None)
+        if entry is not None and entry.get("cell") is not None:
+            _cell_discard(entry["cell"], session.employee_id)
+
+        removed = {
+            employee_id: removed_at
+            for employee_id, removed_at in (cache.get(REMOVED_KEY) or {}).items()
+            if removed_at > horizon
+        }
+        removed[session.employee_id] = version
+        cache.set(REMOVED_KEY, removed, timeout=None)
+    return entry
+
+
+# Registry reads
+
+def _members():
+    members = cache.get(MEMBERS_KEY)
+    if members is None:
+        members = _rebuild()
+    return members
+
+
+def _members_locked():
+    # Under the lock: fall back to the database instead of rebuilding
+    members = cache.get(MEMBERS_KEY)
+    if members is None:
+        members = dict(LiveSession.objects.filter(is_active=True).values_list("employee_id", "pk"))
+    return members
+
+
+def _rebuild(employee_ids=None):
+    """Seed registry entries from the persisted current_* columns (never call under the lock)"""
+    sessions = LiveSession.objects.filter(is_active=True).select_related("employee")
+    if employee_ids is not None:
+        sessions = sessions.filter(employee_id__in=employee_ids)
+
+    version = bump_version()
+    members = {}
+    placed = []
+    for session in sessions:
+        members[session.employee_id] = session.pk
+        cell = None
+        if session.current_latitude is not None and session.current_longitude is not None:
+            cell = grid_cell(session.current_latitude, session.current_longitude, settings.LIVE_GRID_CELL_DEG)
+        if cache.add(_key(session.employee_id), {
+            "session_id": session.pk,
+            "employee": session.employee.username,
+            "latitude": session.current_latitude,
+            "longitude": session.current_longitude,
+            # Rows persisted before their first fix have no update time yet
+            "timestamp": session.last_location_update or session.start_time,
+            "persisted_at": time.time(),
+            "version": version,
+            "cell": cell,
+        }, timeout=None) and cell is not None:
+            placed.append((session.employee_id, session.pk, cell))
+
+    if placed:
+        with _locked():
+            for employee_id, session_id, cell in placed:
+                _place_locked(employee_id, session_id, None, cell)
+    if employee_ids is None:
+        cache.add(MEMBERS_KEY, members, timeout=None)
+    return members
+
+
+def _entries():
+    members = _members()
+    entries = cache.get_many([_key(employee_id) for employee_id in members])
+    missing = [employee_id for employee_id in members if _key(employee_id) not in entries]
+    if missing:
+        # Evicted by the cache backend
+        _rebuild(missing)
+        entries.update(cache.get_many([_key(employee_id) for employee_id in missing]))
+
+    for employee_id, session_id in members.items():
+        entry = entries.get(_key(employee_id))
+        if entry is not None and entry["session_id"] == session_id and entry["latitude"] is not None:
+            yield employee_id, entry
+
+
+# Spatial grid
+
+def _place(employee_id, session_id, old_cell, new_cell):
+    """Keep the grid in step with a marker move (cheap when the cell is unchanged)"""
+    if old_cell == new_cell and (cache.get(_cell_key(new_cell)) or {}).get(employee_id) == session_id:
+        return
+    _occupied_cells()
+    with _locked():
+        _place_locked(employee_id, session_id, old_cell, new_cell)
+
+
+def _place_locked(employee_id, session_id, old_cell, new_cell):
+    # Callers hold the lock
+    if old_cell is not None and old_cell != new_cell:
+        _cell_discard(old_cell, employee_id)
+    occupants = cache.get(_cell_key(new_cell)) or {}
+    occupants[employee_id] = session_id
+    cache.set(_cell_key(new_cell), occupants, timeout=None)
+    cells = _occupied_cells_locked()
+    if new_cell not in cells:
+        cells.add(new_cell)
+        cache.set(CELLS_KEY, cells, timeout=None)
+
+
+def _cell_discard(cell, employee_id):
+    # Callers hold the lock
+    occupants = cache.get(_cell_key(cell)) or {}
+    occupants.pop(employee_id, None)
+    if occupants:
+        cache.set(_cell_key(cell), occupants, timeout=None)
+        return
+    cache.delete(_cell_key(cell))
+    cells = _occupied_cells_locked()
+    cells.discard(cell)
+    cache.set(CELLS_KEY, cells, timeout=None)
+
+
+def _cells_of(members):
+    entries = cache.get_many([_key(employee_id) for employee_id in members])
+    return {entry["cell"] for entry in entries.values() if entry.get("cell") is not None}
+
+
+def _occupied_cells():
+    cells = cache.get(CELLS_KEY)
+    if cells is None:
+        # Evicted: recover it from the registry entries (add: a locked writer may be first)
+        cells = _cells_of(_members())
+        cache.add(CELLS_KEY, cells, timeout=None)
+    return cells
+
+
+def _occupied_cells_locked():
+    # Under the lock: recover from the entries without rebuilding the members
+    cells = cache.get(CELLS_KEY)
+    if cells is None:
+        cells = _cells_of(_members_locked())
+    return cells
+
+
+def _cell_entries(cells):
+    """Registry entries of the employees currently in ``cells``"""
+    if not cells:
+        return []
+    occupants = cache.get_many([_cell_key(cell) for cell in cells])
+    wanted = {}
+    for cell in cells:
+        for employee_id, session_id in occupants.get(_cell_key(cell), {}).items():
+            wanted[employee_id] = (cell, session_id)
+    entries = cache.get_many([_key(employee_id) for employee_id in wanted])
+
+    found = []
+    for employee_id, (cell, session_id) in wanted.items():
+        entry = entries.get(_key(employee_id))
+        # Skip occupants that moved on or ended since the cell was written
+        if entry is not None and entry["session_id"] == session_id and entry.get("cell") == cell:
+            found.append((employee_id, entry))
+    return found
+
+
+def nearest(latitude, longitude, k, max_distance_m):
+    """
+    The ``k`` live employees closest to a point, within ``max_distance_m``.
+    Returns ``[(distance_m, employee_id, entry)]`` sorted by distance.
+
+    Cells are visited in square rings around the query cell; the search stops
+    once the k-th distance is below the nearest any unvisited ring can be.
+    """
+    cell_deg = settings.LIVE_GRID_CELL_DEG
+    row, col = grid_cell(latitude, longitude, cell_deg)
+    occupied = _occupied_cells()
+    unvisited = len(occupied)
+    found = []
+    radius = 0
+    while unvisited:
+        ring = [cell for cell in _ring(row, col, radius) if cell in occupied]
+        unvisited -= len(ring)
+        for employee_id, entry in _cell_entries(ring):
+            distance = haversine_m(latitude, longitude, entry["latitude"], entry["longitude"])
+            if distance <= max_distance_m:
+                found.append((distance, employee_id, entry))
+
+        # Anything in a later ring is at least ``radius`` whole cells away
+        bound = radius * grid_cell_min_side_m(row, radius + 1, cell_deg)
+        found.sort(key=lambda item: item[0])
+        if bound > max_distance_m or (len(found) >= k and found[k - 1][0] <= bound):
+            break
+        radius += 1
+    return found[:k]
+
+
+def _ring(row, col, radius):
+    """Cells at Chebyshev distance ``radius`` from (row, col)"""
+    if radius == 0:
+        return [(row, col)]
+    cells = []
+    for c in range(col - radius, col + radius + 1):
+        cells.append((row - radius, c))
+        cells.append((row + radius, c))
+    for r in range(row - radius + 1, row + radius):
+        cells.append((r, col - radius))
+        cells.append((r, col + radius))
+    return cells
+
+
+def within_bbox(south, west, north, east):
+    """Live employees inside a bounding box, as ``[(employee_id, entry)]``"""
+    cell_deg = settings.LIVE_GRID_CELL_DEG
+    low = grid_cell(south, west, cell_deg)
+    high = grid_cell(north, east, cell_deg)
+    occupied = _occupied_cells()
+    if (high[0] - low[0] + 1) * (high[1] - low[1] + 1) <= len(occupied):
+        cells = [
+            (r, c) for r in range(low[0], high[0] + 1) for c in range(low[1], high[1] + 1)
+            if (r, c) in occupied
+        ]
+    else:
+        # A box wider than the fleet: cheaper to scan the occupied cells
+        cells = [
+            cell for cell in occupied
+            if low[0] <= cell[0] <= high[0] and low[1] <= cell[1] <= high[1]
+        ]
+    return [
+        (employee_id, entry) for employee_id, entry in _cell_entries(cells)
+        if south <= entry["latitude"] <= north and west <= entry["longitude"] <= east
+    ]
+
+
+def position_payload(entry):
+    return {
+        'latitude': entry["latitude"],
+        'longitude': entry["longitude"],
+        'timestamp': entry["timestamp"].isoformat() if entry["timestamp"] is not None else None,
+        'employee': entry["employee"],
+        'session_id': entry["session_id"]
+    }
+
+
+def snapshot():
+    """Live positions keyed by employee id (the live_all_locations payload)"""
+    return {str(employee_id): position_payload(entry) for employee_id, entry in _entries()}
+
+
+def changes_since(since_version):
+    """
+    Positions written after ``since_version`` and the employees taken off the
+    map since then. Returns ``(positions, removed, full)``; ``full`` is True
+    when ``since_version`` predates the tombstones and everything is resent.
+    """
+    current = current_version()
+    horizon = current - settings.LIVE_POSITION_TOMBSTONE_SECONDS * 1_000_000
+    if since_version < horizon:
+        return snapshot(), [], True
+
+    cutoff = since_version - IN_FLIGHT_MICROSECONDS
+    positions = {
+        str(employee_id): position_payload(entry)
+        for employee_id, entry in _entries()
+        if entry["version"] > cutoff
+    }
+    removed = sorted(
+        str(employee_id)
+        for employee_id, removed_at in (cache.get(REMOVED_KEY) or {}).items()
+        if removed_at > cutoff and str(employee_id) not in positions
+    )
+    return positions, removed, False
+
+
+def parse_since(value):
+    """
+    Parse a ``since`` parameter into a version: a version from an earlier
+    response, an ISO-8601 timestamp or epoch seconds/milliseconds.
+    """
+    value = str(value).strip()
+    if value.isdigit():
+        number = int(value)
+        if number > 1e14:
+            return number
+        seconds = number / 1000 if number > 1e11 else number
+        return int(seconds * 1_000_000)
+
+    since = parse_datetime(value)
+    if since is None:
+        raise ValueError(f"Invalid since value: {value}")
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return datetime_to_version(since)
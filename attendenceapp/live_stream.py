@@ -0,0 +1,129 @@
+"""
+Server-sent events for the admin live map.
+
+``live_stream`` (an async view, served through attendence/asgi.py) follows
+the live position registry, which every process that ingests locations
+writes to (WSGI and ASGI workers, the ``flush_location_log`` command). Each
+stream polls the registry version every LIVE_STREAM_POLL_SECONDS, one cache
+read, and sends what changed since its last poll as ``position`` and
+``session_ended`` events. Sessions show up with their first fix.
+
+EventSource cannot send an Authorization header, so a dashboard first
+POSTs to ``stream_ticket`` (with its JWT) and opens the stream with
+``?ticket=``: a signed, stream-only value that expires after
+LIVE_STREAM_TICKET_SECONDS, so an access-logged URL does not leak a usable
+API token. A ticket is checked when the stream is opened; a client whose
+reconnect is refused fetches a new ticket.
+
+Event ids are registry versions. A reconnecting client sends the last id
+it saw in ``Last-Event-ID`` and receives what changed since then, or a full
+``snapshot`` event when the tombstones no longer reach back that far. Like
+the ``?since=`` deltas of the live map, a resumed stream may repeat a
+position.
+"""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework.exceptions import AuthenticationFailed
+
+from . import live_positions
+
+
+def _format(event_id, event_type, data):
+    payload = json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":"))
+    return f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n"
+
+
+TICKET_SALT = "attendenceapp.live_stream.ticket"
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def stream_ticket(request):
+    """A short-lived ticket for opening the live stream with ?ticket="""
+    if request.user.role != "admin":
+        return Response({"detail": "Forbidden"}, status=403)
+    ticket = signing.TimestampSigner(salt=TICKET_SALT).sign(str(request.user.pk))
+    return Response({"ticket": ticket, "expires_in": settings.LIVE_STREAM_TICKET_SECONDS}, status=200)
+
+
+def _authenticate(request):
+    """JWT from the Authorization header, or a ?ticket= from stream_ticket"""
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+    if result is not None:
+        return result[0]
+
+    ticket = request.GET.get("ticket")
+    if not ticket:
+        return None
+    try:
+        user_id = signing.TimestampSigner(salt=TICKET_SALT).unsign(
+            ticket, max_age=settings.LIVE_STREAM_TICKET_SECONDS
+        )
+    except signing.BadSignature:
+        return None
+    return get_user_model().objects.filter(pk=user_id, is_active=True).first()
+
+
+async def live_stream(request):
+    """SSE stream of live position deltas for the admin dashboard"""
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"detail": "The live stream is only available through the ASGI server."}, status=501)
+
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided or are invalid."}, status=401)
+    if user.role != "admin":
+        return JsonResponse({"detail": "Forbidden"}, status=403)
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id") or ""
+    version = int(last_event_id) if last_event_id.isdigit() else None
+
+    async def events():
+        nonlocal version
+        yield f"retry: {settings.LIVE_STREAM_RETRY_MS}\n\n"
+        if version is None:
+            version = await sync_to_async(live_positions.current_version)()
+            snapshot = await sync_to_async(live_positions.snapshot)()
+            yield _format(version, "snapshot", snapshot)
+
+        idle_since = time.monotonic()
+        while True:
+            current = await sync_to_async(live_positions.current_version)()
+            if current != version:
+                positions, removed, full = await sync_to_async(live_positions.changes_since)(version)
+                version = current
+                idle_since = time.monotonic()
+                if full:
+                    yield _format(version, "snapshot", positions)
+                else:
+                    for employee_id, position in positions.items():
+                        yield _format(version, "position", dict(position, employee_id=employee_id))
+                    for employee_id in removed:
+                        yield _format(version, "session_ended", {"employee_id": employee_id})
+            elif time.monotonic() - idle_since >= settings.LIVE_STREAM_HEARTBEAT_SECONDS:
+                # Comment line keeps proxies from closing an idle connection
+                idle_since = time.monotonic()
+                yield ": heartbeat\n\n"
+            await asyncio.sleep(settings.LIVE_STREAM_POLL_SECONDS)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,52 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.utils import timezone
+from attendenceapp.models import LiveSession
+from attendenceapp.archive import archive_session
+
+class Command(BaseCommand):
+    help = 'Packs the paths of closed sessions into compressed archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=0,
+            help='Only archive sessions that ended more than this many days ago',
+        )
+        parser.add_argument(
+            '--session',
+            type=int,
+            action='append',
+            dest='sessions',
+            help='Only archive this session id (repeatable)',
+        )
+        parser.add_argument(
+            '--delete-raw',
+            action='store_true',
+            default=settings.LOCATION_ARCHIVE_DELETE_RAW,
+            help='Delete the LocationPoint rows once they are archived',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Re-archive sessions that already have an archive',
+        )
+
+    def handle(self, *args, **options):
+        sessions = LiveSession.objects.filter(
+            is_active=False,
+            end_time__lt=timezone.now() - timedelta(days=options['days']),
+        ).select_related('path_archive').order_by('id')
+        if options['sessions']:
+            sessions = sessions.filter(id__in=options['sessions'])
+        if not options['all']:
+            sessions = sessions.filter(path_archive__isnull=True)
+
+        archived = 0
+        for session in sessions.iterator():
+            if archive_session(session, delete_raw=options['delete_raw']):
+                archived += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} session(s)."))
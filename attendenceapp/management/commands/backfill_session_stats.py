@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from attendenceapp.models import LiveSession
+from attendenceapp.ingest import recompute_session_stats
+
+class Command(BaseCommand):
+    help = 'Recomputes point/pinpoint counters, distance and first/last point times on LiveSession'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--session',
+            type=int,
+            action='append',
+            dest='sessions',
+            help='Only recompute this session id (repeatable)',
+        )
+
+    def handle(self, *args, **options):
+        sessions = LiveSession.objects.order_by('id')
+        if options['sessions']:
+            sessions = sessions.filter(id__in=options['sessions'])
+
+        updated = 0
+        for session in sessions.iterator():
+            stats = recompute_session_stats(session)
+            updated += 1
+            self.stdout.write(
+                f"Session {session.id}: {stats['point_count']} points, "
+                f"{stats['pinpoint_count']} pinpoints, {stats['distance_m']:.0f} m"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled statistics for {updated} session(s)."))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from attendenceapp.gazetteer import build
+
+class Command(BaseCommand):
+    help = 'Builds the offline reverse-geocoding gazetteer from a CSV of place/road points'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'csv_file',
+            help='CSV with latitude, longitude, name and optional locality, city, state columns',
+        )
+        parser.add_argument(
+            '--output',
+            default=settings.GAZETTEER_PATH,
+            help='Gazetteer path; becomes a symlink to the new build',
+        )
+        parser.add_argument(
+            '--cell-deg',
+            type=float,
+            default=settings.GAZETTEER_CELL_DEG,
+            help='Grid cell size of the index, in degrees',
+        )
+
+    def handle(self, *args, **options):
+        meta = build(options['csv_file'], options['output'], options['cell_deg'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Built gazetteer of {meta['points']} place(s) with {meta['labels']} address(es) "
+            f"in {meta['cells']} cell(s) at {options['output']}."
+        ))
@@ -0,0 +1,44 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from attendenceapp.models import LiveSession
+from attendenceapp.stay_points import detect_visits
+
+class Command(BaseCommand):
+    help = 'Detects stops (stay points) in the stored session paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=1,
+            help='Detect in closed sessions started within this many days (default: 1)',
+        )
+        parser.add_argument(
+            '--session',
+            type=int,
+            action='append',
+            dest='sessions',
+            help='Only detect in this session id (repeatable, active sessions included)',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Re-detect sessions whose visits were already detected',
+        )
+
+    def handle(self, *args, **options):
+        if options['sessions']:
+            sessions = LiveSession.objects.filter(id__in=options['sessions'])
+        else:
+            since = timezone.localdate() - timedelta(days=options['days'] - 1)
+            sessions = LiveSession.objects.on_dates(since, timezone.localdate()).filter(is_active=False)
+            if not options['all']:
+                sessions = sessions.filter(visits_detected_at__isnull=True)
+
+        detected = visits = 0
+        for session in sessions.select_related('path_archive').order_by('id').iterator():
+            visits += len(detect_visits(session))
+            detected += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Detected {visits} visit(s) in {detected} session(s)."))
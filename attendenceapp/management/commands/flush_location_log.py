@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand
+from attendenceapp import ingest_log
+
+class Command(BaseCommand):
+    help = 'Drains the write-behind location log into the database (LOCATION_INGEST_MODE=buffered)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and flush every --interval seconds',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Seconds between flushes in --loop mode',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Maximum records stored per transaction',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            stored = ingest_log.flush(batch_size=options['batch_size'])
+            if stored or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f"Flushed {stored} buffered location point(s)."))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from attendenceapp.geocode_worker import due_pinpoints, resolve
+
+class Command(BaseCommand):
+    help = 'Geocodes pending pinpoint addresses whose retry is due (e.g. left over after a restart)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=500,
+            help='Resolve at most this many pinpoints (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        outcomes = {'resolved': 0, 'pending': 0, 'failed': 0}
+        for pinpoint_id in due_pinpoints().order_by('id').values_list('id', flat=True)[:options['limit']]:
+            status = resolve(pinpoint_id, schedule_retry=False)
+            if status is not None:
+                outcomes[status] += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Resolved {outcomes['resolved']} pinpoint address(es); "
+            f"{outcomes['pending']} will be retried, {outcomes['failed']} failed."
+        ))
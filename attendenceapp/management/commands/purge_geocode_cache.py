@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from attendenceapp.geocode_cache import purge
+
+class Command(BaseCommand):
+    help = 'Deletes expired reverse-geocode cache rows and trims the table to GEOCODE_CACHE_MAX_ENTRIES'
+
+    def handle(self, *args, **options):
+        deleted = purge()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} geocode cache row(s)."))
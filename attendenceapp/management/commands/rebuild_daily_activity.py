@@ -0,0 +1,60 @@
+import datetime
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from attendenceapp.daily_activity import rebuild
+from attendenceapp.models import LiveSession
+
+class Command(BaseCommand):
+    help = 'Recomputes the per-employee daily activity rollup from the sessions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=31,
+            help='Rebuild the days within this many days back, today included (default: 31)',
+        )
+        parser.add_argument(
+            '--start-date',
+            help='First day to rebuild (YYYY-MM-DD); overrides --days',
+        )
+        parser.add_argument(
+            '--end-date',
+            help='Last day to rebuild (YYYY-MM-DD, default: today)',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Rebuild every day since the first session; overrides --days and --start-date',
+        )
+        parser.add_argument(
+            '--employee',
+            type=int,
+            action='append',
+            dest='employees',
+            help='Only rebuild this employee id (repeatable)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            end_date = (
+                datetime.datetime.strptime(options['end_date'], '%Y-%m-%d').date()
+                if options['end_date'] else timezone.localdate()
+            )
+            start_date = (
+                datetime.datetime.strptime(options['start_date'], '%Y-%m-%d').date()
+                if options['start_date'] else end_date - timedelta(days=options['days'] - 1)
+            )
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {e}")
+        if options['all']:
+            first = LiveSession.objects.order_by('local_date').values_list('local_date', flat=True).first()
+            start_date = min(first, end_date) if first else end_date
+        if start_date > end_date:
+            raise CommandError("--start-date is after --end-date")
+
+        rows = rebuild(start_date, end_date, options['employees'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {rows} daily activity row(s) for {start_date} to {end_date}."
+        ))
@@ -0,0 +1,37 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from attendenceapp.models import LiveSession
+from attendenceapp.geofence import replay_session
+
+class Command(BaseCommand):
+    help = 'Recomputes geofence enter/exit events from the stored session paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=1,
+            help='Replay sessions started within this many days (default: 1)',
+        )
+        parser.add_argument(
+            '--session',
+            type=int,
+            action='append',
+            dest='sessions',
+            help='Only replay this session id (repeatable)',
+        )
+
+    def handle(self, *args, **options):
+        if options['sessions']:
+            sessions = LiveSession.objects.filter(id__in=options['sessions'])
+        else:
+            since = timezone.localdate() - timedelta(days=options['days'] - 1)
+            sessions = LiveSession.objects.on_dates(since, timezone.localdate())
+
+        replayed = events = 0
+        for session in sessions.select_related('path_archive').order_by('id').iterator():
+            events += len(replay_session(session))
+            replayed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Replayed {replayed} session(s), {events} geofence event(s)."))
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.24 on 2026-10-17 02:24
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendenceapp', '0010_contactsubmission_submission'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='locationpoint',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
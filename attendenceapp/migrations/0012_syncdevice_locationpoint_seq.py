@@ -0,0 +1,47 @@
+# Generated by Django 4.2.24 on 2026-10-17 02:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendenceapp', '0011_locationpoint_client_timestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncDevice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_id', models.CharField(max_length=64)),
+                ('last_seq', models.BigIntegerField(default=0)),
+                ('last_sync_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='locationpoint',
+            name='seq',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='syncdevice',
+            name='employee',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_devices', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='locationpoint',
+            name='device',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='points', to='attendenceapp.syncdevice'),
+        ),
+        migrations.AddConstraint(
+            model_name='locationpoint',
+            constraint=models.UniqueConstraint(fields=('device', 'seq'), name='unique_locationpoint_device_seq'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='syncdevice',
+            unique_together={('employee', 'device_id')},
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.24 on 2026-10-17 02:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendenceapp', '0013_ingestlogcursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='livesession',
+            name='distance_m',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='livesession',
+            name='first_point_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='livesession',
+            name='last_point_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='livesession',
+            name='pinpoint_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='livesession',
+            name='point_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
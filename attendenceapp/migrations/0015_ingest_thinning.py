@@ -0,0 +1,33 @@
+# Generated by Django 4.2.24 on 2026-10-17 02:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendenceapp', '0014_livesession_path_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='livesession',
+            name='last_point_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='livesession',
+            name='last_point_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='livesession',
+            name='thinning_stats',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='locationpoint',
+            name='dropped_before',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
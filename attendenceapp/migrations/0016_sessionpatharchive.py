@@ -0,0 +1,30 @@
+# Generated by Django 4.2.24 on 2026-10-17 02:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendenceapp', '0015_ingest_thinning'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionPathArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codec', models.PositiveSmallIntegerField(default=1)),
+                ('point_count', models.PositiveIntegerField(default=0)),
+                ('first_point_at', models.DateTimeField(blank=True, null=True)),
+                ('last_point_at', models.DateTimeField(blank=True, null=True)),
+                ('max_point_id', models.BigIntegerField(default=0)),
+                ('data', models.BinaryField()),
+                ('raw_deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='path_archive', to='attendenceapp.livesession')),
+            ],
+        ),
+    ]
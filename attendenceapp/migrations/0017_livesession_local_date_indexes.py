@@ -0,0 +1,47 @@
+# Generated by Django 4.2.24 on 2026-10-17 02:31
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_local_date(apps, schema_editor):
+    LiveSession = apps.get_model("attendenceapp", "LiveSession")
+    for session in LiveSession.objects.filter(local_date__isnull=True).only("id", "start_time").iterator():
+        LiveSession.objects.filter(pk=session.pk).update(local_date=timezone.localdate(session.start_time))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendenceapp', '0016_sessionpatharchive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='livesession',
+            name='local_date',
+            field=models.DateField(null=True),
+        ),
+        migrations.RunPython(backfill_local_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='livesession',
+            name='local_date',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='livesession',
+            index=models.Index(fields=['employee', 'is_active'], name='livesession_employee_active'),
+        ),
+        migrations.AddIndex(
+            model_name='livesession',
+            index=models.Index(fields=['employee', 'local_date'], name='livesession_employee_date'),
+        ),
+        migrations.AddIndex(
+            model_name='locationpoint',
+            index=models.Index(fields=['session', 'timestamp'], name='locationpoint_session_time'),
+        ),
+        migrations.AddIndex(
+            model_name='pinpoint',
+            index=models.Index(fields=['session', 'timestamp'], name='pinpoint_session_time'),
+        ),
+    ]
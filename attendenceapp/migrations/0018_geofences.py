@@ -0,0 +1,60 @@
+# Generated by Django 4.2.24 on 2026-10-17 02:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendenceapp', '0017_livesession_local_date_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Geofence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('shape', models.CharField(choices=[('circle', 'Circle'), ('polygon', 'Polygon')], default='circle', max_length=10)),
+                ('center_latitude', models.FloatField(blank=True, null=True)),
+                ('center_longitude', models.FloatField(blank=True, null=True)),
+                ('radius_m', models.FloatField(blank=True, null=True)),
+                ('polygon', models.JSONField(blank=True, default=list)),
+                ('min_latitude', models.FloatField(default=0)),
+                ('max_latitude', models.FloatField(default=0)),
+                ('min_longitude', models.FloatField(default=0)),
+                ('max_longitude', models.FloatField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='livesession',
+            name='inside_geofences',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.CreateModel(
+            name='GeofenceEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('enter', 'Enter'), ('exit', 'Exit')], max_length=5)),
+                ('timestamp', models.DateTimeField()),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='geofence_events', to=settings.AUTH_USER_MODEL)),
+                ('geofence', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='attendenceapp.geofence')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='geofence_events', to='attendenceapp.livesession')),
+            ],
+            options={
+                'ordering': ['timestamp'],
+                'indexes': [models.Index(fields=['session', 'timestamp'], name='geofenceevent_session_time'), models.Index(fields=['geofence', 'timestamp'], name='geofenceevent_fence_time')],
+            },
+        ),
+    ]
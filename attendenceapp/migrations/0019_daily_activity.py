@@ -0,0 +1,39 @@
+# Generated by Django 4.2.24 on 2026-10-17 02:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendenceapp', '0018_geofences'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('session_count', models.PositiveIntegerField(default=0)),
+                ('point_count', models.PositiveIntegerField(default=0)),
+                ('pinpoint_count', models.PositiveIntegerField(default=0)),
+                ('distance_m', models.FloatField(default=0)),
+                ('first_activity_at', models.DateTimeField(blank=True, null=True)),
+                ('last_activity_at', models.DateTimeField(blank=True, null=True)),
+                ('tracked_seconds', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date', 'employee'],
+                'indexes': [models.Index(fields=['date', 'employee'], name='dailyactivity_date_employee')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyactivity',
+            constraint=models.UniqueConstraint(fields=('employee', 'date'), name='unique_dailyactivity_employee_date'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.24 on 2026-10-17 02:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendenceapp', '0019_daily_activity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='livesession',
+            name='visits_detected_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='SessionVisit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('arrival', models.DateTimeField()),
+                ('departure', models.DateTimeField()),
+                ('dwell_seconds', models.FloatField()),
+                ('point_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visits', to=settings.AUTH_USER_MODEL)),
+                ('geofence', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='visits', to='attendenceapp.geofence')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visits', to='attendenceapp.livesession')),
+            ],
+            options={
+                'ordering': ['arrival'],
+                'indexes': [models.Index(fields=['session', 'arrival'], name='sessionvisit_session_arrival'), models.Index(fields=['employee', 'arrival'], name='sessionvisit_employee_arrival')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.24 on 2026-10-17 02:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendenceapp', '0021_geocode_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pinpoint',
+            name='address_status',
+            field=models.CharField(choices=[('provided', 'Provided'), ('pending', 'Pending'), ('resolved', 'Resolved'), ('failed', 'Failed')], default='provided', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='pinpoint',
+            name='geocode_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='pinpoint',
+            name='next_geocode_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='pinpoint',
+            index=models.Index(fields=['address_status', 'next_geocode_at'], name='pinpoint_geocode_queue'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.24 on 2026-10-17 03:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendenceapp', '0022_pinpoint_geocode_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pinpoint',
+            name='address_status',
+            field=models.CharField(choices=[('provided', 'Provided'), ('pending', 'Pending'), ('resolving', 'Resolving'), ('resolved', 'Resolved'), ('failed', 'Failed')], default='provided', max_length=10),
+        ),
+    ]
@@ -2,6 +2,10 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.conf import settings
 
+from django.db.models.signals import post_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
 
 class User(AbstractUser):
     ROLE_CHOICES = (
@@ -19,23 +23,70 @@ class User(AbstractUser):
         return f"{self.username} ({self.role})"
 
 
+class LiveSessionQuerySet(models.QuerySet):
+    def on_dates(self, start_date, end_date=None):
+        """Sessions that started on the local dates start_date..end_date (inclusive)"""
+        return self.filter(local_date__range=(start_date, end_date or start_date))
+
+
 class LiveSession(models.Model):
     employee = models.ForeignKey(User, on_delete=models.CASCADE, related_name="live_sessions")
     start_time = models.DateTimeField(auto_now_add=True)
     end_time = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    # start_time's date in TIME_ZONE, stored so date filters can use an index;
+    # filled on save (see fill_local_date)
+    local_date = models.DateField(db_index=True)
     
     # Live location tracking fields
     current_latitude = models.FloatField(null=True, blank=True)
     current_longitude = models.FloatField(null=True, blank=True)
     last_location_update = models.DateTimeField(null=True, blank=True)
     
+    # Path statistics maintained at write time (see ingest.store_points);
+    # `manage.py backfill_session_stats` recomputes them from the raw rows
+    point_count = models.PositiveIntegerField(default=0)
+    pinpoint_count = models.PositiveIntegerField(default=0)
+    distance_m = models.FloatField(default=0)
+    first_point_at = models.DateTimeField(null=True, blank=True)
+    last_point_at = models.DateTimeField(null=True, blank=True)
+    last_point_latitude = models.FloatField(null=True, blank=True)
+    last_point_longitude = models.FloatField(null=True, blank=True)
+    # Ingest thinning totals: received/kept fixes and drops per reason (see trajectory_filter)
+    thinning_stats = models.JSONField(default=dict, blank=True)
+    # Ids of the geofences the employee is currently inside (see geofence.py)
+    inside_geofences = models.JSONField(default=list, blank=True)
+    # When stay-point detection last ran over the path (see stay_points.py)
+    visits_detected_at = models.DateTimeField(null=True, blank=True)
+    
+    objects = LiveSessionQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=["employee", "is_active"], name="livesession_employee_active"),
+            models.Index(fields=["employee", "local_date"], name="livesession_employee_date"),
+        ]
+    
     def __str__(self):
         status = "Active" if self.is_active else "Ended"
         return f"{self.employee.username} - {status}"
 
 
+@receiver(pre_save, sender=LiveSession)
+def fill_local_date(sender, instance, raw=False, **kwargs):
+    """Set local_date on every save, including fixtures loaded with loaddata (raw)"""
+    if instance.local_date is None:
+        instance.local_date = timezone.localdate(instance.start_time) if instance.start_time else timezone.localdate()
+
+
 class Pinpoint(models.Model):
+    ADDRESS_STATUS_CHOICES = (
+        ("provided", "Provided"),
+        ("pending", "Pending"),
+        ("resolving", "Resolving"),
+        ("resolved", "Resolved"),
+        ("failed", "Failed"),
+    )
     session = models.ForeignKey(LiveSession, on_delete=models.CASCADE, related_name="pinpoints", null=True, blank=True)
     latitude = models.FloatField()
     longitude = models.FloatField()
@@ -44,25 +95,241 @@ class Pinpoint(models.Model):
     phone = models.CharField(max_length=30, blank=True, null=True)
     message = models.TextField(blank=True, null=True)
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Background reverse geocoding of addresses the client did not send (see geocode_worker.py)
+    address_status = models.CharField(max_length=10, choices=ADDRESS_STATUS_CHOICES, default="provided")
+    geocode_attempts = models.PositiveSmallIntegerField(default=0)
+    next_geocode_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["session", "timestamp"], name="pinpoint_session_time"),
+            models.Index(fields=["address_status", "next_geocode_at"], name="pinpoint_geocode_queue"),
+        ]
 
     def __str__(self):
         return f"Pinpoint {self.place or ''} ({self.latitude}, {self.longitude})"
 
 
+@receiver(post_delete, sender=Pinpoint)
+def pinpoint_deleted(sender, instance, **kwargs):
+    """Undo ingest.record_pinpoint for the session's and the day's counters"""
+    from . import daily_activity
+
+    session = LiveSession.objects.filter(pk=instance.session_id).first()
+    if session is None:
+        return
+    LiveSession.objects.filter(pk=session.pk, pinpoint_count__gt=0).update(
+        pinpoint_count=models.F("pinpoint_count") - 1
+    )
+    daily_activity.pinpoint_removed(session)
+
+
+class SyncDevice(models.Model):
+    """A phone uploading location points with per-device sequence numbers (offline sync)"""
+    employee = models.ForeignKey(User, on_delete=models.CASCADE, related_name="sync_devices")
+    device_id = models.CharField(max_length=64)
+    # Highest sequence number received from this device (stored or thinned out),
+    # returned to clients as the ack; sync skips points up to it
+    last_seq = models.BigIntegerField(default=0)
+    last_sync_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("employee", "device_id")
+
+    def __str__(self):
+        return f"{self.device_id} - {self.employee.username} (seq {self.last_seq})"
+
+
 class LocationPoint(models.Model):
     """Stores continuous location data for path tracking"""
     session = models.ForeignKey(LiveSession, on_delete=models.CASCADE, related_name="location_points")
     latitude = models.FloatField()
     longitude = models.FloatField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Device fix time; defaults to server time when the client does not send one
+    timestamp = models.DateTimeField(default=timezone.now)
+    # Offline sync: which device sent the point and its sequence number on that device
+    device = models.ForeignKey(SyncDevice, on_delete=models.SET_NULL, related_name="points", null=True, blank=True)
+    seq = models.BigIntegerField(null=True, blank=True)
+    # Raw fixes dropped by ingest thinning between the previous stored point and this one
+    dropped_before = models.PositiveIntegerField(default=0)
     
     class Meta:
         ordering = ['timestamp']
+        constraints = [
+            models.UniqueConstraint(fields=["device", "seq"], name="unique_locationpoint_device_seq"),
+        ]
+        indexes = [
+            models.Index(fields=["session", "timestamp"], name="locationpoint_session_time"),
+        ]
     
     def __str__(self):
         return f"Location at {self.timestamp} - {self.session.employee.username}"
 
 
+class SessionPathArchive(models.Model):
+    """Compressed path of a closed session (see archive.py)"""
+    session = models.OneToOneField(LiveSession, on_delete=models.CASCADE, related_name="path_archive")
+    codec = models.PositiveSmallIntegerField(default=1)
+    point_count = models.PositiveIntegerField(default=0)
+    first_point_at = models.DateTimeField(null=True, blank=True)
+    last_point_at = models.DateTimeField(null=True, blank=True)
+    # Rows with a higher id arrived after archiving and are still read from LocationPoint
+    max_point_id = models.BigIntegerField(default=0)
+    data = models.BinaryField()
+    raw_deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Archive of session {self.session_id} ({self.point_count} points)"
+
+
+class IngestLogCursor(models.Model):
+    """How far the flusher has drained one write-behind log segment (see ingest_log)"""
+    segment = models.CharField(max_length=255, unique=True)
+    offset = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.segment} @ {self.offset}"
+
+
+class Geofence(models.Model):
+    """A customer/job site: a circle or a polygon (see geofence.py)"""
+    SHAPE_CHOICES = (
+        ("circle", "Circle"),
+        ("polygon", "Polygon"),
+    )
+    name = models.CharField(max_length=200)
+    shape = models.CharField(max_length=10, choices=SHAPE_CHOICES, default="circle")
+    # Circle
+    center_latitude = models.FloatField(null=True, blank=True)
+    center_longitude = models.FloatField(null=True, blank=True)
+    radius_m = models.FloatField(null=True, blank=True)
+    # Polygon vertices as [[latitude, longitude], ...]
+    polygon = models.JSONField(default=list, blank=True)
+    # Bounding box, derived from the shape on save
+    min_latitude = models.FloatField(default=0)
+    max_latitude = models.FloatField(default=0)
+    min_longitude = models.FloatField(default=0)
+    max_longitude = models.FloatField(default=0)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["name"]
+
+    def save(self, *args, **kwargs):
+        from .geofence import bounding_box, fences_changed
+        self.min_latitude, self.min_longitude, self.max_latitude, self.max_longitude = bounding_box(self)
+        super().save(*args, **kwargs)
+        fences_changed()
+
+    def delete(self, *args, **kwargs):
+        from .geofence import fences_changed
+        result = super().delete(*args, **kwargs)
+        fences_changed()
+        return result
+
+    def __str__(self):
+        return f"{self.name} ({self.shape})"
+
+
+class GeofenceEvent(models.Model):
+    """An employee entering or leaving a geofence during a session"""
+    EVENT_CHOICES = (
+        ("enter", "Enter"),
+        ("exit", "Exit"),
+    )
+    geofence = models.ForeignKey(Geofence, on_delete=models.CASCADE, related_name="events")
+    session = models.ForeignKey(LiveSession, on_delete=models.CASCADE, related_name="geofence_events")
+    employee = models.ForeignKey(User, on_delete=models.CASCADE, related_name="geofence_events")
+    event_type = models.CharField(max_length=5, choices=EVENT_CHOICES)
+    # Time of the first fix on the new side of the boundary
+    timestamp = models.DateTimeField()
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["timestamp"]
+        indexes = [
+            models.Index(fields=["session", "timestamp"], name="geofenceevent_session_time"),
+            models.Index(fields=["geofence", "timestamp"], name="geofenceevent_fence_time"),
+        ]
+
+    def __str__(self):
+        return f"{self.employee.username} {self.event_type} {self.geofence.name} at {self.timestamp}"
+
+
+class SessionVisit(models.Model):
+    """A stop detected in a session's path (see stay_points.py)"""
+    session = models.ForeignKey(LiveSession, on_delete=models.CASCADE, related_name="visits")
+    employee = models.ForeignKey(User, on_delete=models.CASCADE, related_name="visits")
+    # Centroid of the points of the stop
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    arrival = models.DateTimeField()
+    departure = models.DateTimeField()
+    dwell_seconds = models.FloatField()
+    point_count = models.PositiveIntegerField(default=0)
+    # Active geofence containing the centroid, if any
+    geofence = models.ForeignKey(Geofence, on_delete=models.SET_NULL, related_name="visits", null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["arrival"]
+        indexes = [
+            models.Index(fields=["session", "arrival"], name="sessionvisit_session_arrival"),
+            models.Index(fields=["employee", "arrival"], name="sessionvisit_employee_arrival"),
+        ]
+
+    def __str__(self):
+        return f"{self.employee.username} stopped {self.dwell_seconds / 60:.0f} min at {self.arrival}"
+
+class GeocodeCacheEntry(models.Model):
+    """Second level of the reverse-geocode cache (see geocode_cache.py)"""
+    # Coordinates rounded to GEOCODE_CACHE_PRECISION decimals, "lat,lng"
+    key = models.CharField(max_length=32, unique=True)
+    address = models.CharField(max_length=500)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key}: {self.address}"
+
+class DailyActivity(models.Model):
+    """
+    Per-employee, per-day rollup of the sessions started that day (local
+    date), maintained incrementally by daily_activity.py;
+    `manage.py rebuild_daily_activity` recomputes it from the sessions.
+    """
+    employee = models.ForeignKey(User, on_delete=models.CASCADE, related_name="daily_activity")
+    date = models.DateField()
+    session_count = models.PositiveIntegerField(default=0)
+    point_count = models.PositiveIntegerField(default=0)
+    pinpoint_count = models.PositiveIntegerField(default=0)
+    distance_m = models.FloatField(default=0)
+    first_activity_at = models.DateTimeField(null=True, blank=True)
+    last_activity_at = models.DateTimeField(null=True, blank=True)
+    # Total length of the day's stopped sessions
+    tracked_seconds = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["date", "employee"]
+        constraints = [
+            models.UniqueConstraint(fields=["employee", "date"], name="unique_dailyactivity_employee_date"),
+        ]
+        indexes = [
+            models.Index(fields=["date", "employee"], name="dailyactivity_date_employee"),
+        ]
+
+    def __str__(self):
+        return f"{self.employee.username} on {self.date}: {self.session_count} session(s)"
+
+
 
 
 
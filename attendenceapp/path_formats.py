@@ -0,0 +1,113 @@
+"""
+Compact wire formats for path data (the ``path_format=`` option of the history
+and snapshot endpoints). Each session's path is sent once as:
+
+* ``polyline``: Google encoded polyline (1e-5 degrees) in ``polyline``,
+  plus fix times: the first as epoch milliseconds in ``start`` and the
+  offsets from it in ``times``, delta coded with the same algorithm,
+* ``columnar``: parallel ``latitude`` / ``longitude`` / ``timestamp``
+  (epoch milliseconds) arrays,
+* ``geojson``: a LineString Feature ([longitude, latitude] positions) with
+  the fix times in ``properties.coordTimes`` (epoch milliseconds). A
+  LineString needs two positions, so a single-point path is a Point and an
+  empty one has a null geometry.
+"""
+
+FORMATS = ("polyline", "columnar", "geojson")
+
+POLYLINE_PRECISION = 5
+
+
+def _encode_value(value, out):
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        out.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    out.append(chr(value + 63))
+
+
+def encode_deltas(values):
+    """Google polyline encoding of a sequence of integers (delta coded)"""
+    out = []
+    previous = 0
+    for value in values:
+        _encode_value(value - previous, out)
+        previous = value
+    return "".join(out)
+
+
+def decode_deltas(encoded):
+    """Inverse of ``encode_deltas``"""
+    values = []
+    total = index = 0
+    while index < len(encoded):
+        shift = result = 0
+        while True:
+            byte = ord(encoded[index]) - 63
+            index += 1
+            result |= (byte & 0x1f) << shift
+            shift += 5
+            if byte < 0x20:
+                break
+        total += ~(result >> 1) if result & 1 else result >> 1
+        values.append(total)
+    return values
+
+
+def encode_polyline(coords, precision=POLYLINE_PRECISION):
+    """Google encoded polyline of (latitude, longitude) pairs"""
+    factor = 10 ** precision
+    out = []
+    previous_lat = previous_lng = 0
+    for lat, lng in coords:
+        lat, lng = round(lat * factor), round(lng * factor)
+        _encode_value(lat - previous_lat, out)
+        _encode_value(lng - previous_lng, out)
+        previous_lat, previous_lng = lat, lng
+    return "".join(out)
+
+
+def _epoch_ms(timestamp):
+    return round(timestamp.timestamp() * 1000)
+
+
+def encode_path(points, fmt, properties=None):
+    """Encode PathPoints (timestamp order) in one of ``FORMATS``"""
+    times = [_epoch_ms(point.timestamp) for point in points]
+
+    if fmt == "polyline":
+        return {
+            "polyline": encode_polyline([(point.latitude, point.longitude) for point in points]),
+            "start": times[0] if times else None,
+            "times": encode_deltas([time - times[0] for time in times]),
+            "count": len(points),
+        }
+    if fmt == "columnar":
+        return {
+            "latitude": [point.latitude for point in points],
+            "longitude": [point.longitude for point in points],
+            "timestamp": times,
+        }
+    if fmt == "geojson":
+        coordinates = [[point.longitude, point.latitude] for point in points]
+        if len(coordinates) >= 2:
+            geometry = {"type": "LineString", "coordinates": coordinates}
+        elif coordinates:
+            geometry = {"type": "Point", "coordinates": coordinates[0]}
+        else:
+            geometry = None
+        return {
+            "type": "Feature",
+            "geometry": geometry,
+            "properties": dict(properties or {}, coordTimes=times),
+        }
+    raise ValueError(f"Unknown format: {fmt}")
+
+
+def pinpoint_feature(pinpoint, properties):
+    """GeoJSON Point Feature for a pinpoint"""
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [pinpoint.longitude, pinpoint.latitude]},
+        "properties": dict(properties, timestamp=_epoch_ms(pinpoint.timestamp)),
+    }
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from rest_framework_simplejwt.tokens import RefreshToken
-from .models import User, LiveSession, Pinpoint, LocationPoint
+from .models import User, LiveSession, Pinpoint, LocationPoint, Geofence, GeofenceEvent, DailyActivity
 from .models import LaserScreedSubmission
 from .models import Submission, ContactSubmission
 
@@ -21,13 +21,63 @@ class PinpointSerializer(serializers.ModelSerializer):
     class Meta:
         model = Pinpoint
         fields = "__all__"
-        read_only_fields = ("id", "timestamp",)
+        read_only_fields = ("id", "timestamp", "address_status", "geocode_attempts", "next_geocode_at")
 
 
 class LiveSessionSerializer(serializers.ModelSerializer):
     class Meta:
         model = LiveSession
-        fields = ["id", "employee", "start_time", "end_time", "is_active"]
+        fields = ["id", "employee", "start_time", "end_time", "is_active",
+                  "point_count", "pinpoint_count", "distance_m", "first_point_at", "last_point_at",
+                  "thinning_stats"]
+
+
+class DailyActivitySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DailyActivity
+        fields = ["date", "session_count", "point_count", "pinpoint_count", "distance_m",
+                  "first_activity_at", "last_activity_at", "tracked_seconds"]
+
+
+class GeofenceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Geofence
+        fields = ["id", "name", "shape", "center_latitude", "center_longitude", "radius_m",
+                  "polygon", "is_active", "created_at", "updated_at"]
+        read_only_fields = ("id", "created_at", "updated_at")
+
+    def validate(self, data):
+        shape = data.get("shape", getattr(self.instance, "shape", "circle"))
+        if shape == "circle":
+            for field in ("center_latitude", "center_longitude", "radius_m"):
+                if data.get(field, getattr(self.instance, field, None)) is None:
+                    raise serializers.ValidationError({field: "Required for circle geofences."})
+            if data.get("radius_m", getattr(self.instance, "radius_m", None)) <= 0:
+                raise serializers.ValidationError({"radius_m": "Must be positive."})
+        else:
+            polygon = data.get("polygon", getattr(self.instance, "polygon", []))
+            try:
+                # Stored as floats: the geofence math and the bbox never see strings
+                vertices = [[float(vertex[0]), float(vertex[1])] for vertex in polygon if len(vertex) == 2]
+                valid = len(vertices) == len(polygon) >= 3 and all(
+                    -90 <= lat <= 90 and -180 <= lng <= 180 for lat, lng in vertices
+                )
+            except (TypeError, ValueError, KeyError, IndexError):
+                valid = False
+            if not valid:
+                raise serializers.ValidationError({"polygon": "At least 3 [latitude, longitude] vertices required."})
+            if "polygon" in data:
+                data["polygon"] = vertices
+        return data
+
+
+class GeofenceEventSerializer(serializers.ModelSerializer):
+    geofence_name = serializers.CharField(source="geofence.name", read_only=True)
+
+    class Meta:
+        model = GeofenceEvent
+        fields = ["id", "geofence", "geofence_name", "session", "employee", "event_type",
+                  "timestamp", "latitude", "longitude"]
 
 
 class LoginSerializer(serializers.Serializer):
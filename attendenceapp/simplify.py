@@ -0,0 +1,155 @@
+"""
+Server-side path simplification for map display.
+
+``significance`` runs Douglas-Peucker once over a path (NumPy, one
+vectorised distance pass per split) and records for every vertex the
+tolerance at which it would be dropped, clamped so a vertex never outranks
+the split that exposed it. Any tolerance or vertex budget is then a simple
+threshold over that array, matching Douglas-Peucker at that tolerance.
+
+Callers pass a tolerance in metres, a map zoom level (converted to about
+one screen pixel) or ``max_points``. Closed sessions never change, so
+``simplify_session`` caches their results per tolerance bucket (powers of
+two metres) or per vertex budget bucket.
+"""
+import math
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .archive import session_points, stored_point_count
+from .geo import EARTH_RADIUS_M
+
+# Metres per pixel at zoom 0 on the equator (256 px Web Mercator tiles)
+METRES_PER_PIXEL_Z0 = 2 * math.pi * EARTH_RADIUS_M / 256
+
+MAX_POINTS_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+
+def _project(lats, lngs):
+    """Equirectangular projection in metres around the path's mean latitude"""
+    scale = math.cos(math.radians(float(np.mean(lats))))
+    return np.radians(lngs) * scale * EARTH_RADIUS_M, np.radians(lats) * EARTH_RADIUS_M
+
+
+def significance(lats, lngs):
+    """Per-vertex Douglas-Peucker tolerance (metres); endpoints are infinite"""
+    count = len(lats)
+    values = np.full(count, np.inf)
+    if count < 3:
+        return values
+    x, y = _project(np.asarray(lats, dtype=float), np.asarray(lngs, dtype=float))
+
+    stack = [(0, count - 1, np.inf)]
+    while stack:
+        first, last, cap = stack.pop()
+        if last - first < 2:
+            continue
+        px, py = x[first + 1:last] - x[first], y[first + 1:last] - y[first]
+        ex, ey = x[last] - x[first], y[last] - y[first]
+        length_sq = ex * ex + ey * ey
+        if length_sq == 0:
+            distances = np.hypot(px, py)
+        else:
+            t = np.clip((px * ex + py * ey) / length_sq, 0.0, 1.0)
+            distances = np.hypot(px - t * ex, py - t * ey)
+        offset = int(np.argmax(distances))
+        index = first + 1 + offset
+        value = min(float(distances[offset]), cap)
+        values[index] = value
+        stack.append((first, index, value))
+        stack.append((index, last, value))
+    return values
+
+
+def keep_mask(values, tolerance=None, max_points=None):
+    """Vertices to keep for a tolerance (metres) and/or a vertex budget"""
+    keep = np.ones(len(values), dtype=bool)
+    if tolerance is not None:
+        keep &= values > tolerance
+    if max_points is not None and keep.sum() > max_points:
+        candidates = np.flatnonzero(keep)
+        # Highest significance first; stable so ties keep path order
+        order = np.argsort(-values[candidates], kind="stable")[:max(2, max_points)]
+        keep = np.zeros(len(values), dtype=bool)
+        keep[candidates[order]] = True
+    return keep
+
+
+def zoom_tolerance(zoom, latitude):
+    """About one screen pixel, in metres, at a Web Mercator zoom level"""
+    return METRES_PER_PIXEL_Z0 * math.cos(math.radians(latitude)) / (2 ** zoom)
+
+
+def parse_params(params):
+    """
+    ``(tolerance, max_points, zoom)`` from request query params; all None
+    when no simplification was asked for. Raises ValueError on bad values.
+    """
+    tolerance = params.get("tolerance")
+    max_points = params.get("max_points")
+    zoom = params.get("zoom")
+    tolerance = float(tolerance) if tolerance not in (None, "") else None
+    max_points = int(max_points) if max_points not in (None, "") else None
+    zoom = float(zoom) if zoom not in (None, "") else None
+    # Comparisons alone let NaN and inf through, which the tolerance buckets cannot handle
+    if (tolerance is not None and not (math.isfinite(tolerance) and tolerance >= 0)) \
+            or (max_points is not None and max_points < 2) \
+            or (zoom is not None and not 0 <= zoom <= 24):
+        raise ValueError("tolerance must be a finite number >= 0, max_points >= 2 and zoom within 0-24")
+    return tolerance, max_points, zoom
+
+
+def _tolerance_bucket(tolerance):
+    """Round a tolerance down to a power of two metres (0 below 1 m)"""
+    if tolerance < 1:
+        return 0.0
+    return float(2 ** math.floor(math.log2(tolerance)))
+
+
+def _max_points_bucket(max_points):
+    fitting = [bucket for bucket in MAX_POINTS_BUCKETS if bucket <= max_points]
+    return fitting[-1] if fitting else max(2, max_points)
+
+
+def simplify_points(points, tolerance=None, max_points=None):
+    """Simplify a list of PathPoints (timestamp order)"""
+    if len(points) < 3 or (tolerance is None and max_points is None):
+        return points
+    lats = np.fromiter((p.latitude for p in points), dtype=float, count=len(points))
+    lngs = np.fromiter((p.longitude for p in points), dtype=float, count=len(points))
+    keep = keep_mask(significance(lats, lngs), tolerance, max_points)
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def simplify_session(session, tolerance=None, max_points=None, zoom=None, points=None):
+    """
+    A session's path (PathPoints) simplified for display. ``points`` may
+    pass the already loaded path; closed sessions are served from the cache.
+    """
+    if tolerance is None and max_points is None and zoom is None:
+        return points if points is not None else session_points(session)
+
+    if zoom is not None:
+        latitude = session.last_point_latitude or session.current_latitude or 0.0
+        zoom_tol = zoom_tolerance(zoom, latitude)
+        tolerance = max(tolerance or 0.0, zoom_tol)
+
+    if session.is_active:
+        path = points if points is not None else session_points(session)
+        return simplify_points(path, tolerance, max_points)
+
+    # Snap to buckets so nearby requests share one cached result
+    tolerance = _tolerance_bucket(tolerance) if tolerance is not None else None
+    max_points = _max_points_bucket(max_points) if max_points is not None else None
+    version = f"{stored_point_count(session)}-{session.last_point_at.timestamp() if session.last_point_at else 0}"
+    key = f"simplified_path:{session.pk}:{version}:{tolerance}:{max_points}"
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    path = points if points is not None else session_points(session)
+    simplified = simplify_points(path, tolerance, max_points)
+    cache.set(key, simplified, timeout=settings.SIMPLIFIED_PATH_CACHE_SECONDS)
+    return simplified
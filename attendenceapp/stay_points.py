@@ -0,0 +1,155 @@
+"""
+Stay-point (stop) detection over a session's path.
+
+Pinpoints only cover the stops an employee remembered to mark, so
+``detect_visits`` finds the others in the stored path:
+
+1. GPS jumps are removed first (analytics.jump_mask), so one bad fix
+   cannot split a stop in two.
+2. From each anchor point the run of following points within
+   VISIT_RADIUS_M of it is found (a window grown geometrically). A run
+   that spans at least VISIT_MIN_DWELL_SECONDS is a stay; ingest thinning
+   leaves a stationary phone with few stored points, so a single long
+   segment inside the radius also counts. Anchors whose fix
+   VISIT_MIN_DWELL_SECONDS later is already outside the radius are ruled
+   out in one vectorised pass first, so moving stretches cost nothing
+   per point.
+3. Consecutive stays whose centroids are within the radius and which are
+   separated by less than VISIT_MERGE_GAP_SECONDS are merged (drift out
+   of the radius and back).
+
+Each stay becomes a SessionVisit with its centroid, arrival (first fix),
+departure (last fix), dwell time and the active geofence containing the
+centroid, if any. Detection runs from ``manage.py detect_visits``
+(scheduled, for the sessions closed since the last run), off the stop
+request; readers use the stored rows.
+"""
+import datetime
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .analytics import jump_mask, load_arrays
+from .geo import haversine_array_m
+from .geofence import contains, get_index
+from .models import LiveSession, SessionVisit
+
+logger = logging.getLogger(__name__)
+
+
+def find_stays(lats, lngs, times, radius_m, min_dwell_s):
+    """(first, last) index pairs of the stays in a path (timestamp order)"""
+    stays = []
+    count = len(lats)
+    if count < 2:
+        return stays
+    # A stay from anchor i must still be within the radius at the first fix
+    # min_dwell_s later; checking that for every anchor at once leaves only
+    # a few anchors (those near real stops) for the scan below
+    dwell_ends = np.searchsorted(times, times + min_dwell_s)
+    reachable = np.flatnonzero(dwell_ends < count)
+    near = haversine_array_m(
+        lats[reachable], lngs[reachable], lats[dwell_ends[reachable]], lngs[dwell_ends[reachable]],
+    ) <= radius_m
+    anchors = reachable[near]
+
+    position = 0
+    while position < len(anchors):
+        i = int(anchors[position])
+        # Grow the window until a point leaves the radius (or the path ends)
+        size = 8
+        while True:
+            end = min(count, i + 1 + size)
+            outside = np.flatnonzero(haversine_array_m(lats[i], lngs[i], lats[i + 1:end], lngs[i + 1:end]) > radius_m)
+            if len(outside) or end == count:
+                break
+            size *= 4
+        last = i + int(outside[0]) if len(outside) else count - 1
+        if times[last] - times[i] >= min_dwell_s:
+            stays.append((i, last))
+            position = int(np.searchsorted(anchors, last + 1))
+        else:
+            position += 1
+    return stays
+
+
+def merge_stays(stays, lats, lngs, times, radius_m, max_gap_s):
+    """Merge consecutive stays at the same place separated by a short excursion"""
+    merged = []
+    for first, last in stays:
+        if merged:
+            previous_first, previous_last = merged[-1]
+            gap = times[first] - times[previous_last]
+            distance = haversine_array_m(
+                lats[previous_first:previous_last + 1].mean(), lngs[previous_first:previous_last + 1].mean(),
+                lats[first:last + 1].mean(), lngs[first:last + 1].mean(),
+            )
+            if gap <= max_gap_s and distance <= radius_m:
+                merged[-1] = (previous_first, last)
+                continue
+        merged.append((first, last))
+    return merged
+
+
+def _geofence_at(index, latitude, longitude):
+    """Id of the first active geofence containing a coordinate, or None"""
+    lats, lngs = np.array([latitude]), np.array([longitude])
+    for fence_id in sorted(index.candidates(lats, lngs)):
+        if contains(index.shapes[fence_id], lats, lngs)[0]:
+            return fence_id
+    return None
+
+
+def detect_visits(session):
+    """Detect a session's stops and replace its stored SessionVisits. Returns the new visits."""
+    radius = settings.VISIT_RADIUS_M
+    lats, lngs, times, _ = load_arrays(session)
+    keep = ~jump_mask(lats, lngs, times)
+    lats, lngs, times = lats[keep], lngs[keep], times[keep]
+
+    stays = merge_stays(
+        find_stays(lats, lngs, times, radius, settings.VISIT_MIN_DWELL_SECONDS),
+        lats, lngs, times, radius, settings.VISIT_MERGE_GAP_SECONDS,
+    )
+    index = get_index() if stays else None
+
+    visits = []
+    for first, last in stays:
+        latitude = float(lats[first:last + 1].mean())
+        longitude = float(lngs[first:last + 1].mean())
+        visits.append(SessionVisit(
+            session_id=session.pk,
+            employee_id=session.employee_id,
+            latitude=latitude,
+            longitude=longitude,
+            arrival=datetime.datetime.fromtimestamp(times[first], tz=datetime.timezone.utc),
+            departure=datetime.datetime.fromtimestamp(times[last], tz=datetime.timezone.utc),
+            dwell_seconds=float(times[last] - times[first]),
+            point_count=last - first + 1,
+            geofence_id=_geofence_at(index, latitude, longitude) if index.shapes else None,
+        ))
+
+    with transaction.atomic():
+        SessionVisit.objects.filter(session_id=session.pk).delete()
+        SessionVisit.objects.bulk_create(visits)
+        session.visits_detected_at = timezone.now()
+        LiveSession.objects.filter(pk=session.pk).update(visits_detected_at=session.visits_detected_at)
+
+    logger.info("Detected %d visit(s) in session %s", len(visits), session.pk)
+    return visits
+
+
+def visit_payload(visit):
+    """API representation of a SessionVisit (geofence must be loaded or None)"""
+    return {
+        'latitude': visit.latitude,
+        'longitude': visit.longitude,
+        'arrival': visit.arrival,
+        'departure': visit.departure,
+        'dwell_seconds': round(visit.dwell_seconds),
+        'geofence': visit.geofence_id,
+        'geofence_name': visit.geofence.name if visit.geofence_id else None,
+    }
@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from attendenceapp.models import User
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    SECURE_SSL_REDIRECT=False,
+    LOCATION_INGEST_MODE="sync",
+    GEOCODE_ASYNC=False,
+    GEOCODE_BACKEND="fake",
+)
+class TrackingTestCase(TestCase):
+    """Tracking endpoints with a private cache and points written in the request"""
+
+    def setUp(self):
+        cache.clear()
+
+    def make_user(self, username, role="employee"):
+        return User.objects.create_user(username=username, password="secret", role=role)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+
+def zigzag(count, first_seq=1):
+    """Points far enough apart, and off a straight line, for thinning to keep them all"""
+    start = timezone.now() - timedelta(hours=1)
+    return [
+        {
+            "seq": first_seq + i,
+            "latitude": 12.9 + i * 0.001,
+            "longitude": 77.6 + (i % 2) * 0.001,
+            "timestamp": (start + timedelta(seconds=30 * i)).isoformat(),
+        }
+        for i in range(count)
+    ]
@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+import numpy as np
+from django.test import SimpleTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from attendenceapp.analytics import compute_stats, jump_mask, rolling_speed
+from attendenceapp.geo import haversine_m
+from attendenceapp.models import LiveSession, LocationPoint
+
+from .base import TrackingTestCase
+
+STEP_M = haversine_m(12.9, 77.6, 12.901, 77.6)
+
+
+def sample_path():
+    """
+    Ten fixes 10 s and 0.001 degrees apart with a GPS jump in the middle,
+    two minutes standing still, then a 1000 s silence.
+    """
+    lats = [12.9 + 0.001 * i for i in range(10)]
+    times = [10.0 * i for i in range(10)]
+    lats.insert(5, 13.9)
+    times.insert(5, 45.0)
+    lats += [12.909, 12.909, 12.91]
+    times += [150.0, 210.0, 1210.0]
+    count = len(lats)
+    return np.array(lats), np.full(count, 77.6), np.array(times) + 1_700_000_000, np.zeros(count, dtype=np.int64)
+
+
+class ComputeStatsTests(SimpleTestCase):
+    def test_sample_path(self):
+        stats = compute_stats(*sample_path())
+        self.assertEqual(stats["point_count"], 13)
+        self.assertEqual(stats["outlier_count"], 1)
+        self.assertEqual(stats["outliers"][0]["latitude"], 13.9)
+        self.assertAlmostEqual(stats["distance_m"], 10 * STEP_M, delta=0.2)
+        self.assertEqual(
+            (stats["duration_seconds"], stats["moving_seconds"], stats["idle_seconds"], stats["gap_seconds"]),
+            (1210.0, 90.0, 120.0, 1000.0),
+        )
+        self.assertAlmostEqual(stats["average_speed_kmh"], STEP_M / 10 * 3.6, delta=0.1)
+        self.assertAlmostEqual(stats["max_speed_kmh"], STEP_M / 10 * 3.6, delta=0.1)
+
+    def test_thinned_silence_is_idle_not_a_gap(self):
+        lats, lngs, times, dropped = sample_path()
+        dropped[-1] = 30
+        stats = compute_stats(lats, lngs, times, dropped)
+        self.assertEqual((stats["idle_seconds"], stats["gap_seconds"]), (1120.0, 0.0))
+
+    def test_jumps_need_both_neighbours_far_away(self):
+        lats = np.array([12.9, 13.9, 13.901, 13.902])
+        times = np.array([0.0, 10.0, 20.0, 30.0])
+        # A real relocation (no way back) is not a jump
+        self.assertFalse(jump_mask(lats, np.full(4, 77.6), times).any())
+
+    def test_rolling_speed(self):
+        speeds = rolling_speed(np.array([10.0, 10.0, 40.0, 0.0]), np.array([1.0, 1.0, 1.0, 1.0]), 2)
+        self.assertEqual(speeds.tolist(), [10.0, 25.0, 20.0])
+        self.assertEqual(rolling_speed(np.array([5.0]), np.array([0.0]), 3).tolist(), [np.inf])
+
+    def test_short_paths(self):
+        for count in (0, 1, 2):
+            stats = compute_stats(*(array[:count] for array in sample_path()))
+            self.assertEqual((stats["point_count"], stats["outlier_count"]), (count, 0))
+
+
+class SessionStatsEndpointTests(TrackingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.employee = self.make_user("field")
+        self.session = LiveSession.objects.create(employee=self.employee)
+        lats, lngs, times, _ = sample_path()
+        start = timezone.now() - timedelta(hours=1)
+        LocationPoint.objects.bulk_create([
+            LocationPoint(session=self.session, latitude=lat, longitude=lng, timestamp=start + timedelta(seconds=t - times[0]))
+            for lat, lng, t in zip(lats, lngs, times)
+        ])
+
+    def get(self, user):
+        return self.client_for(user).get(reverse("session-stats", args=[self.session.id]))
+
+    def test_owner_and_admin_only(self):
+        response = self.get(self.employee)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["point_count"], response.data["outlier_count"]), (13, 1))
+        self.assertEqual(self.get(self.make_user("boss", role="admin")).status_code, 200)
+        self.assertEqual(self.get(self.make_user("other")).status_code, 403)
+
+    def test_closed_sessions_are_cached_until_the_path_changes(self):
+        LiveSession.objects.filter(pk=self.session.pk).update(is_active=False, point_count=14)
+        self.assertEqual(self.get(self.employee).data["outlier_count"], 1)
+
+        LocationPoint.objects.filter(session=self.session, latitude=13.9).delete()
+        self.assertEqual(self.get(self.employee).data["outlier_count"], 1)
+        # The counters move with every stored or archived change
+        LiveSession.objects.filter(pk=self.session.pk).update(point_count=13)
+        self.assertEqual(self.get(self.employee).data["outlier_count"], 0)
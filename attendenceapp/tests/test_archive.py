@@ -0,0 +1,90 @@
+import datetime
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from attendenceapp.archive import (
+    PathPoint, archive_session, decode_points, encode_points, session_points, stored_point_count,
+)
+from attendenceapp.models import LiveSession, LocationPoint, SessionPathArchive, User
+
+
+class EncodingTests(TestCase):
+    def test_round_trip(self):
+        start = datetime.datetime(2026, 3, 1, 8, 0, tzinfo=datetime.timezone.utc)
+        points = [
+            PathPoint(10, 12.9716123, 77.5946456, start, 0),
+            PathPoint(11, 12.9720001, 77.5950002, start + timedelta(milliseconds=1500), 3),
+            PathPoint(40, -33.8688197, -151.2092955, start + timedelta(hours=5), 0),
+            PathPoint(41, 89.9999999, 179.9999999, start + timedelta(days=2), 70000),
+        ]
+        decoded = decode_points(encode_points(points))
+
+        self.assertEqual([p.id for p in decoded], [p.id for p in points])
+        self.assertEqual([p.timestamp for p in decoded], [p.timestamp for p in points])
+        self.assertEqual([p.dropped_before for p in decoded], [p.dropped_before for p in points])
+        for original, restored in zip(points, decoded):
+            self.assertAlmostEqual(restored.latitude, original.latitude, places=7)
+            self.assertAlmostEqual(restored.longitude, original.longitude, places=7)
+
+    def test_round_trip_empty(self):
+        self.assertEqual(decode_points(encode_points([])), [])
+
+
+class ArchiveSessionTests(TestCase):
+    def setUp(self):
+        employee = User.objects.create_user(username="field", password="secret", role="employee")
+        self.session = LiveSession.objects.create(employee=employee)
+        # Archives keep millisecond timestamps
+        start = (timezone.now() - timedelta(hours=2)).replace(microsecond=0)
+        LocationPoint.objects.bulk_create([
+            LocationPoint(session=self.session, latitude=12.9 + i * 0.001, longitude=77.6, timestamp=start + timedelta(minutes=i))
+            for i in range(20)
+        ])
+        self.expected = session_points(self.session)
+        LiveSession.objects.filter(pk=self.session.pk).update(is_active=False, end_time=timezone.now())
+        self.session.refresh_from_db()
+
+    def reload(self):
+        return LiveSession.objects.select_related("path_archive").get(pk=self.session.pk)
+
+    def test_active_sessions_are_not_archived(self):
+        LiveSession.objects.filter(pk=self.session.pk).update(is_active=True)
+        self.assertIsNone(archive_session(self.reload()))
+
+    def test_archived_path_reads_back_unchanged(self):
+        archive = archive_session(self.session, delete_raw=True)
+        self.assertEqual(archive.point_count, 20)
+        self.assertFalse(LocationPoint.objects.filter(session=self.session).exists())
+
+        session = self.reload()
+        restored = session_points(session)
+        self.assertEqual([(p.id, p.timestamp) for p in restored], [(p.id, p.timestamp) for p in self.expected])
+        self.assertEqual(stored_point_count(session), 20)
+
+    def test_late_points_are_merged_and_folded_in(self):
+        archive_session(self.session)
+        late = LocationPoint.objects.create(
+            session=self.session, latitude=13.0, longitude=77.7, timestamp=self.expected[5].timestamp + timedelta(seconds=1),
+        )
+
+        session = self.reload()
+        points = session_points(session)
+        self.assertEqual(len(points), 21)
+        self.assertEqual(points[6].id, late.id)
+
+        archive = archive_session(session, delete_raw=True)
+        self.assertEqual((archive.point_count, archive.max_point_id), (21, late.id))
+        self.assertEqual([(p.id, p.timestamp) for p in session_points(self.reload())], [(p.id, p.timestamp) for p in points])
+
+    def test_command_archives_closed_sessions_once(self):
+        call_command("archive_sessions", "--delete-raw", stdout=StringIO())
+        archive = SessionPathArchive.objects.get(session=self.session)
+        self.assertTrue(archive.raw_deleted)
+        self.assertEqual(len(session_points(self.reload())), 20)
+
+        call_command("archive_sessions", stdout=StringIO())
+        self.assertEqual(SessionPathArchive.objects.get(session=self.session).updated_at, archive.updated_at)
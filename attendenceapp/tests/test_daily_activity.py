@@ -0,0 +1,83 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.forms.models import model_to_dict
+from django.urls import reverse
+from django.utils import timezone
+
+from attendenceapp import daily_activity
+from attendenceapp.models import DailyActivity, LiveSession, Pinpoint
+
+from .base import TrackingTestCase, zigzag
+
+FIELDS = (
+    "employee", "date", "session_count", "point_count", "pinpoint_count", "distance_m",
+    "first_activity_at", "last_activity_at", "tracked_seconds",
+)
+
+
+def rows():
+    return [model_to_dict(row, fields=FIELDS) for row in DailyActivity.objects.order_by("date", "employee")]
+
+
+class DailyActivityTests(TrackingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.employee = self.make_user("field")
+        self.api = self.client_for(self.employee)
+        self.today = timezone.localdate()
+
+    def track(self, points, pinpoints=1):
+        session_id = self.api.post(reverse("start-session")).data["id"]
+        self.api.post(reverse("upload-location-batch"), {"points": points}, format="json")
+        for i in range(pinpoints):
+            self.api.post(reverse("add-pinpoint", args=[session_id]), {
+                "latitude": 12.9, "longitude": 77.6, "address": "Depot", "place": f"Stop {i}",
+            }, format="json")
+        self.api.post(reverse("stop-session", args=[session_id]))
+        return session_id
+
+    def test_incremental_rows_match_a_rebuild(self):
+        self.track(zigzag(5), pinpoints=2)
+        self.track(zigzag(3, first_seq=10), pinpoints=1)
+        Pinpoint.objects.filter(place="Stop 0").first().delete()
+
+        incremental = rows()
+        self.assertEqual(len(incremental), 1)
+        self.assertEqual(
+            (incremental[0]["session_count"], incremental[0]["point_count"], incremental[0]["pinpoint_count"]), (2, 8, 2),
+        )
+        self.assertGreater(incremental[0]["distance_m"], 0)
+
+        self.assertEqual(daily_activity.rebuild(self.today, self.today), 1)
+        self.assertEqual(rows(), incremental)
+
+    def test_rebuild_only_replaces_its_range_and_employees(self):
+        self.track(zigzag(2))
+        other = self.make_user("other")
+        LiveSession.objects.create(employee=other, local_date=self.today)
+        last_week = LiveSession.objects.create(employee=self.employee, local_date=self.today - timedelta(days=7))
+        daily_activity.rebuild(last_week.local_date, self.today)
+        before = rows()
+
+        DailyActivity.objects.filter(employee=self.employee, date=self.today).update(point_count=99)
+        daily_activity.rebuild(self.today, self.today, [other.id])
+        self.assertEqual(DailyActivity.objects.get(employee=self.employee, date=self.today).point_count, 99)
+
+        daily_activity.rebuild(self.today, self.today, [self.employee.id])
+        self.assertEqual(rows(), before)
+
+    def test_command_backfills_every_day(self):
+        old = LiveSession.objects.create(employee=self.employee, local_date=self.today - timedelta(days=400))
+        LiveSession.objects.filter(pk=old.pk).update(
+            is_active=False, point_count=12, start_time=timezone.now() - timedelta(days=400),
+        )
+        self.track(zigzag(2), pinpoints=0)
+        DailyActivity.objects.all().delete()
+
+        call_command("rebuild_daily_activity", stdout=StringIO())
+        self.assertEqual([row["date"] for row in rows()], [self.today])
+
+        call_command("rebuild_daily_activity", "--all", stdout=StringIO())
+        self.assertEqual([(row["date"], row["point_count"]) for row in rows()], [(old.local_date, 12), (self.today, 2)])
@@ -0,0 +1,118 @@
+import csv
+import os
+import tempfile
+from io import StringIO
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from attendenceapp.gazetteer import Gazetteer, GazetteerBackend, build
+from attendenceapp.geo import haversine_array_m
+from attendenceapp.geocoding import GeocoderError
+
+
+class GazetteerTestCase(SimpleTestCase):
+    def setUp(self):
+        self.dir = self.enterContext(tempfile.TemporaryDirectory())
+        self.path = os.path.join(self.dir, "gazetteer")
+
+    def write_csv(self, rows, name="places.csv"):
+        csv_path = os.path.join(self.dir, name)
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["latitude", "longitude", "name", "locality", "city", "state"])
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+        return csv_path
+
+    def build(self, rows, cell_deg=0.01):
+        return build(self.write_csv(rows), self.path, cell_deg)
+
+
+class BuildTests(GazetteerTestCase):
+    def test_invalid_rows_are_skipped_and_addresses_shared(self):
+        meta = self.build([
+            {"latitude": 12.9716, "longitude": 77.5946, "name": "MG Road", "city": "Bengaluru", "state": "Karnataka"},
+            {"latitude": 12.9720, "longitude": 77.5950, "name": "MG Road", "city": "Bengaluru", "state": "Karnataka"},
+            {"latitude": 12.9352, "longitude": 77.6245, "name": "Koramangala", "locality": "Koramangala",
+             "city": "Bengaluru"},
+            {"latitude": "north", "longitude": 77.6, "name": "Bad"},
+            {"latitude": 95, "longitude": 77.6, "name": "Off the map"},
+            {"latitude": 12.9, "longitude": 77.6, "name": " "},
+        ])
+        self.assertEqual(meta, {"cell_deg": 0.01, "points": 3, "labels": 2, "cells": 2})
+        gazetteer = Gazetteer(self.path)
+        self.assertEqual(sorted({gazetteer.label(i) for i in range(3)}), [
+            "Koramangala, Bengaluru", "MG Road, Bengaluru, Karnataka",
+        ])
+
+    def test_rebuilds_swap_the_symlink(self):
+        self.build([{"latitude": 12.97, "longitude": 77.59, "name": "First"}])
+        first = Gazetteer(self.path)
+        first_dir = os.path.realpath(self.path)
+        self.build([{"latitude": 12.97, "longitude": 77.59, "name": "Second"}])
+        # A process that loaded the old build keeps reading it
+        self.assertEqual(first.label(0), "First")
+        self.assertEqual(Gazetteer(self.path).label(0), "Second")
+        self.assertTrue(os.path.isdir(first_dir))
+
+        self.build([{"latitude": 12.97, "longitude": 77.59, "name": "Third"}])
+        self.assertFalse(os.path.exists(first_dir))
+        builds = [entry for entry in os.listdir(self.dir) if entry.startswith("gazetteer.build-")]
+        self.assertEqual(len(builds), 2)
+
+    def test_a_plain_directory_is_moved_aside(self):
+        os.makedirs(self.path)
+        self.build([{"latitude": 12.97, "longitude": 77.59, "name": "MG Road"}])
+        self.assertTrue(os.path.islink(self.path))
+        self.assertEqual(Gazetteer(self.path).label(0), "MG Road")
+
+    def test_command(self):
+        out = StringIO()
+        call_command("build_gazetteer", self.write_csv([{"latitude": 12.97, "longitude": 77.59, "name": "MG Road"}]),
+                     "--output", self.path, "--cell-deg", "0.02", stdout=out)
+        self.assertIn("Built gazetteer of 1 place(s)", out.getvalue())
+        self.assertEqual(Gazetteer(self.path).cell_deg, 0.02)
+
+
+class NearestTests(GazetteerTestCase):
+    def test_matches_a_brute_force_search(self):
+        rng = np.random.default_rng(7)
+        lats, lngs = rng.uniform(12.8, 13.1, 400), rng.uniform(77.4, 77.8, 400)
+        self.build([
+            {"latitude": lat, "longitude": lng, "name": f"Place {i}"} for i, (lat, lng) in enumerate(zip(lats, lngs))
+        ])
+        gazetteer = Gazetteer(self.path)
+        for lat, lng in zip(rng.uniform(12.7, 13.2, 50), rng.uniform(77.3, 77.9, 50)):
+            distances = haversine_array_m(lat, lng, lats, lngs)
+            closest = int(np.argmin(distances))
+            found = gazetteer.nearest(lat, lng, 5000)
+            if distances[closest] > 5000:
+                self.assertIsNone(found)
+            else:
+                self.assertEqual(found[0], f"Place {closest}")
+                self.assertAlmostEqual(found[1], distances[closest], places=3)
+
+    def test_max_distance(self):
+        self.build([{"latitude": 12.97, "longitude": 77.59, "name": "MG Road"}])
+        gazetteer = Gazetteer(self.path)
+        self.assertEqual(gazetteer.nearest(12.973, 77.59, 500)[0], "MG Road")
+        self.assertIsNone(gazetteer.nearest(12.98, 77.59, 500))
+
+    def test_empty_gazetteer(self):
+        self.build([])
+        self.assertIsNone(Gazetteer(self.path).nearest(12.97, 77.59, 500))
+
+
+class GazetteerBackendTests(GazetteerTestCase):
+    def test_reverse(self):
+        self.build([{"latitude": 12.97, "longitude": 77.59, "name": "MG Road", "city": "Bengaluru"}])
+        with override_settings(GAZETTEER_PATH=self.path, GAZETTEER_MAX_DISTANCE_M=500):
+            backend = GazetteerBackend()
+            self.assertEqual(backend.reverse("12.9701", "77.5901"), "MG Road, Bengaluru")
+            self.assertIsNone(backend.reverse(13.5, 77.59))
+
+    def test_missing_gazetteer_is_a_transient_error(self):
+        with override_settings(GAZETTEER_PATH=self.path), self.assertRaises(GeocoderError):
+            GazetteerBackend().reverse(12.97, 77.59)
@@ -0,0 +1,112 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+
+from attendenceapp import geocode_cache
+from attendenceapp.geocode_cache import LRUCache, cache_key
+from attendenceapp.models import GeocodeCacheEntry
+
+from .base import TrackingTestCase
+
+
+class LRUCacheTests(SimpleTestCase):
+    def test_least_recently_used_is_evicted(self):
+        lru = LRUCache(2)
+        lru.set("a", 1, 60)
+        lru.set("b", 2, 60)
+        self.assertEqual(lru.get("a"), 1)
+        lru.set("c", 3, 60)
+        self.assertEqual((lru.get("a"), lru.get("b"), lru.get("c")), (1, None, 3))
+
+    def test_expired_entries_are_dropped(self):
+        lru = LRUCache(2)
+        lru.set("a", 1, 0)
+        self.assertIsNone(lru.get("a"))
+        self.assertNotIn("a", lru.entries)
+
+    def test_keys_round_to_the_precision(self):
+        self.assertEqual(cache_key(12.97161, "77.59461"), "12.9716,77.5946")
+        self.assertEqual(cache_key(12.97159, 77.59459), cache_key(12.97161, 77.59461))
+        with override_settings(GEOCODE_CACHE_PRECISION=2):
+            self.assertEqual(cache_key(12.9, -0.001), "12.90,-0.00")
+
+
+class SingleFlightTests(SimpleTestCase):
+    """Concurrent misses, with the table level replaced by the in-process one"""
+
+    def setUp(self):
+        lru = LRUCache(16)
+        self.enterContext(mock.patch.object(geocode_cache, "local", lru))
+        self.enterContext(mock.patch.object(geocode_cache, "get", lambda lat, lng: lru.get(cache_key(lat, lng))))
+        self.enterContext(mock.patch.object(
+            geocode_cache, "store", lambda lat, lng, address: lru.set(cache_key(lat, lng), address, 60),
+        ))
+
+    def test_concurrent_misses_share_one_lookup(self):
+        release = threading.Event()
+        calls = []
+
+        def lookup(lat, lng):
+            calls.append((lat, lng))
+            release.wait(5)
+            return "MG Road"
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(geocode_cache.get_or_lookup(12.9716, 77.5946, lookup)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(results, ["MG Road"] * 4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(geocode_cache._inflight, {})
+
+
+class GeocodeCacheTests(TrackingTestCase):
+    def setUp(self):
+        super().setUp()
+        geocode_cache.local.clear()
+        self.addCleanup(geocode_cache.local.clear)
+
+    def test_table_answers_after_the_local_level_is_lost(self):
+        geocode_cache.store(12.9716, 77.5946, "MG Road")
+        geocode_cache.local.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(geocode_cache.get(12.97161, 77.59459), "MG Road")
+        with self.assertNumQueries(0):
+            self.assertEqual(geocode_cache.get(12.9716, 77.5946), "MG Road")
+
+    def test_expired_rows_are_misses(self):
+        GeocodeCacheEntry.objects.create(key=cache_key(12.9716, 77.5946), address="Old",
+                                         expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(geocode_cache.get(12.9716, 77.5946))
+
+    def test_failed_lookups_are_not_cached(self):
+        lookup = mock.Mock(side_effect=[None, "MG Road"])
+        self.assertIsNone(geocode_cache.get_or_lookup(12.9716, 77.5946, lookup))
+        self.assertEqual(geocode_cache.get_or_lookup(12.9716, 77.5946, lookup), "MG Road")
+        self.assertEqual(geocode_cache.get_or_lookup(12.9716, 77.5946, lookup), "MG Road")
+        self.assertEqual(lookup.call_count, 2)
+
+        with self.assertRaises(RuntimeError):
+            geocode_cache.get_or_lookup(13.0, 77.0, mock.Mock(side_effect=RuntimeError))
+        self.assertEqual(geocode_cache._inflight, {})
+
+    @override_settings(GEOCODE_CACHE_MAX_ENTRIES=2)
+    def test_purge_keeps_the_newest_live_rows(self):
+        now = timezone.now()
+        for i, hours in enumerate((-1, 1, 2, 3)):
+            GeocodeCacheEntry.objects.create(key=f"k{i}", address=str(i), expires_at=now + timedelta(hours=hours))
+        out = StringIO()
+        call_command("purge_geocode_cache", stdout=out)
+        self.assertIn("Deleted 2", out.getvalue())
+        self.assertEqual(sorted(GeocodeCacheEntry.objects.values_list("key", flat=True)), ["k2", "k3"])
@@ -0,0 +1,90 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from attendenceapp import geocode_cache, geocode_worker, geocoding
+from attendenceapp.models import Pinpoint
+
+from .base import TrackingTestCase
+
+
+@override_settings(GEOCODE_MAX_ATTEMPTS=3, GEOCODE_RETRY_BASE_SECONDS=30, GEOCODE_RETRY_MAX_SECONDS=100,
+                   GEOCODE_CLAIM_SECONDS=300)
+class GeocodeWorkerTests(TrackingTestCase):
+    def setUp(self):
+        super().setUp()
+        geocode_cache.local.clear()
+        self.addCleanup(geocode_cache.local.clear)
+        self.pinpoint = Pinpoint.objects.create(latitude=12.9716, longitude=77.5946, address_status="pending")
+
+    def reverse_with(self, **kwargs):
+        return mock.patch.object(geocoding, "reverse", mock.Mock(**kwargs))
+
+    def state(self):
+        self.pinpoint.refresh_from_db()
+        return self.pinpoint.address_status, self.pinpoint.geocode_attempts
+
+    def test_retry_delay_doubles_up_to_the_maximum(self):
+        self.assertEqual([geocode_worker.retry_delay(n) for n in (1, 2, 3, 4)], [30, 60, 100, 100])
+
+    def test_resolved(self):
+        with self.reverse_with(return_value="MG Road"):
+            self.assertEqual(geocode_worker.resolve(self.pinpoint.id, schedule_retry=False), "resolved")
+        self.assertEqual(self.state(), ("resolved", 0))
+        self.assertEqual(self.pinpoint.address, "MG Road")
+        self.assertIsNone(self.pinpoint.next_geocode_at)
+        # Settled pinpoints are not claimed again
+        self.assertIsNone(geocode_worker.resolve(self.pinpoint.id))
+
+    def test_errors_back_off_then_give_up(self):
+        with self.reverse_with(side_effect=geocoding.GeocoderError("timeout")):
+            for attempt in (1, 2):
+                before = timezone.now()
+                self.assertEqual(geocode_worker.resolve(self.pinpoint.id, schedule_retry=False), "pending")
+                self.assertEqual(self.state(), ("pending", attempt))
+                delay = (self.pinpoint.next_geocode_at - before).total_seconds()
+                self.assertAlmostEqual(delay, geocode_worker.retry_delay(attempt), delta=5)
+                Pinpoint.objects.filter(pk=self.pinpoint.pk).update(next_geocode_at=timezone.now())
+            self.assertEqual(geocode_worker.resolve(self.pinpoint.id, schedule_retry=False), "failed")
+        self.assertEqual(self.state(), ("failed", 3))
+        self.assertEqual(self.pinpoint.address, geocode_worker.fallback_address(12.9716, 77.5946))
+
+    def test_skipped_lookups_spend_no_attempt(self):
+        with self.reverse_with(side_effect=geocoding.GeocoderSkipped("rate limited")):
+            self.assertEqual(geocode_worker.resolve(self.pinpoint.id, schedule_retry=False), "pending")
+        self.assertEqual(self.state(), ("pending", 0))
+
+    def test_no_address_fails_at_once(self):
+        with self.reverse_with(return_value=None):
+            self.assertEqual(geocode_worker.resolve(self.pinpoint.id, schedule_retry=False), "failed")
+        self.assertEqual(self.state(), ("failed", 1))
+
+    def test_unexpected_errors_release_the_claim(self):
+        with self.reverse_with(side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            geocode_worker.resolve(self.pinpoint.id)
+        self.assertEqual(self.state(), ("pending", 0))
+        self.assertIsNone(self.pinpoint.next_geocode_at)
+
+    def test_claims_are_leased(self):
+        self.assertIsNotNone(geocode_worker._claim(self.pinpoint.id))
+        self.assertIsNone(geocode_worker._claim(self.pinpoint.id))
+        self.assertFalse(geocode_worker.due_pinpoints().exists())
+
+        # The claimant died: its lease runs out and the sweep takes over
+        Pinpoint.objects.filter(pk=self.pinpoint.pk).update(next_geocode_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(geocode_worker.due_pinpoints().exists())
+        with self.reverse_with(return_value="MG Road"):
+            out = StringIO()
+            call_command("geocode_pinpoints", stdout=out)
+        self.assertIn("Resolved 1", out.getvalue())
+        self.assertEqual(self.state(), ("resolved", 0))
+
+    def test_sweep_skips_retries_not_yet_due(self):
+        Pinpoint.objects.filter(pk=self.pinpoint.pk).update(next_geocode_at=timezone.now() + timedelta(minutes=5))
+        self.assertFalse(geocode_worker.due_pinpoints().exists())
+        Pinpoint.objects.filter(pk=self.pinpoint.pk).update(next_geocode_at=None)
+        self.assertTrue(geocode_worker.due_pinpoints().exists())
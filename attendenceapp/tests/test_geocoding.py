@@ -0,0 +1,139 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from attendenceapp import geocoding
+from attendenceapp.geocoding import CircuitBreaker, GeocoderError, GeocoderSkipped, GeocodingClient, TokenBucket
+
+
+class FakeClock:
+    """Stands in for the time module: sleeping advances the monotonic clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class ClockTestCase(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.enterContext(mock.patch.object(geocoding, "time", self.clock))
+
+
+class TokenBucketTests(ClockTestCase):
+    def test_bursts_then_waits_for_the_rate(self):
+        bucket = TokenBucket(rate=2, capacity=3)
+        self.assertTrue(all(bucket.acquire(0) for _ in range(3)))
+        self.assertFalse(bucket.acquire(0.4))
+        self.assertEqual(self.clock.now, 1000.0)
+        self.assertTrue(bucket.acquire(1))
+        self.assertAlmostEqual(self.clock.now, 1000.5)
+
+    def test_refill_is_capped(self):
+        bucket = TokenBucket(rate=1, capacity=0)
+        self.clock.now += 3600
+        self.assertTrue(bucket.acquire(0))
+        self.assertFalse(bucket.acquire(0))
+
+
+class CircuitBreakerTests(ClockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.breaker = CircuitBreaker(threshold=2, reset_seconds=60)
+        self.breaker.failure()
+        self.breaker.failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.assertTrue(self.breaker.is_open)
+        self.assertFalse(self.breaker.allow())
+        breaker = CircuitBreaker(threshold=2, reset_seconds=60)
+        breaker.failure()
+        breaker.success()
+        breaker.failure()
+        self.assertFalse(breaker.is_open)
+
+    def test_one_trial_after_the_reset_time(self):
+        self.clock.now += 60
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.success()
+        self.assertFalse(self.breaker.is_open)
+        self.assertTrue(self.breaker.allow())
+
+    def test_a_failed_trial_reopens(self):
+        self.clock.now += 60
+        self.assertTrue(self.breaker.allow())
+        self.breaker.failure()
+        self.assertFalse(self.breaker.allow())
+        self.clock.now += 59
+        self.assertFalse(self.breaker.allow())
+
+    def test_a_cancelled_trial_goes_to_the_next_caller(self):
+        self.clock.now += 60
+        self.assertTrue(self.breaker.allow())
+        self.breaker.cancel()
+        self.assertTrue(self.breaker.allow())
+
+
+@override_settings(GEOCODE_RATE_WAIT_SECONDS=0)
+class GeocodingClientTests(ClockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.backend = mock.Mock()
+        self.client = GeocodingClient(self.backend, TokenBucket(1, 5), CircuitBreaker(2, 60))
+
+    def test_addresses_and_no_address(self):
+        self.backend.reverse.side_effect = ["MG Road", None]
+        self.assertEqual(self.client.reverse(12.9, 77.6), "MG Road")
+        self.assertIsNone(self.client.reverse(12.9, 77.6))
+        self.assertEqual(self.client.breaker.failures, 0)
+
+    def test_failures_are_geocoder_errors_and_open_the_circuit(self):
+        self.backend.reverse.side_effect = [GeocoderError("503"), ValueError("bad json")]
+        with self.assertLogs("attendenceapp.geocoding", "WARNING") as logs:
+            with self.assertRaises(GeocoderError):
+                self.client.reverse(12.9, 77.6)
+            with self.assertRaisesMessage(GeocoderError, "bad json"):
+                self.client.reverse(12.9, 77.6)
+        self.assertIn("circuit opened", logs.output[-1])
+        with self.assertRaisesMessage(GeocoderSkipped, "circuit open"):
+            self.client.reverse(12.9, 77.6)
+        self.assertEqual(self.backend.reverse.call_count, 2)
+
+    def test_rate_limited_lookups_are_skipped(self):
+        self.client.limiter = TokenBucket(1, 1)
+        self.backend.reverse.return_value = "MG Road"
+        self.client.reverse(12.9, 77.6)
+        with self.assertRaisesMessage(GeocoderSkipped, "rate limit"):
+            self.client.reverse(12.9, 77.6)
+        self.assertEqual(self.backend.reverse.call_count, 1)
+
+    def test_a_rate_limited_trial_is_handed_back(self):
+        self.client.breaker.failure()
+        self.client.breaker.failure()
+        self.clock.now += 60
+        self.client.limiter = TokenBucket(1, 1)
+        self.client.limiter.tokens = 0
+        with self.assertRaisesMessage(GeocoderSkipped, "rate limit"):
+            self.client.reverse(12.9, 77.6)
+        self.assertFalse(self.client.breaker.trial)
+
+
+class BuildClientTests(SimpleTestCase):
+    @override_settings(GEOCODE_BACKEND="fake", GEOCODE_RATE_PER_SECOND=1)
+    def test_registered_backends_are_rate_limited(self):
+        client = geocoding.build_client()
+        self.assertIsInstance(client.backend, geocoding.FakeBackend)
+        self.assertIsNotNone(client.limiter)
+        self.assertEqual(client.reverse(12.9, 77.6), "Fake Road 12.9000, 77.6000")
+
+    @override_settings(GEOCODE_BACKEND="attendenceapp.geocoding.FakeBackend", GEOCODE_RATE_PER_SECOND=0)
+    def test_dotted_paths_and_no_rate_limit(self):
+        client = geocoding.build_client()
+        self.assertIsInstance(client.backend, geocoding.FakeBackend)
+        self.assertIsNone(client.limiter)
@@ -0,0 +1,113 @@
+import datetime
+from datetime import timedelta
+
+import numpy as np
+from django.test import SimpleTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from attendenceapp import geofence
+from attendenceapp.geofence import Shape, contains, site_visits
+from attendenceapp.models import Geofence, GeofenceEvent, LiveSession, LocationPoint
+
+from .base import TrackingTestCase
+
+
+def polygon_shape(vertices):
+    lats = [v[0] for v in vertices]
+    lngs = [v[1] for v in vertices]
+    return Shape(1, "site", "polygon", (min(lats), min(lngs), max(lats), max(lngs)), None, None, np.array(vertices, dtype=float))
+
+
+class ContainsTests(SimpleTestCase):
+    def test_concave_polygon(self):
+        # An L: the square 0..2 x 0..2 without its 1..2 x 1..2 quarter
+        shape = polygon_shape([[0, 0], [0, 2], [1, 2], [1, 1], [2, 1], [2, 0]])
+        points = {
+            (0.5, 0.5): True, (0.5, 1.5): True, (1.5, 0.5): True,
+            (1.5, 1.5): False, (2.5, 0.5): False, (-0.5, 1): False,
+        }
+        lats = np.array([p[0] for p in points])
+        lngs = np.array([p[1] for p in points])
+        self.assertEqual(contains(shape, lats, lngs).tolist(), list(points.values()))
+
+    def test_circle(self):
+        shape = Shape(1, "site", "circle", (12.89, 77.59, 12.91, 77.61), (12.9, 77.6), 100, None)
+        # About 55 m and 167 m north of the centre
+        mask = contains(shape, np.array([12.9, 12.9005, 12.9015]), np.array([77.6, 77.6, 77.6]))
+        self.assertEqual(mask.tolist(), [True, True, False])
+
+
+class GeofenceEventTests(TrackingTestCase):
+    def setUp(self):
+        super().setUp()
+        # The rollback deletes the fence without telling this process's fence index
+        self.addCleanup(geofence.fences_changed)
+        self.site = Geofence.objects.create(name="Depot", shape="circle", center_latitude=12.9, center_longitude=77.6, radius_m=100)
+        self.api = self.client_for(self.make_user("field"))
+        self.session_id = self.api.post(reverse("start-session")).data["id"]
+        self.start = timezone.now() - timedelta(hours=1)
+
+    def upload(self, latitudes, first_minute=0):
+        points = [
+            {"latitude": lat, "longitude": 77.6, "timestamp": (self.start + timedelta(minutes=first_minute + i)).isoformat()}
+            for i, lat in enumerate(latitudes)
+        ]
+        response = self.api.post(reverse("upload-location-batch"), {"points": points}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def events(self):
+        return list(GeofenceEvent.objects.filter(session_id=self.session_id).values_list("event_type", "timestamp"))
+
+    def test_enter_and_exit_are_stamped_with_the_first_fix_inside_and_outside(self):
+        self.upload([12.89, 12.8995, 12.9])
+        self.assertEqual(self.events(), [("enter", self.start + timedelta(minutes=1))])
+        self.assertEqual(LiveSession.objects.get(pk=self.session_id).inside_geofences, [self.site.id])
+
+        self.upload([12.9002, 12.91], first_minute=3)
+        self.assertEqual([e[0] for e in self.events()], ["enter", "exit"])
+        self.assertEqual(self.events()[1][1], self.start + timedelta(minutes=4))
+        self.assertEqual(LiveSession.objects.get(pk=self.session_id).inside_geofences, [])
+
+    def test_deactivated_fence_is_left_without_an_event(self):
+        self.upload([12.9])
+        self.site.is_active = False
+        self.site.save()
+        self.upload([12.9], first_minute=1)
+        self.assertEqual([e[0] for e in self.events()], ["enter"])
+        self.assertEqual(LiveSession.objects.get(pk=self.session_id).inside_geofences, [])
+
+    def test_replay_finds_crossings_between_stored_points(self):
+        session = LiveSession.objects.get(pk=self.session_id)
+        # Two fixes either side of the fence: the straight segment crosses it
+        LocationPoint.objects.bulk_create([
+            LocationPoint(session=session, latitude=12.89, longitude=77.6, timestamp=self.start),
+            LocationPoint(session=session, latitude=12.91, longitude=77.6, timestamp=self.start + timedelta(minutes=10)),
+        ])
+        events = geofence.replay_session(session)
+        self.assertEqual([e.event_type for e in events], ["enter", "exit"])
+        # About 40% and 60% of the way along
+        self.assertTrue(self.start + timedelta(minutes=3) < events[0].timestamp < self.start + timedelta(minutes=5))
+        self.assertTrue(self.start + timedelta(minutes=5) < events[1].timestamp < self.start + timedelta(minutes=7))
+        self.assertEqual(len(self.events()), 2)
+
+
+class SiteVisitTests(SimpleTestCase):
+    def test_events_pair_into_visits(self):
+        start = datetime.datetime(2026, 3, 1, 8, tzinfo=datetime.timezone.utc)
+        depot, office = Geofence(id=1, name="Depot"), Geofence(id=2, name="Office")
+        events = [
+            GeofenceEvent(geofence=depot, event_type="exit", timestamp=start),
+            GeofenceEvent(geofence=office, event_type="enter", timestamp=start + timedelta(minutes=10)),
+            GeofenceEvent(geofence=office, event_type="exit", timestamp=start + timedelta(minutes=40)),
+            GeofenceEvent(geofence=depot, event_type="enter", timestamp=start + timedelta(minutes=50)),
+        ]
+        visits = site_visits(events)
+        self.assertEqual(
+            [(v["geofence"].name, v["arrival"], v["departure"], v["duration"]) for v in visits],
+            [
+                ("Depot", None, start, None),
+                ("Office", start + timedelta(minutes=10), start + timedelta(minutes=40), timedelta(minutes=30)),
+                ("Depot", start + timedelta(minutes=50), None, None),
+            ],
+        )
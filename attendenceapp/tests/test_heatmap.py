@@ -0,0 +1,113 @@
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from attendenceapp import daily_activity, heatmap
+from attendenceapp.models import LiveSession, LocationPoint
+
+from .base import TrackingTestCase
+
+
+class BinningTests(SimpleTestCase):
+    def test_cells_floor_on_both_sides_of_zero(self):
+        keys, counts = heatmap.bin_points(
+            np.array([0.0004, 0.0006, -0.0004, 0.0004]), np.array([-0.0004, -0.0004, 0.0004, -0.0001]),
+            np.array([1, 1, 3, 2]), 0.001,
+        )
+        lats, lngs = heatmap.cell_centers(keys, 0.001)
+        cells = sorted(zip(np.round(lats, 4).tolist(), np.round(lngs, 4).tolist(), counts.tolist()))
+        self.assertEqual(cells, [(-0.0005, 0.0005, 3), (0.0005, -0.0005, 4)])
+
+    def test_merge_equals_binning_everything_at_once(self):
+        rng = np.random.default_rng(3)
+        lats, lngs = rng.uniform(12.9, 13.0, 500), rng.uniform(77.5, 77.7, 500)
+        weights = rng.integers(1, 5, 500)
+        whole = heatmap.bin_points(lats, lngs, weights, 0.005)
+        parts = heatmap.merge([
+            heatmap.bin_points(lats[:200], lngs[:200], weights[:200], 0.005),
+            heatmap.EMPTY,
+            heatmap.bin_points(lats[200:], lngs[200:], weights[200:], 0.005),
+        ])
+        self.assertEqual(parts[0].tolist(), whole[0].tolist())
+        self.assertEqual(parts[1].tolist(), whole[1].tolist())
+        self.assertEqual(heatmap.merge([heatmap.EMPTY]), heatmap.EMPTY)
+
+
+class HeatmapTestCase(TrackingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.employee = self.make_user("field")
+        self.today = timezone.localdate()
+        self.yesterday = self.today - timedelta(days=1)
+
+    def track(self, date, points, employee=None):
+        """A closed session on ``date`` with (latitude, longitude, dropped_before) points"""
+        employee = employee or self.employee
+        session = LiveSession.objects.create(employee=employee, local_date=date, is_active=False)
+        start = timezone.now() - timedelta(days=(self.today - date).days, hours=1)
+        LocationPoint.objects.bulk_create([
+            LocationPoint(session=session, latitude=lat, longitude=lng, dropped_before=dropped,
+                          timestamp=start + timedelta(seconds=10 * i))
+            for i, (lat, lng, dropped) in enumerate(points)
+        ])
+        LiveSession.objects.filter(pk=session.pk).update(point_count=session.location_points.count())
+        daily_activity.rebuild(date, date, [employee.id])
+        return session
+
+
+class AggregateTests(HeatmapTestCase):
+    def test_thinned_points_count_their_dropped_fixes(self):
+        self.track(self.yesterday, [(12.9001, 77.6001, 0), (12.9002, 77.6002, 4), (12.9501, 77.6001, 0)])
+        keys, counts, employees = heatmap.aggregate(self.yesterday, self.today, 0.01)
+        self.assertEqual(sorted(counts.tolist()), [1, 6])
+        self.assertEqual(employees, [self.employee.id])
+
+    def test_past_days_are_cached_until_their_activity_changes(self):
+        session = self.track(self.yesterday, [(12.9001, 77.6001, 0)])
+        heatmap.aggregate(self.yesterday, self.yesterday, 0.01)
+        with self.assertNumQueries(1):
+            self.assertEqual(heatmap.aggregate(self.yesterday, self.yesterday, 0.01)[1].tolist(), [1])
+
+        LocationPoint.objects.create(session=session, latitude=12.9002, longitude=77.6002, timestamp=timezone.now())
+        LiveSession.objects.filter(pk=session.pk).update(point_count=2)
+        daily_activity.rebuild(self.yesterday, self.yesterday)
+        self.assertEqual(heatmap.aggregate(self.yesterday, self.yesterday, 0.01)[1].tolist(), [2])
+
+    def test_today_is_never_cached(self):
+        self.track(self.today, [(12.9001, 77.6001, 0)])
+        heatmap.aggregate(self.today, self.today, 0.01)
+        self.assertFalse(cache.get_many([
+            heatmap._partial_key(row, 0.01) for row in self.employee.daily_activity.all()
+        ]))
+
+
+class TeamHeatmapEndpointTests(HeatmapTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = self.client_for(self.make_user("boss", role="admin"))
+        self.track(self.yesterday, [(12.9001, 77.6001, 0), (12.9002, 77.6002, 0), (13.0501, 77.6001, 0)])
+        self.track(self.today, [(12.9003, 77.6003, 0)], employee=self.make_user("other"))
+
+    def get(self, **params):
+        return self.admin.get(reverse("team-heatmap"), {"cell_deg": 0.01, **params})
+
+    def test_cells_busiest_first(self):
+        data = self.get().data
+        self.assertEqual((data["total_points"], data["cell_count"], len(data["employees"])), (4, 2, 2))
+        self.assertEqual(data["cells"][0], [12.905, 77.605, 3])
+        self.assertGreater(data["coverage_km2"], 0)
+
+    def test_filters(self):
+        self.assertEqual(self.get(employee_ids=str(self.employee.id)).data["total_points"], 3)
+        self.assertEqual(self.get(bbox="13,77,14,78").data["cells"], [[13.055, 77.605, 1]])
+        self.assertEqual(self.get(date=str(self.today)).data["total_points"], 1)
+
+    def test_admin_only_and_invalid_params(self):
+        self.assertEqual(self.client_for(self.employee).get(reverse("team-heatmap")).status_code, 403)
+        for params in ({"cell_deg": 0.003}, {"bbox": "14,77,13,78"}, {"bbox": "1,2,3"}, {"employee_ids": "x"},
+                       {"start_date": str(self.today - timedelta(days=60)), "end_date": str(self.today)}):
+            self.assertEqual(self.get(**params).status_code, 400, params)
@@ -0,0 +1,149 @@
+import json
+from datetime import timedelta
+
+from django.core import signing
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from attendenceapp.archive import archive_session
+from attendenceapp.history import decode_cursor, encode_cursor, merged_points, stream_history
+from attendenceapp.models import LiveSession, LocationPoint, Pinpoint
+
+from .base import TrackingTestCase
+
+
+class HistoryTestCase(TrackingTestCase):
+    """
+    Two sessions on consecutive days: yesterday's is archived (plus one late
+    raw point), today's is raw and has two fixes with the same timestamp.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.admin = self.client_for(self.make_user("boss", role="admin"))
+        self.employee = self.make_user("field")
+        self.today = timezone.localdate()
+        self.yesterday = self.today - timedelta(days=1)
+        start = timezone.now().replace(microsecond=0) - timedelta(days=1)
+
+        archived = self.add_session(self.yesterday, start, [0, 1, 2, 3, 4], pinpoint_minutes=[2])
+        LiveSession.objects.filter(pk=archived.pk).update(is_active=False, end_time=start + timedelta(minutes=5))
+        archived.refresh_from_db()
+        archive_session(archived, delete_raw=True)
+        LocationPoint.objects.create(session=archived, latitude=13.0, longitude=77.6, timestamp=start + timedelta(minutes=4.5))
+
+        self.add_session(self.today, start + timedelta(days=1), [0, 1, 1, 2], pinpoint_minutes=[0, 3])
+        self.sessions = list(LiveSession.objects.order_by("start_time"))
+        self.expected = [(row[2], row[0]) for row in merged_points([s.id for s in self.sessions])]
+
+    def add_session(self, local_date, start, minutes, pinpoint_minutes=()):
+        session = LiveSession.objects.create(employee=self.employee, local_date=local_date)
+        LiveSession.objects.filter(pk=session.pk).update(start_time=start)
+        LocationPoint.objects.bulk_create([
+            LocationPoint(session=session, latitude=12.9 + i * 0.001, longitude=77.6, timestamp=start + timedelta(minutes=m))
+            for i, m in enumerate(minutes)
+        ])
+        for m in pinpoint_minutes:
+            pinpoint = Pinpoint.objects.create(session=session, latitude=12.95, longitude=77.65, place="Stop")
+            Pinpoint.objects.filter(pk=pinpoint.pk).update(timestamp=start + timedelta(minutes=m))
+        return session
+
+    def date_params(self, **params):
+        return dict(params, start_date=self.yesterday.isoformat(), end_date=self.today.isoformat())
+
+
+class MergedPointsTests(HistoryTestCase):
+    def test_points_are_merged_in_timestamp_order(self):
+        self.assertEqual(len(self.expected), 5 + 1 + 1 + 4 + 2)
+        self.assertEqual([timestamp for _, timestamp in self.expected], sorted(t for _, t in self.expected))
+        # Yesterday's pinpoint shares the third path point's timestamp and follows it
+        timestamp = self.expected[2][1]
+        self.assertEqual(self.expected[2:4], [("path", timestamp), ("pinpoint", timestamp)])
+
+    @override_settings(LOCATION_HISTORY_CHUNK_SIZE=2)
+    def test_small_chunks_read_every_row_once(self):
+        rows = list(merged_points([s.id for s in self.sessions]))
+        self.assertEqual([(row[2], row[0]) for row in rows], self.expected)
+        self.assertEqual(len({(row[2], row[1]) for row in rows}), len(rows))
+
+
+class StreamingHistoryTests(HistoryTestCase):
+    def get_stream(self, **params):
+        response = self.admin.get(reverse("location-history", args=[self.employee.id]), self.date_params(stream="true", **params))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return json.loads(b"".join(response.streaming_content))
+
+    @override_settings(LOCATION_HISTORY_CHUNK_SIZE=2)
+    def test_stream_is_one_ordered_document(self):
+        data = self.get_stream()
+        self.assertEqual([s["id"] for s in data["sessions"]], [s.id for s in self.sessions])
+        self.assertEqual(data["total_sessions"], 2)
+        self.assertEqual([p["type"] for p in data["points"]], [kind for kind, _ in self.expected])
+        self.assertEqual(
+            data["statistics"], {"total_path_points": 10, "total_pinpoints": 3, "total_points": 13},
+        )
+        dates = {p["session_id"]: p["date"] for p in data["points"]}
+        self.assertEqual(dates, {self.sessions[0].id: self.yesterday.isoformat(), self.sessions[1].id: self.today.isoformat()})
+        self.assertEqual({p["place"] for p in data["points"] if p["type"] == "pinpoint"}, {"Stop"})
+
+    @override_settings(LOCATION_HISTORY_MAX_DAYS=1)
+    def test_only_the_stream_may_exceed_the_day_limit(self):
+        response = self.admin.get(reverse("location-history", args=[self.employee.id]), self.date_params())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.get_stream()["statistics"]["total_points"], 13)
+
+    def test_batches_join_into_valid_json(self):
+        sessions = [{"id": s.id, "date": s.local_date.isoformat()} for s in self.sessions]
+        for batch_size in (1, 2, 13, 100):
+            document = json.loads("".join(stream_history({"total_sessions": 2}, sessions, batch_size=batch_size)))
+            self.assertEqual(len(document["points"]), 13, batch_size)
+
+        empty = json.loads("".join(stream_history({"total_sessions": 0}, [])))
+        self.assertEqual((empty["points"], empty["statistics"]["total_points"]), ([], 0))
+
+
+class HistoryPageTests(HistoryTestCase):
+    def get_page(self, employee_id=None, **params):
+        url = reverse("location-history-page", args=[employee_id or self.employee.id])
+        return self.admin.get(url, self.date_params(**params))
+
+    def test_pages_walk_the_merged_stream(self):
+        seen, cursor = [], None
+        while True:
+            response = self.get_page(page_size=3, **({"cursor": cursor} if cursor else {}))
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data["points"]), 3)
+            seen.extend((p["type"], p["timestamp"]) for p in response.data["points"])
+            cursor = response.data["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.expected)
+
+    def test_cursor_round_trip(self):
+        timestamp = self.expected[0][1]
+        query = [self.employee.id, "2026-03-01", "2026-03-02"]
+        cursor = encode_cursor(query, (timestamp, 7), None)
+        self.assertEqual(decode_cursor(cursor, query), ((timestamp, 7), None))
+
+    def test_tampered_and_foreign_cursors_are_rejected(self):
+        cursor = self.get_page(page_size=2).data["next_cursor"]
+        tampered = cursor[:-3] + ("AAA" if cursor[-3:] != "AAA" else "BBB")
+        self.assertEqual(self.get_page(cursor=tampered).status_code, 400)
+
+        # Bound to the employee and the date range it was issued for
+        other = self.make_user("other")
+        self.assertEqual(self.get_page(employee_id=other.id, cursor=cursor).status_code, 400)
+        response = self.admin.get(reverse("location-history-page", args=[self.employee.id]), {"date": self.today.isoformat(), "cursor": cursor})
+        self.assertEqual(response.status_code, 400)
+
+        # A well-formed cursor signed for another purpose does not decode
+        query = [self.employee.id, self.yesterday.isoformat(), self.today.isoformat()]
+        forged = signing.dumps({"q": query, "p": None, "n": None}, salt="another.salt", compress=True)
+        self.assertEqual(self.get_page(cursor=forged).status_code, 400)
+
+    @override_settings(LOCATION_HISTORY_CURSOR_MAX_AGE=-1)
+    def test_expired_cursor_is_rejected(self):
+        cursor = self.get_page(page_size=2).data["next_cursor"]
+        self.assertEqual(self.get_page(cursor=cursor).status_code, 400)
@@ -0,0 +1,68 @@
+from django.test import override_settings
+from django.urls import reverse
+
+from attendenceapp.ingest import parse_timestamp
+from attendenceapp.models import LiveSession, LocationPoint
+
+from .base import TrackingTestCase, zigzag
+
+
+class BatchUploadTests(TrackingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.api = self.client_for(self.make_user("field"))
+        self.session_id = self.api.post(reverse("start-session")).data["id"]
+
+    def upload(self, points):
+        return self.api.post(reverse("upload-location-batch"), {"points": points}, format="json")
+
+    def test_batch_is_stored_in_one_request(self):
+        response = self.upload(zigzag(4))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["accepted"], response.data["stored"], response.data["total_points"]), (4, 4, 4))
+        self.assertEqual(LocationPoint.objects.filter(session_id=self.session_id).count(), 4)
+        self.assertEqual(LiveSession.objects.get(pk=self.session_id).point_count, 4)
+
+    def test_bad_points_are_reported_not_fatal(self):
+        points = zigzag(2) + [{"latitude": 95, "longitude": 77.6}, "not a point", {"latitude": "x"}]
+        response = self.upload(points)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["accepted"], 2)
+        self.assertEqual([item["index"] for item in response.data["rejected"]], [2, 3, 4])
+
+    @override_settings(LOCATION_BATCH_MAX_POINTS=3)
+    def test_oversized_batches_are_rejected(self):
+        self.assertEqual(self.upload(zigzag(4)).status_code, 400)
+        self.assertEqual(self.upload("nope").status_code, 400)
+        self.assertFalse(LocationPoint.objects.exists())
+
+
+class InvalidUploadTests(TrackingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.api = self.client_for(self.make_user("field"))
+        self.api.post(reverse("start-session"))
+
+    def test_non_object_bodies_are_rejected(self):
+        for name in ("update-location", "update-live-location", "upload-location-batch", "sync-locations"):
+            response = self.api.post(reverse(name), [{"latitude": 12.9, "longitude": 77.6}], format="json")
+            self.assertEqual(response.status_code, 400, name)
+
+    def test_out_of_range_epoch_timestamps_are_rejected(self):
+        for value in (1e20, 1e300, float("inf")):
+            with self.assertRaises(ValueError):
+                parse_timestamp(value)
+
+        response = self.api.post(reverse("upload-location-batch"), {
+            "points": [{"latitude": 12.9, "longitude": 77.6, "timestamp": 1e20}],
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data["rejected"]), 1)
+
+        response = self.api.post(reverse("update-live-location"), {
+            "latitude": 12.9, "longitude": 77.6, "timestamp": 10 ** 30,
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_epoch_seconds_and_milliseconds(self):
+        self.assertEqual(parse_timestamp(1_700_000_000), parse_timestamp(1_700_000_000_000))
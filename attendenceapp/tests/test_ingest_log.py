@@ -0,0 +1,86 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+
+from attendenceapp import ingest_log
+from attendenceapp.models import IngestLogCursor, LocationPoint, SyncDevice
+
+from .base import TrackingTestCase, zigzag
+
+
+class IngestLogTests(TrackingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.log_dir, ignore_errors=True)
+        settings = override_settings(
+            LOCATION_INGEST_MODE="buffered", LOCATION_INGEST_LOG_DIR=self.log_dir, LOCATION_INGEST_FSYNC=False,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # A fresh writer, so segments land in this test's directory
+        patcher = mock.patch.object(ingest_log, "_writer", ingest_log.SegmentWriter())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.api = self.client_for(self.make_user("field"))
+        self.session_id = self.api.post(reverse("start-session")).data["id"]
+
+    def upload(self, points, **body):
+        return self.api.post(reverse("upload-location-batch"), dict(body, points=points), format="json")
+
+    def segment(self):
+        (name,) = [name for name in os.listdir(self.log_dir) if name.endswith(ingest_log.SEGMENT_SUFFIX)]
+        return os.path.join(self.log_dir, name)
+
+    def test_points_are_stored_by_the_flusher(self):
+        response = self.upload(zigzag(3))
+        self.assertEqual((response.status_code, response.data["queued"]), (202, True))
+        self.assertFalse(LocationPoint.objects.exists())
+
+        self.assertEqual(ingest_log.flush(), 3)
+        self.assertEqual(LocationPoint.objects.filter(session_id=self.session_id).count(), 3)
+        # The cursor remembers how far the segment was drained
+        self.assertEqual(ingest_log.flush(), 0)
+        self.assertEqual(IngestLogCursor.objects.get().offset, os.path.getsize(self.segment()))
+
+    def test_replayed_sequenced_records_are_not_stored_twice(self):
+        self.upload(zigzag(3), device_id="phone-1")
+        self.assertFalse(SyncDevice.objects.exists())
+        ingest_log.flush()
+        self.assertEqual(SyncDevice.objects.get().last_seq, 3)
+
+        # As after a crash between storing and moving the cursor
+        IngestLogCursor.objects.update(offset=0)
+        ingest_log.flush()
+        self.assertEqual(LocationPoint.objects.count(), 3)
+
+    def test_bad_records_are_moved_aside(self):
+        self.upload(zigzag(1))
+        with open(self.segment(), "ab") as f:
+            f.write(b"{not json\n")
+            f.write(json.dumps({"session": self.session_id, "latitude": 95, "longitude": 77.6,
+                                "timestamp": "2020-01-01T00:00:00Z", "seq": None}).encode() + b"\n")
+            f.write(json.dumps({"session": self.session_id, "device_id": " " * 3, "latitude": 12.91,
+                                "longitude": 77.61, "timestamp": "2020-01-01T00:00:00Z", "seq": 1}).encode() + b"\n")
+        self.upload(zigzag(2, first_seq=5)[1:])
+
+        self.assertEqual(ingest_log.flush(), 2)
+        with open(self.segment()[:-len(ingest_log.SEGMENT_SUFFIX)] + ingest_log.DEAD_LETTER_SUFFIX, "rb") as f:
+            self.assertEqual(len(f.read().splitlines()), 3)
+        # Not retried on the next flush
+        self.assertEqual(ingest_log.flush(), 0)
+
+    def test_drained_old_segments_are_removed(self):
+        self.upload(zigzag(2))
+        ingest_log.flush()
+        path = self.segment()
+        os.utime(path, (0, 0))
+        ingest_log.flush()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(IngestLogCursor.objects.exists())
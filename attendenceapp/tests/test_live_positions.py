@@ -0,0 +1,123 @@
+from django.core.cache import cache
+from django.urls import reverse
+
+from attendenceapp import live_positions
+from attendenceapp.live_positions import RegistryLockTimeout
+from attendenceapp.models import LiveSession
+
+from .base import TrackingTestCase
+
+
+class LiveMapTestCase(TrackingTestCase):
+    """Three employees on the map, 0.02 degrees of latitude apart"""
+
+    def setUp(self):
+        super().setUp()
+        self.admin = self.client_for(self.make_user("boss", role="admin"))
+        self.employees = []
+        for i in range(3):
+            employee = self.make_user(f"field{i}")
+            api = self.client_for(employee)
+            session_id = api.post(reverse("start-session")).data["id"]
+            self.employees.append((employee, api, session_id))
+            self.move(i, 12.9 + i * 0.02, 77.6)
+
+    def move(self, index, latitude, longitude):
+        response = self.employees[index][1].post(reverse("update-live-location"), {
+            "latitude": latitude, "longitude": longitude,
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def live_ids(self):
+        return sorted(int(employee_id) for employee_id in self.admin.get(reverse("live-all-locations")).data)
+
+    def everyone(self):
+        return sorted(employee.id for employee, _, _ in self.employees)
+
+
+class LivePositionRegistryTests(LiveMapTestCase):
+    def test_lock_is_not_reentrant(self):
+        with live_positions._locked():
+            with self.assertRaises(RegistryLockTimeout):
+                with live_positions._locked(timeout=0.05):
+                    pass
+        # Released again afterwards
+        with live_positions._locked(timeout=0.05):
+            pass
+
+    def test_live_map_reads_no_database(self):
+        self.live_ids()
+        with self.assertNumQueries(0):
+            # The admin user is authenticated without a query by the test client
+            self.assertEqual(self.live_ids(), self.everyone())
+
+    def test_moves_after_members_eviction(self):
+        cache.delete(live_positions.MEMBERS_KEY)
+        self.move(0, 13.5, 77.6)
+        self.assertEqual(self.live_ids(), self.everyone())
+        self.assertEqual(live_positions.get(self.employees[0][0].id)["latitude"], 13.5)
+
+    def test_rebuild_after_cache_loss(self):
+        # Seeded from the persisted copy on the LiveSession rows
+        cache.clear()
+        self.assertEqual(self.live_ids(), self.everyone())
+
+    def test_stopped_session_leaves_the_map(self):
+        employee, api, session_id = self.employees[1]
+        cache.delete(live_positions.MEMBERS_KEY)
+        api.post(reverse("stop-session", args=[session_id]))
+        self.assertNotIn(employee.id, self.live_ids())
+        # The final position is persisted at stop
+        self.assertEqual(LiveSession.objects.get(pk=session_id).current_latitude, 12.92)
+
+
+class LiveNearbyTests(LiveMapTestCase):
+    def nearby(self, **params):
+        response = self.admin.get(reverse("live-nearby"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def names(self, data):
+        return [row["employee"] for row in data["results"]]
+
+    def test_nearest_are_sorted_by_distance(self):
+        data = self.nearby(lat=12.935, lng=77.6, k=2)
+        self.assertEqual(self.names(data), ["field2", "field1"])
+        self.assertLess(data["results"][0]["distance_m"], data["results"][1]["distance_m"])
+        self.assertEqual(self.names(self.nearby(lat=12.9, lng=77.6, radius_m=1000)), ["field0"])
+
+    def test_bbox(self):
+        self.assertEqual(sorted(self.names(self.nearby(bbox="12.91,77.5,12.95,77.7"))), ["field1", "field2"])
+        self.assertEqual(self.nearby(bbox="10,70,11,71")["count"], 0)
+
+    def test_moves_across_cells(self):
+        self.move(0, 13.5, 77.6)
+        self.assertEqual(self.nearby(lat=12.9, lng=77.6, radius_m=1000)["count"], 0)
+        self.assertEqual(self.names(self.nearby(bbox="13.4,77.5,13.6,77.7")), ["field0"])
+
+    def test_moves_after_evictions(self):
+        for keys in ([live_positions.MEMBERS_KEY], [live_positions.CELLS_KEY],
+                     [live_positions.MEMBERS_KEY, live_positions.CELLS_KEY]):
+            cache.delete_many(keys)
+            # Takes the lock with the registry partly gone; must not re-enter it
+            self.move(0, 13.5, 77.6)
+            self.assertEqual(self.live_ids(), self.everyone())
+            self.assertEqual(self.nearby(lat=12.92, lng=77.6)["count"], 2)
+            self.move(0, 12.9, 77.6)
+
+    def test_stopped_session_leaves_the_grid(self):
+        employee, api, session_id = self.employees[1]
+        cache.delete_many([live_positions.MEMBERS_KEY, live_positions.CELLS_KEY])
+        api.post(reverse("stop-session", args=[session_id]))
+        self.assertEqual(self.nearby(bbox="12,77,14,78")["count"], 2)
+
+    def test_rebuild_after_cache_loss(self):
+        cache.clear()
+        self.assertEqual(self.nearby(bbox="12,77,14,78")["count"], 3)
+
+    def test_invalid_query_values(self):
+        for bbox in ("nan,77,14,78", "inf,77,14,78", "12,77,95,78", "14,77,12,78", "12,77,14"):
+            self.assertEqual(self.admin.get(reverse("live-nearby"), {"bbox": bbox}).status_code, 400, bbox)
+        for params in ({"lat": "nan", "lng": "77"}, {"lat": "12", "lng": "77", "radius_m": "nan"},
+                       {"lat": "12", "lng": "77", "radius_m": "inf"}, {"lat": "12", "lng": "77", "k": "0"}):
+            self.assertEqual(self.admin.get(reverse("live-nearby"), params).status_code, 400, params)
@@ -0,0 +1,77 @@
+import json
+from contextlib import asynccontextmanager
+
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from attendenceapp import live_positions
+from attendenceapp.models import LiveSession
+
+from .base import TrackingTestCase
+
+
+def parse(chunk):
+    """``(id, event, data)`` of one SSE message"""
+    fields = dict(line.split(": ", 1) for line in chunk.decode().strip().splitlines())
+    return fields["id"], fields["event"], json.loads(fields["data"])
+
+
+@override_settings(LIVE_STREAM_POLL_SECONDS=0.01, LIVE_STREAM_HEARTBEAT_SECONDS=60)
+class LiveStreamTests(TrackingTestCase):
+    def setUp(self):
+        super().setUp()
+        admin = self.make_user("boss", role="admin")
+        self.ticket = self.client_for(admin).post(reverse("live-stream-ticket")).data["ticket"]
+        self.session = LiveSession.objects.create(employee=self.make_user("field"))
+        live_positions.session_started(self.session)
+
+    @asynccontextmanager
+    async def open(self, last_event_id=None):
+        headers = {"Last-Event-ID": last_event_id} if last_event_id else {}
+        response = await AsyncClient().get(reverse("live-stream"), {"ticket": self.ticket}, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        events = response.streaming_content
+        try:
+            self.assertTrue((await anext(events)).startswith(b"retry: "))
+            yield events
+        finally:
+            await events.aclose()
+
+    def move(self, latitude):
+        # As any other process ingesting a fix would: through the shared registry
+        live_positions.move(self.session, latitude, 77.6, timezone.now())
+
+    async def test_positions_written_elsewhere_are_streamed(self):
+        async with self.open() as events:
+            event_id, event, data = parse(await anext(events))
+            self.assertEqual((event, data), ("snapshot", {}))
+
+            await sync_to_async(self.move)(12.9)
+            next_id, event, data = parse(await anext(events))
+            self.assertEqual(event, "position")
+            self.assertEqual((data["employee_id"], data["latitude"]), (str(self.session.employee_id), 12.9))
+            self.assertGreater(int(next_id), int(event_id))
+
+            await sync_to_async(live_positions.session_ended)(self.session)
+            self.assertEqual(parse(await anext(events))[1:], ("session_ended", {"employee_id": str(self.session.employee_id)}))
+
+    async def test_reconnect_resumes_from_last_event_id(self):
+        await sync_to_async(self.move)(12.9)
+        version = await sync_to_async(live_positions.current_version)()
+        await sync_to_async(self.move)(13.0)
+
+        async with self.open(str(version)) as events:
+            event_id, event, data = parse(await anext(events))
+            self.assertEqual((event, data["latitude"]), ("position", 13.0))
+
+    async def test_stale_last_event_id_gets_a_snapshot(self):
+        await sync_to_async(self.move)(12.9)
+        async with self.open("1") as events:
+            event_id, event, data = parse(await anext(events))
+            self.assertEqual((event, list(data)), ("snapshot", [str(self.session.employee_id)]))
+
+    async def test_ticket_is_required(self):
+        response = await AsyncClient().get(reverse("live-stream"), {"ticket": "forged"})
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,85 @@
+import datetime
+from datetime import timedelta
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from attendenceapp.archive import PathPoint
+from attendenceapp.path_formats import decode_deltas, encode_deltas, encode_path, encode_polyline
+
+from .base import TrackingTestCase, zigzag
+
+START = datetime.datetime(2026, 3, 1, 8, 0, tzinfo=datetime.timezone.utc)
+START_MS = 1772352000000
+
+
+def path(count):
+    return [
+        PathPoint(i + 1, 12.9 + i * 0.001, 77.6 - i * 0.002, START + timedelta(seconds=15 * i, milliseconds=i), 0)
+        for i in range(count)
+    ]
+
+
+class EncoderTests(SimpleTestCase):
+    def test_polyline_matches_the_reference_example(self):
+        # From Google's encoded polyline algorithm documentation
+        coords = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+        self.assertEqual(encode_polyline(coords), "_p~iF~ps|U_ulLnnqC_mqNvxq`@")
+
+    def test_deltas_round_trip(self):
+        values = [0, 1, -1, 15000, 14999, -2 ** 40, 2 ** 40, 7]
+        self.assertEqual(decode_deltas(encode_deltas(values)), values)
+        self.assertEqual(decode_deltas(encode_deltas([])), [])
+
+    def test_polyline_format(self):
+        encoded = encode_path(path(3), "polyline")
+        self.assertEqual(encoded["polyline"], encode_polyline([(p.latitude, p.longitude) for p in path(3)]))
+        self.assertEqual(encoded["count"], 3)
+        self.assertEqual(encoded["start"], START_MS)
+        self.assertEqual(decode_deltas(encoded["times"]), [0, 15001, 30002])
+
+    def test_columnar_format(self):
+        encoded = encode_path(path(2), "columnar")
+        self.assertEqual(encoded, {
+            "latitude": [12.9, 12.901],
+            "longitude": [77.6, 77.598],
+            "timestamp": [START_MS, START_MS + 15001],
+        })
+
+    def test_geojson_geometry_by_point_count(self):
+        line = encode_path(path(2), "geojson", {"session_id": 5})
+        self.assertEqual(line["geometry"], {"type": "LineString", "coordinates": [[77.6, 12.9], [77.598, 12.901]]})
+        self.assertEqual(line["properties"], {"session_id": 5, "coordTimes": [START_MS, START_MS + 15001]})
+        self.assertEqual(encode_path(path(1), "geojson")["geometry"], {"type": "Point", "coordinates": [77.6, 12.9]})
+        self.assertIsNone(encode_path([], "geojson")["geometry"])
+
+    def test_empty_paths_and_unknown_formats(self):
+        self.assertEqual(encode_path([], "polyline"), {"polyline": "", "start": None, "times": "", "count": 0})
+        with self.assertRaises(ValueError):
+            encode_path(path(2), "wkt")
+
+
+class PathFormatEndpointTests(TrackingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.employee = self.make_user("field")
+        self.api = self.client_for(self.employee)
+        self.api.post(reverse("start-session"))
+        self.api.post(reverse("upload-location-batch"), {"points": zigzag(4)}, format="json")
+        self.admin = self.client_for(self.make_user("boss", role="admin"))
+
+    def test_snapshot_formats(self):
+        data = self.api.get(reverse("my-session"), {"path_format": "polyline"}).data
+        self.assertNotIn("path_points", data)
+        self.assertEqual(data["path"]["count"], 4)
+        self.assertEqual(self.api.get(reverse("my-session"), {"path_format": "wkt"}).status_code, 400)
+
+    def test_history_formats(self):
+        url = reverse("location-history", args=[self.employee.id])
+        columnar = self.admin.get(url, {"path_format": "columnar"}).data
+        self.assertEqual(len(columnar["sessions"][0]["path"]["latitude"]), 4)
+
+        geojson = self.admin.get(url, {"path_format": "geojson"}).data
+        self.assertEqual(geojson["type"], "FeatureCollection")
+        (feature,) = geojson["features"]
+        self.assertEqual((feature["properties"]["type"], feature["geometry"]["type"]), ("path", "LineString"))
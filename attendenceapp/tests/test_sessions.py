@@ -0,0 +1,50 @@
+import datetime
+import json
+
+from django.core import serializers
+from django.urls import reverse
+from django.utils import timezone
+
+from attendenceapp.models import LiveSession
+
+from .base import TrackingTestCase
+
+
+class LocalDateTests(TrackingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.employee = self.make_user("field")
+
+    def test_local_date_is_filled_on_save(self):
+        session = LiveSession.objects.create(employee=self.employee)
+        self.assertEqual(session.local_date, timezone.localdate(session.start_time))
+
+    def test_loaddata_fills_local_date_in_time_zone(self):
+        # 20:00 UTC is already the next day in Asia/Kolkata
+        fixture = json.dumps([{
+            "model": "attendenceapp.livesession", "pk": 50,
+            "fields": {"employee": self.employee.pk, "start_time": "2026-03-01T20:00:00Z", "is_active": False},
+        }])
+        for obj in serializers.deserialize("json", fixture):
+            obj.save()
+        self.assertEqual(LiveSession.objects.get(pk=50).local_date, datetime.date(2026, 3, 2))
+
+    def test_on_dates_filters_by_local_date(self):
+        days = [datetime.date(2026, 3, d) for d in (1, 2, 3)]
+        for day in days:
+            LiveSession.objects.create(employee=self.employee, local_date=day)
+
+        self.assertEqual(
+            sorted(LiveSession.objects.on_dates(days[1]).values_list("local_date", flat=True)), days[1:2],
+        )
+        self.assertEqual(
+            sorted(LiveSession.objects.on_dates(days[0], days[1]).values_list("local_date", flat=True)), days[:2],
+        )
+
+    def test_sessions_today_lists_only_todays_sessions(self):
+        today = LiveSession.objects.create(employee=self.employee)
+        LiveSession.objects.create(employee=self.employee, local_date=timezone.localdate() - datetime.timedelta(days=1))
+
+        response = self.client_for(self.make_user("boss", role="admin")).get(reverse("sessions-today"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["session_id"] for row in response.data], [today.id])
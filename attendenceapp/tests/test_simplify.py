@@ -0,0 +1,115 @@
+import math
+from datetime import timedelta
+
+import numpy as np
+from django.test import SimpleTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from attendenceapp.models import LiveSession, LocationPoint
+from attendenceapp.simplify import (
+    _project, _tolerance_bucket, keep_mask, parse_params, significance, simplify_points, simplify_session,
+)
+
+from .base import TrackingTestCase
+
+
+def random_walk(count, seed=1):
+    rng = np.random.default_rng(seed)
+    return 12.9 + np.cumsum(rng.normal(0, 1e-4, count)), 77.6 + np.cumsum(rng.normal(0, 1e-4, count))
+
+
+def douglas_peucker(x, y, tolerance):
+    """Textbook recursive Douglas-Peucker over projected points: indexes kept"""
+    def segment_distance(i, first, last):
+        ex, ey = x[last] - x[first], y[last] - y[first]
+        px, py = x[i] - x[first], y[i] - y[first]
+        length_sq = ex * ex + ey * ey
+        t = 0.0 if length_sq == 0 else min(1.0, max(0.0, (px * ex + py * ey) / length_sq))
+        return math.hypot(px - t * ex, py - t * ey)
+
+    def split(first, last):
+        if last - first < 2:
+            return []
+        index = max(range(first + 1, last), key=lambda i: segment_distance(i, first, last))
+        if segment_distance(index, first, last) <= tolerance:
+            return []
+        return split(first, index) + [index] + split(index, last)
+
+    return [0] + split(0, len(x) - 1) + [len(x) - 1]
+
+
+class SignificanceTests(SimpleTestCase):
+    def test_thresholds_match_douglas_peucker(self):
+        lats, lngs = random_walk(300)
+        values = significance(lats, lngs)
+        x, y = _project(lats, lngs)
+        for tolerance in (0.5, 2, 5, 20, 100):
+            self.assertEqual(
+                np.flatnonzero(keep_mask(values, tolerance)).tolist(), douglas_peucker(x, y, tolerance), tolerance,
+            )
+
+    def test_endpoints_and_straight_lines(self):
+        values = significance(np.linspace(12.9, 13.0, 10), np.full(10, 77.6))
+        self.assertTrue(np.isinf(values[[0, -1]]).all())
+        self.assertLess(values[1:-1].max(), 1e-6)
+        self.assertTrue(np.isinf(significance([12.9, 13.0], [77.6, 77.6])).all())
+
+    def test_max_points_keeps_the_most_significant(self):
+        lats, lngs = random_walk(100)
+        values = significance(lats, lngs)
+        keep = keep_mask(values, max_points=10)
+        self.assertEqual(keep.sum(), 10)
+        self.assertTrue(keep[0] and keep[-1])
+        self.assertGreaterEqual(values[keep].min(), values[~keep].max())
+
+
+class ParamsTests(SimpleTestCase):
+    def test_parse(self):
+        self.assertEqual(parse_params({}), (None, None, None))
+        self.assertEqual(parse_params({"tolerance": "2.5", "max_points": "50", "zoom": "14"}), (2.5, 50, 14.0))
+
+    def test_invalid_values(self):
+        for params in ({"tolerance": "-1"}, {"tolerance": "inf"}, {"tolerance": "nan"}, {"tolerance": "x"},
+                       {"max_points": "1"}, {"zoom": "25"}, {"zoom": "nan"}):
+            with self.assertRaises(ValueError, msg=params):
+                parse_params(params)
+
+    def test_tolerance_buckets(self):
+        self.assertEqual([_tolerance_bucket(t) for t in (0, 0.9, 1, 3, 4, 1000)], [0, 0, 1, 2, 4, 512])
+
+
+class SimplifySessionTests(TrackingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.employee = self.make_user("field")
+        self.api = self.client_for(self.employee)
+        self.session = LiveSession.objects.create(employee=self.employee)
+        start = timezone.now() - timedelta(hours=1)
+        lats, lngs = random_walk(200)
+        LocationPoint.objects.bulk_create([
+            LocationPoint(session=self.session, latitude=lat, longitude=lng, timestamp=start + timedelta(seconds=10 * i))
+            for i, (lat, lng) in enumerate(zip(lats, lngs))
+        ])
+
+    def test_snapshot_path_is_simplified(self):
+        full = self.api.get(reverse("my-session")).data["path_points"]
+        simplified = self.api.get(reverse("my-session"), {"tolerance": 10}).data["path_points"]
+        self.assertEqual(len(full), 200)
+        self.assertLess(len(simplified), len(full))
+        self.assertEqual((simplified[0], simplified[-1]), (full[0], full[-1]))
+        self.assertEqual(len(self.api.get(reverse("my-session"), {"max_points": 20}).data["path_points"]), 20)
+
+    def test_non_finite_tolerance_is_a_bad_request(self):
+        for tolerance in ("inf", "nan"):
+            self.assertEqual(self.api.get(reverse("my-session"), {"tolerance": tolerance}).status_code, 400)
+
+    def test_closed_sessions_use_the_tolerance_bucket(self):
+        LiveSession.objects.filter(pk=self.session.pk).update(is_active=False, end_time=timezone.now())
+        self.session.refresh_from_db()
+        path = simplify_session(self.session, tolerance=7)
+        self.assertEqual(
+            [p.id for p in path],
+            [p.id for p in simplify_points(simplify_session(self.session), tolerance=4)],
+        )
+        self.assertEqual(simplify_session(self.session, tolerance=5), path)
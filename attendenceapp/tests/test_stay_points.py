@@ -0,0 +1,121 @@
+from datetime import timedelta
+from io import StringIO
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from attendenceapp import geofence
+from attendenceapp.geo import haversine_m
+from attendenceapp.models import Geofence, LiveSession, LocationPoint, SessionVisit
+from attendenceapp.stay_points import detect_visits, find_stays, merge_stays
+
+from .base import TrackingTestCase
+
+
+def naive_stays(lats, lngs, times, radius_m, min_dwell_s):
+    """Reference: scan every anchor point by point"""
+    stays = []
+    i = 0
+    while i < len(lats) - 1:
+        last = i
+        while last + 1 < len(lats) and haversine_m(lats[i], lngs[i], lats[last + 1], lngs[last + 1]) <= radius_m:
+            last += 1
+        if times[last] - times[i] >= min_dwell_s:
+            stays.append((i, last))
+            i = last + 1
+        else:
+            i += 1
+    return stays
+
+
+def walk_with_stops(stops, seed=0):
+    """A path moving ~110 m every 10 s, standing still (10 m jitter) for each (fixes, seconds apart) in ``stops``"""
+    rng = np.random.default_rng(seed)
+    lats, times = [12.9], [0.0]
+    for fixes, interval in stops:
+        for _ in range(10):
+            lats.append(lats[-1] + 0.001)
+            times.append(times[-1] + 10)
+        base = lats[-1]
+        for _ in range(fixes):
+            lats.append(base + rng.normal(0, 0.0001))
+            times.append(times[-1] + interval)
+    for _ in range(10):
+        lats.append(lats[-1] + 0.001)
+        times.append(times[-1] + 10)
+    return np.array(lats), np.full(len(lats), 77.6), np.array(times)
+
+
+class FindStaysTests(SimpleTestCase):
+    def test_stops_are_found(self):
+        lats, lngs, times = walk_with_stops([(40, 10), (5, 20), (30, 15)])
+        stays = find_stays(lats, lngs, times, 100, 300)
+        # The second stop lasts 100 s, below the minimum dwell
+        self.assertEqual(len(stays), 2)
+        for first, last in stays:
+            self.assertGreaterEqual(times[last] - times[first], 300)
+
+    def test_matches_a_point_by_point_scan(self):
+        for seed in range(5):
+            lats, lngs, times = walk_with_stops([(30, 10), (3, 200), (60, 5), (20, 30)], seed=seed)
+            self.assertEqual(find_stays(lats, lngs, times, 100, 300), naive_stays(lats, lngs, times, 100, 300), seed)
+
+    def test_one_long_segment_is_a_stay(self):
+        # A thinned stationary phone: two stored fixes 20 minutes apart
+        lats, lngs, times = np.array([12.9, 12.9001]), np.array([77.6, 77.6]), np.array([0.0, 1200.0])
+        self.assertEqual(find_stays(lats, lngs, times, 100, 300), [(0, 1)])
+        self.assertEqual(find_stays(lats[:1], lngs[:1], times[:1], 100, 300), [])
+
+    def test_short_excursions_are_merged(self):
+        lats = np.array([12.9, 12.9, 12.905, 12.9, 12.9])
+        lngs = np.full(5, 77.6)
+        stays = [(0, 1), (3, 4)]
+        self.assertEqual(merge_stays(stays, lats, lngs, np.array([0.0, 400, 500, 600, 1000]), 100, 300), [(0, 4)])
+        self.assertEqual(merge_stays(stays, lats, lngs, np.array([0.0, 400, 500, 1000, 1400]), 100, 300), stays)
+
+
+class DetectVisitsTests(TrackingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(geofence.fences_changed)
+        self.session = LiveSession.objects.create(employee=self.make_user("field"), is_active=False)
+        lats, lngs, times = walk_with_stops([(40, 10), (30, 15)])
+        # A GPS jump in the middle of the first stop must not split it
+        lats[30] += 1.0
+        self.stops = (lats[11], lats[61])
+        start = timezone.now() - timedelta(hours=2)
+        LocationPoint.objects.bulk_create([
+            LocationPoint(session=self.session, latitude=lat, longitude=lng, timestamp=start + timedelta(seconds=t))
+            for lat, lng, t in zip(lats, lngs, times)
+        ])
+        self.site = Geofence.objects.create(
+            name="Depot", shape="circle", center_latitude=self.stops[1], center_longitude=77.6, radius_m=150,
+        )
+
+    def test_visits_are_stored_with_their_geofence(self):
+        visits = detect_visits(self.session)
+        self.assertEqual(len(visits), 2)
+        self.assertEqual([v.geofence_id for v in visits], [None, self.site.id])
+        # The arrival fix plus 40 stationary ones, less the jump
+        self.assertEqual(visits[0].point_count, 40)
+        for visit, stop in zip(visits, self.stops):
+            self.assertLess(haversine_m(visit.latitude, visit.longitude, stop, 77.6), 20)
+            self.assertEqual(visit.dwell_seconds, (visit.departure - visit.arrival).total_seconds())
+
+        detect_visits(self.session)
+        self.assertEqual(SessionVisit.objects.filter(session=self.session).count(), 2)
+
+    def test_command_detects_each_closed_session_once(self):
+        call_command("detect_visits", stdout=StringIO())
+        self.session.refresh_from_db()
+        detected_at = self.session.visits_detected_at
+        self.assertIsNotNone(detected_at)
+
+        out = StringIO()
+        call_command("detect_visits", stdout=out)
+        self.assertIn("in 0 session(s)", out.getvalue())
+        call_command("detect_visits", "--all", stdout=StringIO())
+        self.session.refresh_from_db()
+        self.assertGreater(self.session.visits_detected_at, detected_at)
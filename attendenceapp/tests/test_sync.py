@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from attendenceapp.models import LiveSession, LocationPoint, SyncDevice
+
+from .base import TrackingTestCase, zigzag
+
+
+class SyncIdempotencyTests(TrackingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.employee = self.make_user("field")
+        self.api = self.client_for(self.employee)
+        self.session_id = self.api.post(reverse("start-session")).data["id"]
+
+    def sync(self, points, device_id="phone-1"):
+        return self.api.post(reverse("sync-locations"), {
+            "device_id": device_id, "session_id": self.session_id, "points": points,
+        }, format="json")
+
+    def test_resent_chunk_is_not_stored_twice(self):
+        points = zigzag(5)
+        first = self.sync(points)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual((first.data["accepted"], first.data["stored"], first.data["ack_seq"]), (5, 5, 5))
+
+        again = self.sync(points)
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual((again.data["accepted"], again.data["duplicates"], again.data["ack_seq"]), (0, 5, 5))
+        self.assertEqual(LocationPoint.objects.filter(session_id=self.session_id).count(), 5)
+        self.assertEqual(LiveSession.objects.get(pk=self.session_id).point_count, 5)
+
+    @override_settings(LOCATION_FILTER_MIN_DISTANCE_M=5, LOCATION_SIMPLIFY_TOLERANCE_M=3)
+    def test_resend_after_thinning_skips_dropped_points(self):
+        start = timezone.now() - timedelta(minutes=10)
+        # A phone standing still: every fix after the first is within a metre
+        points = [
+            {"seq": i + 1, "latitude": 12.9 + i * 1e-6, "longitude": 77.6, "timestamp": (start + timedelta(seconds=i)).isoformat()}
+            for i in range(6)
+        ]
+        first = self.sync(points)
+        self.assertEqual(first.data["accepted"], 6)
+        self.assertLess(first.data["stored"], 6)
+        stored = LocationPoint.objects.filter(session_id=self.session_id).count()
+
+        again = self.sync(points)
+        self.assertEqual((again.data["accepted"], again.data["stored"]), (0, 0))
+        self.assertEqual(LocationPoint.objects.filter(session_id=self.session_id).count(), stored)
+        self.assertEqual(SyncDevice.objects.get(device_id="phone-1").last_seq, 6)
+
+    def test_overlapping_chunk_stores_only_new_points(self):
+        points = zigzag(6)
+        self.sync(points[:4])
+        response = self.sync(points[2:])
+        self.assertEqual((response.data["accepted"], response.data["duplicates"]), (2, 2))
+        self.assertEqual(LocationPoint.objects.filter(session_id=self.session_id).count(), 6)
+
+    def test_devices_have_separate_sequences(self):
+        self.sync(zigzag(3))
+        response = self.sync(zigzag(3, first_seq=1), device_id="phone-2")
+        self.assertEqual(response.data["accepted"], 3)
+
+    def test_sequenced_batch_upload_is_idempotent(self):
+        body = {"device_id": "phone-1", "points": zigzag(4)}
+        first = self.api.post(reverse("upload-location-batch"), body, format="json")
+        again = self.api.post(reverse("upload-location-batch"), body, format="json")
+        self.assertEqual((first.status_code, again.status_code), (200, 200))
+        self.assertEqual((first.data["accepted"], again.data["accepted"]), (4, 0))
+        self.assertEqual(again.data["total_points"], 4)
+        self.assertEqual(LocationPoint.objects.filter(session_id=self.session_id).count(), 4)
+
+
+    def test_ack_watermark_is_reported(self):
+        self.sync(zigzag(3))
+        response = self.api.get(reverse("sync-locations"), {"device_id": "phone-1"})
+        self.assertEqual(response.data, {"device_id": "phone-1", "ack_seq": 3})
+
+    def test_points_need_sequence_and_timestamp(self):
+        points = zigzag(2)
+        del points[0]["seq"]
+        del points[1]["timestamp"]
+        response = self.sync(points)
+        self.assertEqual(response.data["accepted"], 0)
+        self.assertEqual(len(response.data["rejected"]), 2)
+
+    def test_late_sync_into_a_stopped_session(self):
+        self.api.post(reverse("stop-session", args=[self.session_id]))
+        response = self.sync(zigzag(2))
+        self.assertEqual((response.status_code, response.data["stored"]), (200, 2))
@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from attendenceapp.models import LiveSession
+from attendenceapp.trajectory_filter import douglas_peucker, thin_points
+
+from .base import TrackingTestCase
+
+START = timezone.now() - timedelta(hours=1)
+
+
+def fix(i, latitude, longitude=77.6, seconds=None):
+    return {"latitude": latitude, "longitude": longitude, "seq": None,
+            "timestamp": START + timedelta(seconds=10 * i if seconds is None else seconds)}
+
+
+@override_settings(
+    LOCATION_FILTER_MIN_DISTANCE_M=5, LOCATION_FILTER_MIN_INTERVAL_S=0,
+    LOCATION_SIMPLIFY_TOLERANCE_M=3, LOCATION_SIMPLIFY_WINDOW=50,
+)
+class ThinPointsTests(SimpleTestCase):
+    def test_douglas_peucker_keeps_corners(self):
+        points = [fix(0, 12.9), fix(1, 12.901), fix(2, 12.902), fix(3, 12.902, 77.601)]
+        self.assertEqual(douglas_peucker(points, 3), [True, False, True, True])
+        self.assertEqual(douglas_peucker([], 3), [])
+
+    def test_stationary_fixes_are_dropped_and_counted(self):
+        points = [fix(i, 12.9 + i * 1e-6) for i in range(5)] + [fix(5, 12.901)]
+        kept, dropped, carry = thin_points(None, points)
+        self.assertEqual([p["latitude"] for p in kept], [12.9, 12.901])
+        self.assertEqual([p["dropped_before"] for p in kept], [0, 4])
+        self.assertEqual((dropped["too_close"], carry), (4, 0))
+
+    def test_carry_follows_the_last_kept_point(self):
+        anchor = fix(0, 12.9)
+        kept, dropped, carry = thin_points(anchor, [fix(1, 12.9 + 1e-6)], carry=2)
+        self.assertEqual((kept, carry), ([], 3))
+        kept, _, carry = thin_points(anchor, [fix(2, 12.91)], carry=carry)
+        self.assertEqual((kept[0]["dropped_before"], carry), (3, 0))
+
+    def test_straight_runs_are_simplified(self):
+        points = [fix(i, 12.9 + i * 0.001) for i in range(6)]
+        kept, dropped, _ = thin_points(None, points)
+        self.assertEqual([p["timestamp"] for p in kept], [points[0]["timestamp"], points[-1]["timestamp"]])
+        self.assertEqual(dropped["simplified"], 4)
+
+    def test_late_fixes_are_always_kept(self):
+        anchor = fix(10, 12.9)
+        late = fix(1, 12.9 + 1e-6)
+        kept, dropped, _ = thin_points(anchor, [late])
+        self.assertEqual((len(kept), sum(dropped.values())), (1, 0))
+
+    @override_settings(LOCATION_FILTER_MIN_DISTANCE_M=0, LOCATION_FILTER_MIN_INTERVAL_S=30)
+    def test_time_gate(self):
+        kept, dropped, _ = thin_points(None, [fix(0, 12.9), fix(1, 12.91, seconds=10), fix(2, 12.92, 77.61, seconds=40)])
+        self.assertEqual((len(kept), dropped["too_soon"]), (2, 1))
+
+
+class LiveUpdateThinningTests(TrackingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.api = self.client_for(self.make_user("field"))
+        self.session_id = self.api.post(reverse("start-session")).data["id"]
+
+    def update(self, latitude):
+        return self.api.post(reverse("update-live-location"), {"latitude": latitude, "longitude": 77.6}, format="json")
+
+    def test_off_by_default(self):
+        for i in range(3):
+            self.assertIsNotNone(self.update(12.9 + i * 1e-6).data["point_id"])
+        self.assertEqual(LiveSession.objects.get(pk=self.session_id).point_count, 3)
+
+    @override_settings(LOCATION_FILTER_MIN_DISTANCE_M=5)
+    def test_gate_drops_repeated_fixes(self):
+        self.assertIsNotNone(self.update(12.9).data["point_id"])
+        self.assertIsNone(self.update(12.9 + 1e-6).data["point_id"])
+        session = LiveSession.objects.get(pk=self.session_id)
+        self.assertEqual((session.point_count, session.thinning_stats["too_close"], session.thinning_stats["carry"]), (1, 1, 1))
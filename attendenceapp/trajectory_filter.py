@@ -0,0 +1,132 @@
+"""
+Ingest-time trajectory thinning.
+
+Stationary phones report near-identical fixes every few seconds. Before
+points are stored, ``thin_points`` drops:
+
+1. fixes closer than LOCATION_FILTER_MIN_DISTANCE_M or sooner than
+   LOCATION_FILTER_MIN_INTERVAL_S after the last kept fix ("too_close" /
+   "too_soon"), then
+2. fixes that Douglas-Peucker with LOCATION_SIMPLIFY_TOLERANCE_M removes
+   ("simplified"), run over sliding windows of LOCATION_SIMPLIFY_WINDOW
+   points that start at the session's last stored point. Stored points are
+   never revisited, so single-point uploads only go through step 1.
+
+Both steps are off by default (the settings are 0): most fixes arrive one
+per request through live-update, where only step 1 can act, and a dropped
+fix changes that endpoint's answer (``point_id`` is null).
+
+Decisions stay traceable: every stored point records in ``dropped_before``
+how many raw fixes were dropped since the previous stored point, and the
+session keeps per-reason totals in ``thinning_stats``.
+"""
+import math
+
+from django.conf import settings
+
+from .geo import EARTH_RADIUS_M, haversine_m
+
+REASONS = ("too_close", "too_soon", "simplified")
+
+
+def _offset_m(origin, point):
+    """Local equirectangular projection of ``point`` around ``origin``, in metres"""
+    x = math.radians(point["longitude"] - origin["longitude"]) * math.cos(math.radians(origin["latitude"]))
+    y = math.radians(point["latitude"] - origin["latitude"])
+    return x * EARTH_RADIUS_M, y * EARTH_RADIUS_M
+
+
+def _segment_distance_m(point, start, end):
+    """Distance in metres from ``point`` to the segment start-end"""
+    px, py = _offset_m(start, point)
+    ex, ey = _offset_m(start, end)
+    length_sq = ex * ex + ey * ey
+    if length_sq == 0:
+        return math.hypot(px, py)
+    t = max(0.0, min(1.0, (px * ex + py * ey) / length_sq))
+    return math.hypot(px - t * ex, py - t * ey)
+
+
+def douglas_peucker(points, tolerance_m):
+    """Return a keep-mask for ``points``; both endpoints are always kept"""
+    keep = [False] * len(points)
+    if not points:
+        return keep
+    keep[0] = keep[-1] = True
+
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        max_distance = 0.0
+        index = None
+        for i in range(first + 1, last):
+            distance = _segment_distance_m(points[i], points[first], points[last])
+            if distance > max_distance:
+                max_distance, index = distance, i
+        if index is not None and max_distance > tolerance_m:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return keep
+
+
+def thin_points(anchor, points, carry=0):
+    """
+    Decide which of ``points`` (sorted by timestamp) to store.
+
+    ``anchor`` is the session's last stored point (or None) and ``carry`` the
+    number of fixes dropped after it by earlier uploads. Returns
+    ``(kept, dropped, carry)``: the points to store, each with a
+    ``dropped_before`` count, a per-reason count of dropped fixes, and the
+    drops that follow the last kept point (to carry into the next upload).
+    Fixes older than the anchor (late offline uploads) are always kept.
+    """
+    min_distance = settings.LOCATION_FILTER_MIN_DISTANCE_M
+    min_interval = settings.LOCATION_FILTER_MIN_INTERVAL_S
+    tolerance = settings.LOCATION_SIMPLIFY_TOLERANCE_M
+    window = max(3, settings.LOCATION_SIMPLIFY_WINDOW)
+
+    late = [p for p in points if anchor is not None and p["timestamp"] < anchor["timestamp"]]
+    fresh = [p for p in points if anchor is None or p["timestamp"] >= anchor["timestamp"]]
+    reason_for = {}
+
+    # Step 1: distance / time gate against the last kept fix
+    survivors = []
+    reference = anchor
+    for point in fresh:
+        if reference is not None:
+            if min_distance and haversine_m(reference["latitude"], reference["longitude"],
+                                            point["latitude"], point["longitude"]) < min_distance:
+                reason_for[id(point)] = "too_close"
+                continue
+            if min_interval and (point["timestamp"] - reference["timestamp"]).total_seconds() < min_interval:
+                reason_for[id(point)] = "too_soon"
+                continue
+        survivors.append(point)
+        reference = point
+
+    # Step 2: Douglas-Peucker over windows chained from the stored anchor
+    if tolerance and survivors:
+        chain = ([anchor] if anchor is not None else []) + survivors
+        start = 0
+        while start < len(chain) - 1:
+            end = min(start + window - 1, len(chain) - 1)
+            mask = douglas_peucker(chain[start:end + 1], tolerance)
+            for offset, keep in enumerate(mask[1:-1], start=start + 1):
+                if not keep:
+                    reason_for[id(chain[offset])] = "simplified"
+            start = end
+
+    kept = []
+    dropped = dict.fromkeys(REASONS, 0)
+    for point in fresh:
+        reason = reason_for.get(id(point))
+        if reason:
+            dropped[reason] += 1
+            carry += 1
+        else:
+            kept.append(dict(point, dropped_before=carry))
+            carry = 0
+
+    kept = [dict(point, dropped_before=0) for point in late] + kept
+    return kept, dropped, carry
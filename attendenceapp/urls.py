@@ -5,7 +5,7 @@ import os
 from .views import (LoginView, RegisterEmployeeView, MeView, ProfilePhotoUploadView, employee_list, offline_employees, 
     manage_employee, online_employees,LaserScreedSubmissionListCreateView,LaserScreedSubmissionDetailView, submit_form, submissions_list, delete_submission, 
     submit_contact, contact_submissions_list, delete_contact_submission)
-from . import views_tracking
+from . import views_tracking, live_stream
 
 
 
@@ -40,14 +40,26 @@ urlpatterns = [
     path("admin/sessions-today/", views_tracking.sessions_today, name="sessions-today"),
 
     path("location/live-all/", views_tracking.live_all_locations, name="live-all-locations"),
+    path("location/live-stream/", live_stream.live_stream, name="live-stream"),
+    path("location/live-stream/ticket/", live_stream.stream_ticket, name="live-stream-ticket"),
+    path("location/live-nearby/", views_tracking.live_nearby, name="live-nearby"),
+    path("location/heatmap/", views_tracking.team_heatmap, name="team-heatmap"),
+    path("geofences/", views_tracking.geofences, name="geofences"),
+    path("geofences/<int:pk>/", views_tracking.manage_geofence, name="manage-geofence"),
+    path("location/geofence-events/<int:session_id>/", views_tracking.session_geofence_events, name="session-geofence-events"),
+    path("location/session-stats/<int:session_id>/", views_tracking.session_stats, name="session-stats"),
     path("location/history/<int:employee_id>/", views_tracking.location_history, name="location-history"),
+    path("location/history/<int:employee_id>/page/", views_tracking.location_history_page, name="location-history-page"),
     path("location/update/", views_tracking.update_location, name="update-location"),
     path("location/live-update/", views_tracking.update_live_location, name="update-live-location"),
+    path("location/batch-update/", views_tracking.upload_location_batch, name="upload-location-batch"),
+    path("location/sync/", views_tracking.sync_locations, name="sync-locations"),
 
     # ✅ NEW: Admin PDF report endpoints
     path("reports/daily-pdf/<int:employee_id>/", views_tracking.generate_daily_pdf, name="daily-pdf"),
     path("reports/session-pdf/<int:session_id>/", views_tracking.generate_session_pdf, name="session-pdf"),
     path("reports/date-range-pdf/<int:employee_id>/", views_tracking.generate_date_range_pdf, name="date-range-pdf"),
+    path("reports/activity-summary/", views_tracking.activity_summary, name="activity-summary"),
 
 
     path('laser-screed-submissions/', LaserScreedSubmissionListCreateView.as_view(), name='laser_screed_submissions'),
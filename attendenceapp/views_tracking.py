@@ -3,7 +3,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.conf import settings
-from django.http import FileResponse, HttpResponse
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from pathlib import Path
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -13,16 +13,30 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from django.utils import timezone
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Prefetch
 import json
+import math
 import re
+import itertools
 import io
 import os
 import datetime
 from datetime import timedelta
 from django.views.decorators.csrf import csrf_exempt
-from .models import LiveSession, LocationPoint
+from .models import LiveSession, LocationPoint, Geofence, DailyActivity, SessionVisit
 from .serializers import LiveSessionSerializer, PinpointSerializer, LocationPointSerializer
-from .utils import reverse_geocode
+from .serializers import GeofenceSerializer, GeofenceEventSerializer, DailyActivitySerializer
+from . import active_sessions, daily_activity, geocode_cache, geocode_worker, heatmap, ingest_log, live_positions
+from .active_sessions import get_active_session
+from .archive import session_points, stored_point_count, unarchived_rows
+from .geofence import site_visits
+from .analytics import session_stats as compute_session_stats
+from .stay_points import visit_payload
+from .simplify import parse_params as parse_simplify_params, simplify_session
+from .path_formats import FORMATS as PATH_FORMATS, encode_path, pinpoint_feature
+from .history import decode_cursor, encode_cursor, merged_points, point_payload, stream_history
+from .ingest import parse_point, parse_points, store_points, clean_device_id, get_sync_device, sync_points, record_pinpoint
 
 User = get_user_model()
 
@@ -43,6 +57,9 @@ def start_session(request):
         }, status=400)
     
     session = LiveSession.objects.create(employee=request.user)
+    active_sessions.remember(session)
+    live_positions.session_started(session)
+    daily_activity.session_started(session)
     return Response(LiveSessionSerializer(session).data, status=201)
 
 # ✅ UPDATED: Simplified stop session (no PDF generation)
@@ -54,11 +71,23 @@ def stop_session(request, pk):
     session = get_object_or_404(LiveSession, pk=pk, employee=request.user, is_active=True)
     session.is_active = False
     session.end_time = timezone.now()
-    session.save()
+    update_fields = ["is_active", "end_time"]
+    # Persist the final live position, which may be newer than the periodic copy
+    entry = live_positions.session_ended(session)
+    if entry is not None and entry["timestamp"] is not None:
+        session.current_latitude = entry["latitude"]
+        session.current_longitude = entry["longitude"]
+        session.last_location_update = entry["timestamp"]
+        update_fields += ["current_latitude", "current_longitude", "last_location_update"]
+    # Only touch the stop fields so counters written by in-flight uploads survive
+    session.save(update_fields=update_fields)
+    daily_activity.session_stopped(session)
+    active_sessions.forget(request.user.id)
+    # Archiving and visit detection run later (manage.py archive_sessions / detect_visits)
 
-    # Calculate session statistics
-    location_points_count = session.location_points.count()
-    pinpoints_count = session.pinpoints.count()
+    # Session statistics are maintained on the row at write time
+    location_points_count = session.point_count
+    pinpoints_count = session.pinpoint_count
     duration = session.end_time - session.start_time
 
     return Response({
@@ -67,7 +96,8 @@ def stop_session(request, pk):
         "statistics": {
             "duration": str(duration),
             "location_points": location_points_count,
-            "pinpoints": pinpoints_count
+            "pinpoints": pinpoints_count,
+            "distance_m": round(session.distance_m, 1)
         }
     }, status=200)
 
@@ -80,27 +110,45 @@ def add_pinpoint(request, session_id):
     data = request.data.copy()
     data["session"] = session.id
     
-    # If address not provided, attempt reverse geocode
-    lat = float(data.get("latitude", 0))
-    lng = float(data.get("longitude", 0))
+    # Without an address use a cached one, or geocode in the background
+    # so the request never waits on the geocoder
+    address_status = "provided"
     if not data.get("address"):
-        data["address"] = reverse_geocode(lat, lng)
+        lat = float(data.get("latitude", 0))
+        lng = float(data.get("longitude", 0))
+        data["address"] = geocode_cache.get(lat, lng)
+        address_status = "resolved" if data["address"] else "pending"
     
     serializer = PinpointSerializer(data=data)
     serializer.is_valid(raise_exception=True)
-    serializer.save()
+    pinpoint = serializer.save(address_status=address_status)
+    record_pinpoint(session, pinpoint)
+    if address_status == "pending":
+        transaction.on_commit(lambda: geocode_worker.enqueue(pinpoint.pk))
     return Response(serializer.data, status=201)
 
 # ✅ EXISTING: Keep session snapshot as is
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def my_session_snapshot(request):
-    """Get current user's active session with all data"""
+    """
+    Get current user's active session with all data.
+    
+    ?max_points=, ?tolerance= (metres) or ?zoom= return a simplified path.
+    ?path_format=polyline|columnar|geojson replaces ``path_points`` with ``path``
+    in that encoding (see path_formats).
+    """
+    try:
+        tolerance, max_points, zoom = parse_simplify_params(request.GET)
+        fmt = parse_path_format(request.GET)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    
     try:
         session = LiveSession.objects.filter(
             employee=request.user, 
             is_active=True
-        ).prefetch_related('location_points', 'pinpoints').first()
+        ).prefetch_related('pinpoints').first()
         
         if not session:
             return Response({
@@ -112,14 +160,23 @@ def my_session_snapshot(request):
         # Get pinpoints
         pinpoints = PinpointSerializer(session.pinpoints.all(), many=True).data
         
+        path = simplify_session(session, tolerance, max_points, zoom)
+        session_data = LiveSessionSerializer(session).data
+        
+        if fmt:
+            return Response({
+                "session": session_data,
+                "pinpoints": pinpoints,
+                "format": fmt,
+                "path": encode_path(path, fmt, {"session_id": session.id}),
+            })
+        
         # Get path points for visualization (convert to coordinate pairs)
         path_points = [
             [float(point.latitude), float(point.longitude)]
-            for point in session.location_points.all().order_by('timestamp')
+            for point in path
         ]
         
-        session_data = LiveSessionSerializer(session).data
-        
         return Response({
             "session": session_data,
             "pinpoints": pinpoints,
@@ -152,7 +209,7 @@ def sessions_today(request):
         return Response({"detail": "Forbidden"}, status=403)
 
     today = timezone.localdate()
-    sessions = LiveSession.objects.filter(start_time__date=today).select_related("employee")
+    sessions = LiveSession.objects.on_dates(today).select_related("employee")
 
     data = []
     for s in sessions:
@@ -175,61 +232,391 @@ def sessions_today(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def live_all_locations(request):
-    """Get live locations of all active employees"""
+    """
+    Get live locations of all active employees.
+    
+    Positions come from the live position registry, not the database.
+    Responses carry an ETag from the live-map version; a matching If-None-Match
+    gets a 304. With ?since=<version|timestamp> only the positions that moved
+    and the employees removed since then are returned, together with the
+    version to pass as the next ``since`` (``full`` when everything was resent).
+    """
     if request.user.role != "admin":
         return Response({"detail": "Forbidden"}, status=403)
     
-    # Get all active sessions with current location data
-    active_sessions = LiveSession.objects.filter(
-        is_active=True, 
-        current_latitude__isnull=False,
-        current_longitude__isnull=False
-    ).select_related('employee')
-    
-    live_data = {}
-    for session in active_sessions:
-        live_data[str(session.employee.id)] = {
-            'latitude': session.current_latitude,
-            'longitude': session.current_longitude,
-            'timestamp': session.last_location_update.isoformat() if session.last_location_update else session.start_time.isoformat(),
-            'employee': session.employee.username,
-            'session_id': session.id
-        }
+    # Read the version before the data so a concurrent change is never skipped
+    version = live_positions.current_version()
+    etag = live_positions.etag(version)
+    headers = {"ETag": etag, "X-Live-Version": str(version)}
+    
+    if_none_match = request.headers.get("If-None-Match", "")
+    if etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status=304, headers=headers)
     
-    return Response(live_data)
+    since = request.query_params.get("since")
+    if since in (None, ""):
+        return Response(live_positions.snapshot(), headers=headers)
+    
+    try:
+        since = live_positions.parse_since(since)
+    except (ValueError, OverflowError, OSError):
+        return Response({"detail": "Invalid since value"}, status=400)
+    
+    positions, removed, full = live_positions.changes_since(since)
+    return Response({
+        "version": version,
+        "positions": positions,
+        "removed": removed,
+        "full": full,
+    }, headers=headers)
 
-# ✅ EXISTING: Keep location history as is
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def location_history(request, employee_id):
-    """Get location history for specific employee"""
+def live_nearby(request):
+    """
+    Live employees near a point or inside a box, from the live position grid.
+    
+    ?lat=&lng=[&k=][&radius_m=] returns the k nearest by distance;
+    ?bbox=south,west,north,east returns everyone inside the box.
+    """
+    if request.user.role != "admin":
+        return Response({"detail": "Forbidden"}, status=403)
+    
+    bbox = request.query_params.get("bbox")
+    try:
+        if bbox:
+            south, west, north, east = [float(value) for value in bbox.split(",")]
+            # Comparisons alone let NaN through, which the grid cannot index
+            if not (
+                all(math.isfinite(value) for value in (south, west, north, east))
+                and -90 <= south <= north <= 90 and -180 <= west <= east <= 180
+            ):
+                raise ValueError("Invalid bbox")
+        else:
+            lat = float(request.query_params["lat"])
+            lng = float(request.query_params["lng"])
+            k = int(request.query_params.get("k", 5))
+            radius_m = float(request.query_params.get("radius_m", settings.LIVE_NEARBY_MAX_DISTANCE_M))
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180) or k < 1 or not 0 < radius_m < math.inf:
+                raise ValueError("Out of range")
+    except (KeyError, ValueError):
+        return Response({"detail": "Provide lat and lng (with optional k and radius_m) or bbox=south,west,north,east"}, status=400)
+    
+    if bbox:
+        matches = live_positions.within_bbox(south, west, north, east)
+        results = [
+            dict(live_positions.position_payload(entry), employee_id=employee_id)
+            for employee_id, entry in matches
+        ]
+    else:
+        k = min(k, settings.LIVE_NEARBY_MAX_RESULTS)
+        radius_m = min(radius_m, settings.LIVE_NEARBY_MAX_DISTANCE_M)
+        matches = live_positions.nearest(lat, lng, k, radius_m)
+        results = [
+            dict(live_positions.position_payload(entry), employee_id=employee_id, distance_m=round(distance, 1))
+            for distance, employee_id, entry in matches
+        ]
+    
+    return Response({"count": len(results), "results": results})
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def team_heatmap(request):
+    """
+    Coverage heatmap of the team's paths for a date range, binned on the
+    server (see heatmap.py). Params: start_date/end_date or date (default
+    the last 5 days), employee_ids=1,2,.. (default everyone), cell_deg (one
+    of HEATMAP_CELL_SIZES) and bbox=south,west,north,east.
+    
+    ``cells`` holds [latitude, longitude, count] rows (cell centres, counts
+    in received fixes), busiest first.
+    """
+    if request.user.role != "admin":
+        return Response({"detail": "Forbidden"}, status=403)
+    
+    try:
+        start_date, end_date = history_date_range(request)
+    except ValueError as e:
+        return Response({'error': f'Invalid date format: {str(e)}'}, status=400)
+    if (end_date - start_date).days + 1 > settings.HEATMAP_MAX_DAYS:
+        return Response({'error': f'Date range too long (max {settings.HEATMAP_MAX_DAYS} days)'}, status=400)
+    
+    params = request.query_params
+    try:
+        cell_deg = float(params.get('cell_deg') or settings.HEATMAP_CELL_SIZES[0])
+        if cell_deg not in settings.HEATMAP_CELL_SIZES:
+            raise ValueError(f"cell_deg must be one of: {', '.join(map(str, settings.HEATMAP_CELL_SIZES))}")
+        employee_ids = [int(value) for value in params['employee_ids'].split(',')] if params.get('employee_ids') else None
+        bbox = None
+        if params.get('bbox'):
+            bbox = [float(value) for value in params['bbox'].split(',')]
+            if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+                raise ValueError("bbox must be south,west,north,east")
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+    
+    keys, counts, contributors = heatmap.aggregate(start_date, end_date, cell_deg, employee_ids)
+    lats, lngs = heatmap.cell_centers(keys, cell_deg)
+    if bbox is not None:
+        south, west, north, east = bbox
+        inside = (lats >= south) & (lats <= north) & (lngs >= west) & (lngs <= east)
+        lats, lngs, counts = lats[inside], lngs[inside], counts[inside]
+    order = counts.argsort(kind='stable')[::-1]
+    
+    return Response({
+        'date_range': {'start_date': start_date, 'end_date': end_date},
+        'cell_deg': cell_deg,
+        'employees': contributors,
+        'total_points': int(counts.sum()),
+        'cell_count': len(counts),
+        'coverage_km2': round(float(heatmap.cell_area_km2(lats, cell_deg).sum()), 3),
+        'cells': [
+            [round(lat, 6), round(lng, 6), count]
+            for lat, lng, count in zip(lats[order].tolist(), lngs[order].tolist(), counts[order].tolist())
+        ],
+    })
+
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated])
+def geofences(request):
+    """List or create job-site geofences (circle or polygon)"""
+    if request.user.role != "admin":
+        return Response({"detail": "Forbidden"}, status=403)
+    
+    if request.method == "POST":
+        ser = GeofenceSerializer(data=request.data)
+        if ser.is_valid():
+            ser.save()
+            return Response(ser.data, status=201)
+        return Response(ser.errors, status=400)
+    
+    return Response(GeofenceSerializer(Geofence.objects.all(), many=True).data)
+
+@api_view(["GET", "PATCH", "DELETE"])
+@permission_classes([IsAuthenticated])
+def manage_geofence(request, pk):
+    """Read, update or delete one geofence"""
+    if request.user.role != "admin":
+        return Response({"detail": "Forbidden"}, status=403)
+    
+    fence = get_object_or_404(Geofence, pk=pk)
+    
+    if request.method == "PATCH":
+        ser = GeofenceSerializer(fence, data=request.data, partial=True)
+        if ser.is_valid():
+            ser.save()
+            return Response(ser.data)
+        return Response(ser.errors, status=400)
+    
+    elif request.method == "DELETE":
+        fence.delete()
+        return Response({"message": "Geofence removed successfully"}, status=204)
+    
+    return Response(GeofenceSerializer(fence).data)
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def session_geofence_events(request, session_id):
+    """Geofence enter/exit events of a session and the site visits they form"""
     if request.user.role != "admin":
         return Response({"detail": "Forbidden"}, status=403)
     
+    session = get_object_or_404(LiveSession, pk=session_id)
+    events = list(session.geofence_events.select_related("geofence"))
+    visits = [
+        {
+            "geofence": visit["geofence"].id,
+            "geofence_name": visit["geofence"].name,
+            "arrival": visit["arrival"],
+            "departure": visit["departure"],
+            "duration_seconds": visit["duration"].total_seconds() if visit["duration"] else None,
+        }
+        for visit in site_visits(events)
+    ]
+    return Response({
+        "session_id": session.id,
+        "events": GeofenceEventSerializer(events, many=True).data,
+        "visits": visits,
+    })
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def session_stats(request, session_id):
+    """Distance, moving/idle time, speeds and GPS jumps of a session's path"""
+    session = get_object_or_404(LiveSession, pk=session_id)
+    # Allow admin or owner
+    if request.user.role != "admin" and session.employee_id != request.user.id:
+        return Response({"detail": "Forbidden"}, status=403)
+    return Response(dict(compute_session_stats(session), session_id=session.id, is_active=session.is_active))
+
+# ✅ EXISTING: Keep location history as is
+def parse_path_format(params):
+    """The ``path_format`` query param (None for the default per-point dicts)"""
+    fmt = params.get('path_format') or None
+    if fmt is not None and fmt not in PATH_FORMATS:
+        raise ValueError(f"path_format must be one of: {', '.join(PATH_FORMATS)}")
+    return fmt
+
+def session_budget(session, max_points, total_points):
+    """A session's share of a history-wide max_points, by its point count"""
+    if max_points is None:
+        return None
+    return max(2, round(max_points * stored_point_count(session) / total_points))
+
+def compact_history(sessions, fmt, date_range, tolerance, max_points, zoom):
+    """location_history payload with each session's path encoded once in ``fmt``"""
+    total_points = sum(stored_point_count(session) for session in sessions) or 1
+    session_list = []
+    pinpoint_list = []
+    features = []
+    
+    for session in sessions:
+        session_date = session.local_date.isoformat()
+        path = simplify_session(session, tolerance, session_budget(session, max_points, total_points), zoom)
+        session_data = {
+            'id': session.id,
+            'start_time': session.start_time,
+            'end_time': session.end_time,
+            'is_active': session.is_active,
+            'date': session_date,
+            'visits': [visit_payload(visit) for visit in session.visits.all()],
+        }
+        
+        for pinpoint in session.pinpoints.all():
+            pinpoint_data = {
+                'session_id': session.id,
+                'place': pinpoint.place or '',
+                'address': pinpoint.address or '',
+                'message': pinpoint.message or '',
+            }
+            if fmt == 'geojson':
+                features.append(pinpoint_feature(pinpoint, dict(pinpoint_data, type='pinpoint')))
+            else:
+                pinpoint_list.append(dict(
+                    pinpoint_data,
+                    latitude=float(pinpoint.latitude),
+                    longitude=float(pinpoint.longitude),
+                    timestamp=pinpoint.timestamp,
+                ))
+        
+        if fmt == 'geojson':
+            features.append(encode_path(path, fmt, dict(session_data, type='path')))
+        else:
+            session_list.append(dict(session_data, path=encode_path(path, fmt)))
+    
+    if fmt == 'geojson':
+        return {
+            'type': 'FeatureCollection',
+            'date_range': date_range,
+            'features': features,
+        }
+    return {
+        'date_range': date_range,
+        'format': fmt,
+        'sessions': session_list,
+        'pinpoints': pinpoint_list,
+        'total_sessions': len(session_list),
+    }
+
+def history_date_range(request):
+    """(start_date, end_date) from ?start_date&end_date, ?date, or the last 5 days"""
     # Support both single date and date range
     date = request.GET.get('date')
     start_date_str = request.GET.get('start_date')
     end_date_str = request.GET.get('end_date')
     
+    if start_date_str and end_date_str:
+        # Date range mode
+        start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d').date()
+        end_date = datetime.datetime.strptime(end_date_str, '%Y-%m-%d').date()
+    elif date:
+        # Single date mode (backward compatibility)
+        start_date = end_date = datetime.datetime.strptime(date, '%Y-%m-%d').date()
+    else:
+        # Default to last 5 days if no parameters provided
+        end_date = timezone.localdate()
+        start_date = end_date - timedelta(days=4)
+    if start_date > end_date:
+        raise ValueError("start_date is after end_date")
+    return start_date, end_date
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def location_history(request, employee_id):
+    """
+    Get location history for specific employee.
+    
+    With ?stream=true the response is written incrementally with constant
+    memory: sessions, then a single timestamp-ordered ``points`` array (path
+    points and pinpoints, each tagged with ``type``, ``date`` and
+    ``session_id``), then ``statistics``.
+    
+    ?max_points=, ?tolerance= (metres) or ?zoom= simplify the path points of
+    the regular response; max_points is shared across the sessions.
+    
+    ?path_format=polyline|columnar|geojson sends each session's path once in that
+    encoding (see path_formats) instead of the per-point dicts.
+    """
+    if request.user.role != "admin":
+        return Response({"detail": "Forbidden"}, status=403)
+    
     try:
-        # Determine date range
-        if start_date_str and end_date_str:
-            # Date range mode
-            start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d').date()
-            end_date = datetime.datetime.strptime(end_date_str, '%Y-%m-%d').date()
-        elif date:
-            # Single date mode (backward compatibility)
-            start_date = end_date = datetime.datetime.strptime(date, '%Y-%m-%d').date()
-        else:
-            # Default to last 5 days if no parameters provided
-            end_date = timezone.now().date()
-            start_date = end_date - timedelta(days=4)
+        tolerance, max_points, zoom = parse_simplify_params(request.GET)
+        fmt = parse_path_format(request.GET)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    simplifying = any(value is not None for value in (tolerance, max_points, zoom))
+    
+    try:
+        start_date, end_date = history_date_range(request)
+        
+        date_range = {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'total_days': (end_date - start_date).days + 1
+        }
+        
+        streaming = request.GET.get('stream', '').lower() in ('1', 'true', 'yes')
+        if not streaming and date_range['total_days'] > settings.LOCATION_HISTORY_MAX_DAYS:
+            return Response({
+                "error": f"Date range is limited to {settings.LOCATION_HISTORY_MAX_DAYS} days; "
+                         "use stream=true or the paginated history endpoint for longer ranges"
+            }, status=400)
+        
+        if streaming:
+            session_list = [
+                {
+                    'id': session_id,
+                    'start_time': start_time,
+                    'end_time': end_time,
+                    'is_active': is_active,
+                    'date': local_date.isoformat(),
+                }
+                for session_id, start_time, end_time, is_active, local_date in LiveSession.objects.on_dates(
+                    start_date, end_date
+                ).filter(
+                    employee_id=employee_id
+                ).order_by('start_time').values_list('id', 'start_time', 'end_time', 'is_active', 'local_date')
+            ]
+            header = {'date_range': date_range, 'total_sessions': len(session_list)}
+            return StreamingHttpResponse(stream_history(header, session_list), content_type='application/json')
         
         # Fetch sessions within the date range
-        sessions = LiveSession.objects.filter(
-            employee_id=employee_id,
-            start_time__date__range=[start_date, end_date]
-        ).prefetch_related('location_points', 'pinpoints').order_by('start_time')
+        sessions = LiveSession.objects.on_dates(start_date, end_date).filter(
+            employee_id=employee_id
+        ).select_related('path_archive').order_by('start_time')
+        visits = Prefetch('visits', queryset=SessionVisit.objects.select_related('geofence'))
+        if simplifying:
+            # Cached simplified paths of closed sessions need no point rows
+            sessions = sessions.prefetch_related('pinpoints', visits)
+        else:
+            sessions = sessions.prefetch_related(
+                Prefetch('location_points', queryset=unarchived_rows()), 'pinpoints', visits
+            )
+        total_points = sum(stored_point_count(session) for session in sessions) or 1
+        
+        if fmt:
+            return Response(compact_history(sessions, fmt, date_range, tolerance, max_points, zoom))
         
         # Organize data by date for multi-day support
         daily_data = {}
@@ -238,7 +625,7 @@ def location_history(request, employee_id):
         session_list = []
         
         for session in sessions:
-            session_date = session.start_time.date().isoformat()
+            session_date = session.local_date.isoformat()
             
             # Initialize daily data structure
             if session_date not in daily_data:
@@ -253,13 +640,15 @@ def location_history(request, employee_id):
                 'id': session.id,
                 'start_time': session.start_time,
                 'end_time': session.end_time,
-                'is_active': session.is_active
+                'is_active': session.is_active,
+                'visits': [visit_payload(visit) for visit in session.visits.all()],
             }
             daily_data[session_date]['sessions'].append(session_data)
             session_list.append(session_data)
             
-            # Process location points (continuous path tracking)
-            for point in session.location_points.all():
+            # Process location points (continuous path tracking, archived or live)
+            budget = session_budget(session, max_points, total_points)
+            for point in simplify_session(session, tolerance, budget, zoom):
                 point_data = {
                     'latitude': float(point.latitude),
                     'longitude': float(point.longitude),
@@ -293,11 +682,7 @@ def location_history(request, employee_id):
         
         # Enhanced response format
         response_data = {
-            'date_range': {
-                'start_date': start_date.isoformat(),
-                'end_date': end_date.isoformat(),
-                'total_days': (end_date - start_date).days + 1
-            },
+            'date_range': date_range,
             'daily_data': daily_data,
             'sessions': session_list,
             'path_points': all_path_points,
@@ -318,7 +703,109 @@ def location_history(request, employee_id):
     except Exception as e:
         return Response({"error": f"Server error: {str(e)}"}, status=500)
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def location_history_page(request, employee_id):
+    """
+    One page of an employee's location history for lazy loading.
+    
+    Path points and pinpoints come in (timestamp, id) order, at most
+    ``page_size`` per page (capped by the server). Pass ``next_cursor`` back
+    as ?cursor= for the following page; it is null on the last page. The
+    cursor is opaque and bound to the employee and date range it came from.
+    """
+    if request.user.role != "admin":
+        return Response({"detail": "Forbidden"}, status=403)
+    
+    try:
+        start_date, end_date = history_date_range(request)
+        page_size = int(request.GET.get('page_size', settings.LOCATION_HISTORY_PAGE_SIZE))
+    except ValueError as e:
+        return Response({"error": f"Invalid parameter: {str(e)}"}, status=400)
+    page_size = max(1, min(page_size, settings.LOCATION_HISTORY_MAX_PAGE_SIZE))
+    
+    query = [employee_id, start_date.isoformat(), end_date.isoformat()]
+    after_path = after_pinpoint = None
+    if request.GET.get('cursor'):
+        try:
+            after_path, after_pinpoint = decode_cursor(request.GET['cursor'], query)
+        except ValueError:
+            return Response({"error": "Invalid or expired cursor"}, status=400)
+    
+    session_dates = {
+        session_id: local_date.isoformat()
+        for session_id, local_date in LiveSession.objects.on_dates(start_date, end_date).filter(
+            employee_id=employee_id
+        ).values_list('id', 'local_date')
+    }
+    
+    rows = list(itertools.islice(
+        merged_points(list(session_dates), after_path, after_pinpoint, chunk_size=page_size + 1),
+        page_size + 1,
+    ))
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    
+    for row in rows:
+        if row[2] == "path":
+            after_path = (row[0], row[1])
+        else:
+            after_pinpoint = (row[0], row[1])
+    
+    return Response({
+        'date_range': {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'total_days': (end_date - start_date).days + 1
+        },
+        'page_size': page_size,
+        'points': [point_payload(row, session_dates) for row in rows],
+        'next_cursor': encode_cursor(query, after_path, after_pinpoint) if has_more else None,
+    })
+
 # ✅ EXISTING: Keep location update endpoints as is
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def activity_summary(request):
+    """
+    Per-employee daily activity for a date range, read from the daily
+    rollup (one indexed query). Params: start_date/end_date or date (default
+    the last 5 days) and an optional employee_id.
+    """
+    if request.user.role != "admin":
+        return Response({"detail": "Forbidden"}, status=403)
+
+    try:
+        start_date, end_date = history_date_range(request)
+    except ValueError as e:
+        return Response({'error': f'Invalid date format: {str(e)}'}, status=400)
+    max_days = settings.DAILY_ACTIVITY_MAX_DAYS
+    if (end_date - start_date).days + 1 > max_days:
+        return Response({'error': f'Date range too long (max {max_days} days)'}, status=400)
+
+    rows = DailyActivity.objects.filter(date__range=[start_date, end_date]).select_related('employee')
+    employee_id = request.GET.get('employee_id')
+    if employee_id:
+        rows = rows.filter(employee_id=employee_id)
+    rows = list(rows.order_by('employee_id', 'date'))
+
+    employees = []
+    for _, employee_rows in itertools.groupby(rows, key=lambda row: row.employee_id):
+        employee_rows = list(employee_rows)
+        employee = employee_rows[0].employee
+        employees.append({
+            'employee_id': employee.id,
+            'employee_name': employee.full_name or employee.username,
+            'totals': daily_activity.summarize(employee_rows),
+            'days': DailyActivitySerializer(employee_rows, many=True).data,
+        })
+
+    return Response({
+        'date_range': {'start_date': start_date, 'end_date': end_date},
+        'employees': employees,
+        'totals': daily_activity.summarize(rows),
+    })
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def update_location(request):
@@ -326,30 +813,27 @@ def update_location(request):
     if request.user.role != "employee":
         return Response({"detail": "Only employees can update location"}, status=403)
     
+    if not isinstance(request.data, dict):
+        return Response({"error": "Invalid data: expected a JSON object"}, status=400)
     # Get active session
-    session = LiveSession.objects.filter(employee=request.user, is_active=True).first()
+    session = get_active_session(request.user, hint=request.data.get("session_id"))
     if not session:
         return Response({"detail": "No active session found"}, status=404)
     
     try:
-        data = request.data
-        lat = float(data.get("latitude", 0))
-        lng = float(data.get("longitude", 0))
-        
-        if lat == 0 or lng == 0:
+        try:
+            point = parse_point(request.data)
+        except ValueError:
             return Response({"error": "Invalid coordinates"}, status=400)
         
-        # Create location point for path tracking
-        location_point = LocationPoint.objects.create(
-            session=session,
-            latitude=lat,
-            longitude=lng,
-        )
+        # Create location point for path tracking (may be dropped by ingest thinning)
+        stored = store_points(session, [point])
         
         return Response({
             "status": "Location updated",
-            "point_id": location_point.id,
-            "total_points": session.location_points.count()
+            "point_id": stored[0].id if stored else None,
+            "filtered": not stored,
+            "total_points": session.point_count
         }, status=200)
         
     except (ValueError, TypeError) as e:
@@ -364,37 +848,157 @@ def update_live_location(request):
     if request.user.role != "employee":
         return Response({"detail": "Only employees can update location"}, status=403)
     
+    if not isinstance(request.data, dict):
+        return Response({"error": "Invalid data: expected a JSON object"}, status=400)
     # Get employee's active session
-    session = LiveSession.objects.filter(employee=request.user, is_active=True).first()
+    session = get_active_session(request.user, hint=request.data.get("session_id"))
     if not session:
         return Response({"detail": "No active session found"}, status=404)
     
     try:
-        data = request.data
-        lat = float(data.get("latitude", 0))
-        lng = float(data.get("longitude", 0))
-        
-        if not (lat and lng):
+        try:
+            point = parse_point(request.data)
+        except ValueError:
             return Response({"detail": "Invalid coordinates"}, status=400)
         
-        # Store as path point for history tracking
-        location_point = LocationPoint.objects.create(
-            session=session,
-            latitude=lat,
-            longitude=lng,
-        )
+        device_id = None
+        if request.data.get("device_id") and point["seq"] is not None:
+            device_id = clean_device_id(request.data.get("device_id"))
+        
+        # Write-behind mode: queue durably and let flush_location_log store it
+        if ingest_log.is_enabled():
+            ingest_log.append_points(session, [point], device_id=device_id)
+            return Response({
+                "status": "success",
+                "message": "Location queued",
+                "queued": True
+            }, status=202)
+        
+        # Retries from the offline queue carry device_id + seq and are stored once
+        if device_id is not None:
+            result = sync_points(session, get_sync_device(request.user, device_id), [point])
+            return Response({
+                "status": "success",
+                "message": "Location updated successfully" if result["accepted"] else "Duplicate point ignored",
+                "duplicate": not result["accepted"],
+                "ack_seq": result["ack_seq"],
+                "total_points": session.point_count
+            }, status=200)
         
-        # Update session cache for live tracking (admin dashboard)
-        session.current_latitude = lat
-        session.current_longitude = lng  
-        session.last_location_update = timezone.now()
-        session.save(update_fields=['current_latitude', 'current_longitude', 'last_location_update'])
+        # Store as path point for history tracking and update the session's live position.
+        # Ingest thinning may drop a fix that adds nothing to the path.
+        stored = store_points(session, [point])
         
         return Response({
             "status": "success", 
             "message": "Location updated successfully",
-            "point_id": location_point.id,
-            "total_points": session.location_points.count()
+            "point_id": stored[0].id if stored else None,
+            "filtered": not stored,
+            "total_points": session.point_count
+        }, status=200)
+        
+    except (ValueError, TypeError) as e:
+        return Response({"error": f"Invalid data: {str(e)}"}, status=400)
+    except Exception as e:
+        return Response({"error": f"Server error: {str(e)}"}, status=500)
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def upload_location_batch(request):
+    """
+    Store many queued fixes in one request.
+    Body: {"points": [{"latitude", "longitude", "timestamp"}, ...]}
+    With a "device_id" and per-point "seq" the upload is idempotent (see sync_locations).
+    """
+    if request.user.role != "employee":
+        return Response({"detail": "Only employees can update location"}, status=403)
+    
+    if not isinstance(request.data, dict):
+        return Response({"error": "Invalid data: expected a JSON object"}, status=400)
+    session = get_active_session(request.user, hint=request.data.get("session_id"))
+    if not session:
+        return Response({"detail": "No active session found"}, status=404)
+    
+    try:
+        points, rejected = parse_points(request.data.get("points"))
+        if not points:
+            return Response({"error": "No valid points in batch", "rejected": rejected}, status=400)
+        
+        device_id = None
+        if request.data.get("device_id") and all(point["seq"] is not None for point in points):
+            device_id = clean_device_id(request.data.get("device_id"))
+        
+        if ingest_log.is_enabled():
+            ingest_log.append_points(session, points, device_id=device_id)
+            return Response({
+                "status": "success",
+                "queued": True,
+                "accepted": len(points),
+                "rejected": rejected
+            }, status=202)
+        
+        # One bulk insert plus one live-position update for the whole batch
+        if device_id is not None:
+            result = sync_points(session, get_sync_device(request.user, device_id), points)
+        else:
+            stored = store_points(session, points)
+            result = {"accepted": len(points), "stored": len(stored)}
+        
+        return Response({
+            "status": "success",
+            **result,
+            "rejected": rejected,
+            "total_points": session.point_count
+        }, status=200)
+        
+    except (ValueError, TypeError) as e:
+        return Response({"error": f"Invalid data: {str(e)}"}, status=400)
+    except Exception as e:
+        return Response({"error": f"Server error: {str(e)}"}, status=500)
+
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated])
+def sync_locations(request):
+    """
+    Offline sync protocol for queued points.
+
+    GET  ?device_id=...  -> {"device_id", "ack_seq"} so a client knows where to resume.
+    POST {"device_id", "session_id" (optional, defaults to the active session),
+          "points": [{"seq", "latitude", "longitude", "timestamp"}, ...]}
+         -> accepted/duplicate counts and "ack_seq", the highest sequence received
+            from the device (stored or thinned out). Points up to it are skipped,
+            so resending a chunk is harmless.
+    """
+    if request.user.role != "employee":
+        return Response({"detail": "Only employees can update location"}, status=403)
+    
+    try:
+        if request.method == "GET":
+            device = get_sync_device(request.user, request.GET.get("device_id"))
+            return Response({"device_id": device.device_id, "ack_seq": device.last_seq})
+        
+        if not isinstance(request.data, dict):
+            return Response({"error": "Invalid data: expected a JSON object"}, status=400)
+        device = get_sync_device(request.user, request.data.get("device_id"))
+        
+        # Points recorded offline may belong to a session that has since been stopped
+        session_id = request.data.get("session_id")
+        if session_id:
+            session = LiveSession.objects.filter(pk=session_id, employee=request.user).first()
+        else:
+            session = get_active_session(request.user)
+        if not session:
+            return Response({"detail": "Session not found"}, status=404)
+        
+        points, rejected = parse_points(request.data.get("points"), require_seq=True)
+        result = sync_points(session, device, points)
+        
+        return Response({
+            "status": "success",
+            "device_id": device.device_id,
+            "session_id": session.id,
+            **result,
+            "rejected": rejected,
         }, status=200)
         
     except (ValueError, TypeError) as e:
@@ -404,6 +1008,24 @@ def update_live_location(request):
 
 # ✅ ENHANCED: Admin-side PDF generation endpoints with text wrapping
 
+def format_duration(seconds):
+    """Tracked time as e.g. '3h 05m'"""
+    minutes = int(round(seconds / 60))
+    return f"{minutes // 60}h {minutes % 60:02d}m"
+
+def movement_summary(stats):
+    """One-line movement figures of a session for the PDF reports"""
+    summary = (
+        f"<b>Distance:</b> {stats['distance_m'] / 1000:.2f} km &nbsp; "
+        f"<b>Moving:</b> {format_duration(stats['moving_seconds'])} &nbsp; "
+        f"<b>Idle:</b> {format_duration(stats['idle_seconds'])} &nbsp; "
+        f"<b>Avg Speed:</b> {stats['average_speed_kmh']:.1f} km/h &nbsp; "
+        f"<b>Max Speed:</b> {stats['max_speed_kmh']:.1f} km/h"
+    )
+    if stats['outlier_count']:
+        summary += f" &nbsp; <b>GPS Jumps Ignored:</b> {stats['outlier_count']}"
+    return summary
+
 def create_pdf_styles():
     """Create custom styles for PDF reports with text wrapping support"""
     styles = getSampleStyleSheet()
@@ -466,6 +1088,67 @@ def create_pdf_styles():
     
     return styles
 
+def site_visits_table(visits, styles):
+    """Table of geofence visits (see geofence.site_visits) for the PDF reports"""
+    def local_time(value):
+        return timezone.localtime(value).strftime('%H:%M') if value else "-"
+    
+    data = [[
+        Paragraph("Site", styles["TableCellBold"]),
+        Paragraph("Arrived", styles["TableCellBold"]),
+        Paragraph("Left", styles["TableCellBold"]),
+        Paragraph("Time on Site", styles["TableCellBold"]),
+    ]]
+    for visit in visits:
+        duration = str(visit["duration"]).split('.')[0] if visit["duration"] else "-"
+        data.append([
+            Paragraph(visit["geofence"].name, styles["TableCell"]),
+            Paragraph(local_time(visit["arrival"]), styles["TableCell"]),
+            Paragraph(local_time(visit["departure"]), styles["TableCell"]),
+            Paragraph(duration, styles["TableCell"]),
+        ])
+    
+    table = Table(data, repeatRows=1, colWidths=[2.6*inch, 1.2*inch, 1.2*inch, 1.4*inch])
+    table.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.darkblue),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+        ("ALIGN", (0, 0), (-1, -1), "LEFT"),
+        ("FONTSIZE", (0, 0), (-1, -1), 8),
+        ("GRID", (0, 0), (-1, -1), 1, colors.black),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+    ]))
+    return table
+
+def stops_table(visits, styles):
+    """Table of detected stops (SessionVisits) for the PDF reports"""
+    data = [[
+        Paragraph("Location", styles["TableCellBold"]),
+        Paragraph("Arrived", styles["TableCellBold"]),
+        Paragraph("Left", styles["TableCellBold"]),
+        Paragraph("Stopped For", styles["TableCellBold"]),
+    ]]
+    for visit in visits:
+        location = visit.geofence.name if visit.geofence_id else f"{visit.latitude:.5f}, {visit.longitude:.5f}"
+        data.append([
+            Paragraph(location, styles["TableCell"]),
+            Paragraph(timezone.localtime(visit.arrival).strftime('%H:%M'), styles["TableCell"]),
+            Paragraph(timezone.localtime(visit.departure).strftime('%H:%M'), styles["TableCell"]),
+            Paragraph(format_duration(visit.dwell_seconds), styles["TableCell"]),
+        ])
+    
+    table = Table(data, repeatRows=1, colWidths=[2.6*inch, 1.2*inch, 1.2*inch, 1.4*inch])
+    table.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.darkgreen),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+        ("ALIGN", (0, 0), (-1, -1), "LEFT"),
+        ("FONTSIZE", (0, 0), (-1, -1), 8),
+        ("GRID", (0, 0), (-1, -1), 1, colors.black),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+    ]))
+    return table
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def generate_daily_pdf(request, employee_id):
@@ -483,12 +1166,11 @@ def generate_daily_pdf(request, employee_id):
         employee = get_object_or_404(User, id=employee_id)
         
         # Get sessions for the date
-        sessions = LiveSession.objects.filter(
-            employee=employee, 
-            start_time__date=report_date
-        ).prefetch_related('location_points', 'pinpoints').order_by('start_time')
+        sessions = LiveSession.objects.on_dates(report_date).filter(
+            employee=employee
+        ).prefetch_related('pinpoints', Prefetch('visits', queryset=SessionVisit.objects.select_related('geofence'))).order_by('start_time')
         
-        if not sessions.exists():
+        if not sessions:
             return Response({'error': 'No sessions found for this date'}, status=404)
         
         # Create PDF
@@ -508,20 +1190,22 @@ def generate_daily_pdf(request, employee_id):
         story.append(Paragraph(f"<b>Report Generated:</b> {datetime.datetime.now().strftime('%B %d, %Y at %H:%M')}", styles["InfoText"]))
         story.append(Spacer(1, 20))
         
-        # Summary statistics
-        total_sessions = sessions.count()
-        total_pinpoints = sum(session.pinpoints.count() for session in sessions)
-        total_path_points = sum(session.location_points.count() for session in sessions)
+        # Summary statistics from the daily activity rollup
+        activity = DailyActivity.objects.filter(employee=employee, date=report_date).first()
+        totals = daily_activity.summarize([activity] if activity else [])
         
         story.append(Paragraph("Summary", styles["SectionHeader"]))
-        story.append(Paragraph(f"<b>Total Sessions:</b> {total_sessions}", styles["InfoText"]))
-        story.append(Paragraph(f"<b>Total Pinpoints:</b> {total_pinpoints}", styles["InfoText"]))
-        story.append(Paragraph(f"<b>Total Path Points:</b> {total_path_points}", styles["InfoText"]))
+        story.append(Paragraph(f"<b>Total Sessions:</b> {totals['sessions']}", styles["InfoText"]))
+        story.append(Paragraph(f"<b>Total Pinpoints:</b> {totals['pinpoints']}", styles["InfoText"]))
+        story.append(Paragraph(f"<b>Total Path Points:</b> {totals['path_points']}", styles["InfoText"]))
+        story.append(Paragraph(f"<b>Distance Travelled:</b> {totals['distance_m'] / 1000:.2f} km", styles["InfoText"]))
+        story.append(Paragraph(f"<b>Time Tracked:</b> {format_duration(totals['tracked_seconds'])}", styles["InfoText"]))
         story.append(Spacer(1, 20))
         
         # Sessions details
         for i, session in enumerate(sessions, 1):
             story.append(Paragraph(f"Session {i} Details", styles["SectionHeader"]))
+            story.append(Paragraph(movement_summary(compute_session_stats(session)), styles["InfoText"]))
             
             # ✅ REMOVED: All session timing information
             # No more Start Time, End Time, Duration
@@ -578,6 +1262,12 @@ def generate_daily_pdf(request, employee_id):
             else:
                 story.append(Paragraph("No pinpoints recorded for this session.", styles["InfoText"]))
             
+            # Stops detected in the path
+            visits = session.visits.all()
+            if visits:
+                story.append(Paragraph(f"Stops ({len(visits)})", styles["Heading3"]))
+                story.append(stops_table(visits, styles))
+            
             story.append(Spacer(1, 20))
         
         # Build PDF
@@ -623,7 +1313,7 @@ def generate_session_pdf(request, session_id):
         employee_name = employee.full_name or employee.username
         story.append(Paragraph(f"<b>Employee:</b> {employee_name}", styles["InfoText"]))
         story.append(Paragraph(f"<b>Session ID:</b> {session.id}", styles["InfoText"]))
-        story.append(Paragraph(f"<b>Date:</b> {session.start_time.strftime('%B %d, %Y')}", styles["InfoText"]))
+        story.append(Paragraph(f"<b>Date:</b> {session.local_date.strftime('%B %d, %Y')}", styles["InfoText"]))
         story.append(Paragraph(f"<b>Report Generated:</b> {datetime.datetime.now().strftime('%B %d, %Y at %H:%M')}", styles["InfoText"]))
         story.append(Spacer(1, 20))
         
@@ -631,11 +1321,23 @@ def generate_session_pdf(request, session_id):
         
         # Statistics
         pinpoints = session.pinpoints.all()
-        path_points = session.location_points.all()
         
         story.append(Paragraph("Session Statistics", styles["SectionHeader"]))
-        story.append(Paragraph(f"<b>Total Path Points:</b> {path_points.count()}", styles["InfoText"]))
-        story.append(Paragraph(f"<b>Total Pinpoints:</b> {pinpoints.count()}", styles["InfoText"]))
+        story.append(Paragraph(f"<b>Total Path Points:</b> {session.point_count}", styles["InfoText"]))
+        story.append(Paragraph(f"<b>Total Pinpoints:</b> {session.pinpoint_count}", styles["InfoText"]))
+        story.append(Paragraph(f"<b>Distance Travelled:</b> {session.distance_m / 1000:.2f} km", styles["InfoText"]))
+        story.append(Spacer(1, 20))
+        
+        # Movement analytics over the stored path
+        stats = compute_session_stats(session)
+        story.append(Paragraph("Movement", styles["SectionHeader"]))
+        story.append(Paragraph(f"<b>Moving Time:</b> {format_duration(stats['moving_seconds'])}", styles["InfoText"]))
+        story.append(Paragraph(f"<b>Idle Time:</b> {format_duration(stats['idle_seconds'])}", styles["InfoText"]))
+        if stats['gap_seconds']:
+            story.append(Paragraph(f"<b>No Signal:</b> {format_duration(stats['gap_seconds'])}", styles["InfoText"]))
+        story.append(Paragraph(f"<b>Average Moving Speed:</b> {stats['average_speed_kmh']:.1f} km/h", styles["InfoText"]))
+        story.append(Paragraph(f"<b>Max Speed:</b> {stats['max_speed_kmh']:.1f} km/h", styles["InfoText"]))
+        story.append(Paragraph(f"<b>GPS Jumps Ignored:</b> {stats['outlier_count']}", styles["InfoText"]))
         story.append(Spacer(1, 20))
         
         # Pinpoints details
@@ -689,13 +1391,27 @@ def generate_session_pdf(request, session_id):
         else:
             story.append(Paragraph("No pinpoints recorded for this session.", styles["InfoText"]))
         
+        # Site arrivals and departures from the recorded geofence events
+        visits = site_visits(session.geofence_events.select_related("geofence"))
+        if visits:
+            story.append(Spacer(1, 20))
+            story.append(Paragraph("Site Visits", styles["SectionHeader"]))
+            story.append(site_visits_table(visits, styles))
+        
+        # Stops detected in the path
+        stops = session.visits.select_related("geofence")
+        if stops:
+            story.append(Spacer(1, 20))
+            story.append(Paragraph("Stops", styles["SectionHeader"]))
+            story.append(stops_table(stops, styles))
+        
         # Build PDF
         doc.build(story)
         buffer.seek(0)
         
         # Generate filename
         safe_name = re.sub(r"[^a-zA-Z0-9_-]", "_", employee_name)
-        session_date = session.start_time.strftime('%Y-%m-%d')
+        session_date = session.local_date.strftime('%Y-%m-%d')
         filename = f"{safe_name}_Session_{session.id}_{session_date}.pdf"
         
         # Return PDF as download
@@ -726,12 +1442,11 @@ def generate_date_range_pdf(request, employee_id):
         employee = get_object_or_404(User, id=employee_id)
         
         # Get sessions for the date range
-        sessions = LiveSession.objects.filter(
-            employee=employee, 
-            start_time__date__range=[start_date, end_date]
-        ).prefetch_related('location_points', 'pinpoints').order_by('start_time')
+        sessions = LiveSession.objects.on_dates(start_date, end_date).filter(
+            employee=employee
+        ).prefetch_related('pinpoints', Prefetch('visits', queryset=SessionVisit.objects.select_related('geofence'))).order_by('start_time')
         
-        if not sessions.exists():
+        if not sessions:
             return Response({'error': 'No sessions found for this date range'}, status=404)
         
         # Create PDF
@@ -752,21 +1467,27 @@ def generate_date_range_pdf(request, employee_id):
         story.append(Paragraph(f"<b>Report Generated:</b> {datetime.datetime.now().strftime('%B %d, %Y at %H:%M')}", styles["InfoText"]))
         story.append(Spacer(1, 20))
         
-        # Overall statistics
-        total_sessions = sessions.count()
-        total_pinpoints = sum(session.pinpoints.count() for session in sessions)
-        total_path_points = sum(session.location_points.count() for session in sessions)
+        # Overall statistics from the daily activity rollup
+        activity_by_date = {
+            row.date: row for row in DailyActivity.objects.filter(
+                employee=employee, date__range=[start_date, end_date]
+            )
+        }
+        totals = daily_activity.summarize(activity_by_date.values())
         
         story.append(Paragraph("Overall Summary", styles["SectionHeader"]))
-        story.append(Paragraph(f"<b>Total Sessions:</b> {total_sessions}", styles["InfoText"]))
-        story.append(Paragraph(f"<b>Total Pinpoints:</b> {total_pinpoints}", styles["InfoText"]))
-        story.append(Paragraph(f"<b>Total Path Points:</b> {total_path_points}", styles["InfoText"]))
+        story.append(Paragraph(f"<b>Active Days:</b> {totals['active_days']}", styles["InfoText"]))
+        story.append(Paragraph(f"<b>Total Sessions:</b> {totals['sessions']}", styles["InfoText"]))
+        story.append(Paragraph(f"<b>Total Pinpoints:</b> {totals['pinpoints']}", styles["InfoText"]))
+        story.append(Paragraph(f"<b>Total Path Points:</b> {totals['path_points']}", styles["InfoText"]))
+        story.append(Paragraph(f"<b>Distance Travelled:</b> {totals['distance_m'] / 1000:.2f} km", styles["InfoText"]))
+        story.append(Paragraph(f"<b>Time Tracked:</b> {format_duration(totals['tracked_seconds'])}", styles["InfoText"]))
         story.append(Spacer(1, 20))
         
         # Group sessions by date
         sessions_by_date = {}
         for session in sessions:
-            date_key = session.start_time.date()
+            date_key = session.local_date
             if date_key not in sessions_by_date:
                 sessions_by_date[date_key] = []
             sessions_by_date[date_key].append(session)
@@ -774,6 +1495,13 @@ def generate_date_range_pdf(request, employee_id):
         # Daily breakdown
         for report_date, day_sessions in sorted(sessions_by_date.items()):
             story.append(Paragraph(f"Date: {report_date.strftime('%B %d, %Y')}", styles["SectionHeader"]))
+            activity = activity_by_date.get(report_date)
+            if activity is not None:
+                story.append(Paragraph(
+                    f"<b>Distance:</b> {activity.distance_m / 1000:.2f} km &nbsp; "
+                    f"<b>Time Tracked:</b> {format_duration(activity.tracked_seconds)}",
+                    styles["InfoText"],
+                ))
             
             for i, session in enumerate(day_sessions, 1):
                 story.append(Paragraph(f"Session {i}", styles["Heading3"]))
@@ -781,8 +1509,18 @@ def generate_date_range_pdf(request, employee_id):
                 # ✅ REMOVED: Session timing completely
                 
                 # Basic session info only
-                story.append(Paragraph(f"<b>Pinpoints:</b> {session.pinpoints.count()}", styles["InfoText"]))
-                story.append(Paragraph(f"<b>Path Points:</b> {session.location_points.count()}", styles["InfoText"]))
+                story.append(Paragraph(f"<b>Pinpoints:</b> {session.pinpoint_count}", styles["InfoText"]))
+                story.append(Paragraph(f"<b>Path Points:</b> {session.point_count}", styles["InfoText"]))
+                story.append(Paragraph(movement_summary(compute_session_stats(session)), styles["InfoText"]))
+                
+                # Stops detected in the path
+                for visit in session.visits.all():
+                    location = visit.geofence.name if visit.geofence_id else f"{visit.latitude:.5f}, {visit.longitude:.5f}"
+                    story.append(Paragraph(
+                        f"<b>• Stop:</b> {location} {timezone.localtime(visit.arrival).strftime('%H:%M')}"
+                        f"-{timezone.localtime(visit.departure).strftime('%H:%M')} ({format_duration(visit.dwell_seconds)})",
+                        styles["InfoText"],
+                    ))
                 
                 # Show pinpoints with full text wrapping
                 pinpoints = session.pinpoints.all()